@@ -0,0 +1,263 @@
+"""
+Approximate Nearest-Neighbour Index
+CPU-only IVF (inverted file) index over L2-normalized embeddings with incremental updates and mmap persistence
+"""
+
+import json
+import logging
+import os
+import shutil
+import tempfile
+import time
+from typing import Any
+
+import numpy as np
+
+from quantization import EMBEDDING_STORAGE_DTYPE, QuantizedMatrix
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process use only
+    fcntl = None
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+ANN_NPROBE = int(os.getenv("ANN_NPROBE", "16"))
+ANN_TRAIN_ITERATIONS = int(os.getenv("ANN_TRAIN_ITERATIONS", "10"))
+ANN_TRAIN_SAMPLE = int(os.getenv("ANN_TRAIN_SAMPLE", "100000"))
+
+_ASSIGN_CHUNK = 65536
+
+def default_n_lists(size: int) -> int:
+    """Roughly 4 * sqrt(N) inverted lists, the usual IVF starting point"""
+    return max(1, min(size, int(4 * np.sqrt(size))))
+
+class IVFIndex:
+    """Inverted lists of vectors grouped by nearest k-means centroid; a search scans only nprobe lists.
+
+    Vectors live in one list-sorted (optionally quantized) matrix that load() memory-maps. Inserts go to
+    small per-list delta buffers and deletes are tombstones until the next save() compacts them.
+    """
+
+    def __init__(self, centroids: np.ndarray, vectors: QuantizedMatrix, keys: np.ndarray, offsets: np.ndarray,
+                 trained_size: int, nprobe: int = ANN_NPROBE, storage: str = EMBEDDING_STORAGE_DTYPE):
+        self.centroids = np.ascontiguousarray(centroids, dtype=np.float32)
+        self.vectors = vectors
+        self.storage = storage
+        self.keys = keys
+        self.offsets = offsets
+        self.trained_size = trained_size
+        self.nprobe = nprobe
+        self.alive = np.ones(len(keys), dtype=bool)
+        self.rows = {key: row for row, key in enumerate(keys.tolist())}
+        self.delta: dict[int, dict[str, np.ndarray]] = {}
+        self.delta_list: dict[str, int] = {}
+
+    @property
+    def n_lists(self) -> int:
+        return len(self.centroids)
+
+    @classmethod
+    def train(cls, vectors: np.ndarray, keys: list[str], n_lists: int | None = None,
+              iterations: int = ANN_TRAIN_ITERATIONS, seed: int = 0) -> "IVFIndex":
+        """Spherical k-means on a sample for the coarse quantizer, then bucket every vector"""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        n_lists = n_lists or default_n_lists(len(vectors))
+        rng = np.random.default_rng(seed)
+        sample_size = min(len(vectors), max(ANN_TRAIN_SAMPLE, n_lists * 16))
+        sample = vectors[np.sort(rng.choice(len(vectors), sample_size, replace=False))]
+        centroids = sample[rng.choice(len(sample), n_lists, replace=False)].copy()
+        for _ in range(iterations):
+            assignment = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, sample)
+            counts = np.bincount(assignment, minlength=n_lists)
+            empty = counts == 0
+            # Re-seed empty lists from random sample points
+            sums[empty] = sample[rng.choice(len(sample), int(empty.sum()))]
+            centroids = sums / np.maximum(np.linalg.norm(sums, axis=1, keepdims=True), 1e-12)
+        index = cls(centroids, QuantizedMatrix.from_float(np.zeros((0, vectors.shape[1]), dtype=np.float32)),
+                    np.array([], dtype=str), np.zeros(n_lists + 1, dtype=np.int64), len(vectors))
+        index._rebuild_base(vectors, np.asarray(keys, dtype=str))
+        return index
+
+    def _assign(self, vectors: np.ndarray) -> np.ndarray:
+        return np.concatenate([
+            np.argmax(vectors[start:start + _ASSIGN_CHUNK] @ self.centroids.T, axis=1)
+            for start in range(0, len(vectors), _ASSIGN_CHUNK)
+        ]) if len(vectors) else np.zeros(0, dtype=np.int64)
+
+    def _rebuild_base(self, vectors: np.ndarray, keys: np.ndarray) -> None:
+        assignment = self._assign(vectors)
+        order = np.argsort(assignment, kind="stable")
+        self.vectors = QuantizedMatrix.from_float(vectors[order], self.storage)
+        self.keys = keys[order]
+        self.offsets = np.concatenate([[0], np.cumsum(np.bincount(assignment, minlength=self.n_lists))]).astype(np.int64)
+        self.alive = np.ones(len(self.keys), dtype=bool)
+        self.rows = {key: row for row, key in enumerate(self.keys.tolist())}
+        self.delta = {}
+        self.delta_list = {}
+
+    def add(self, keys: list[str], vectors: np.ndarray) -> None:
+        """Insert or replace vectors; they are searchable immediately"""
+        if not keys:
+            return
+        self.remove(keys)
+        vectors = np.asarray(vectors, dtype=np.float32)
+        for key, vector, list_id in zip(keys, vectors, self._assign(vectors).tolist(), strict=True):
+            self.delta.setdefault(list_id, {})[key] = vector
+            self.delta_list[key] = list_id
+
+    def remove(self, keys: list[str]) -> None:
+        """Tombstone vectors (e.g. a job that became inactive)"""
+        for key in keys:
+            row = self.rows.get(key)
+            if row is not None:
+                self.alive[row] = False
+            list_id = self.delta_list.pop(key, None)
+            if list_id is not None:
+                del self.delta[list_id][key]
+
+    def __len__(self) -> int:
+        return int(self.alive.sum()) + len(self.delta_list)
+
+    def needs_retrain(self) -> bool:
+        """Centroids drift out of shape once the collection halves or doubles since training"""
+        size = len(self)
+        return size > 2 * self.trained_size or size < self.trained_size // 2
+
+    def search(self, query: np.ndarray, k: int, nprobe: int | None = None) -> tuple[list[str], np.ndarray]:
+        """Top-k keys by inner product among the nprobe lists closest to the query"""
+        query = np.asarray(query, dtype=np.float32)
+        nprobe = min(nprobe or self.nprobe, self.n_lists)
+        probes = np.argpartition(-(self.centroids @ query), nprobe - 1)[:nprobe]
+
+        candidate_keys: list[np.ndarray] = []
+        candidate_scores: list[np.ndarray] = []
+        for list_id in probes.tolist():
+            start, end = int(self.offsets[list_id]), int(self.offsets[list_id + 1])
+            if end > start:
+                alive = self.alive[start:end]
+                scores = self.vectors.subset(slice(start, end)) @ query
+                candidate_keys.append(self.keys[start:end][alive])
+                candidate_scores.append(scores[alive])
+            pending = self.delta.get(list_id)
+            if pending:
+                items = list(pending.items())
+                candidate_keys.append(np.array([key for key, _ in items], dtype=str))
+                candidate_scores.append(np.vstack([vector for _, vector in items]) @ query)
+        if not candidate_scores:
+            return [], np.zeros(0, dtype=np.float32)
+
+        keys = np.concatenate(candidate_keys)
+        scores = np.concatenate(candidate_scores)
+        k = min(k, len(scores))
+        if k <= 0:
+            return [], np.zeros(0, dtype=np.float32)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return keys[top].tolist(), scores[top]
+
+    def save(self, directory: str) -> None:
+        """Write a compacted, list-sorted copy under a new generation and publish it atomically.
+
+        The live index is not modified, so searches can continue while this runs in a worker thread.
+        """
+        delta_items = [(key, vector) for pending in list(self.delta.values()) for key, vector in list(pending.items())]
+        alive = self.alive.copy()
+        vectors = self.vectors[alive]
+        keys = np.asarray(self.keys[alive], dtype=str)
+        if delta_items:
+            vectors = np.vstack([vectors, np.vstack([vector for _, vector in delta_items])])
+            keys = np.concatenate([keys, np.array([key for key, _ in delta_items], dtype=str)])
+        compacted = IVFIndex(self.centroids, self.vectors, keys, self.offsets, self.trained_size, self.nprobe, self.storage)
+        compacted._rebuild_base(vectors, keys)
+
+        os.makedirs(directory, exist_ok=True)
+        manifest_path = os.path.join(directory, "current.json")
+        # Workers saving at once take turns, and each generation appears complete or not at all
+        with open(os.path.join(directory, "save.lock"), "w") as lock_file:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            generation = 1
+            if os.path.exists(manifest_path):
+                with open(manifest_path, encoding="utf-8") as f:
+                    generation = json.load(f)["generation"] + 1
+
+            target = os.path.join(directory, f"g{generation}")
+            staging = tempfile.mkdtemp(prefix=f".g{generation}.", dir=directory)
+            try:
+                np.save(os.path.join(staging, "centroids.npy"), compacted.centroids)
+                np.save(os.path.join(staging, "vectors.npy"), compacted.vectors.records)
+                np.save(os.path.join(staging, "keys.npy"), compacted.keys)
+                np.save(os.path.join(staging, "offsets.npy"), compacted.offsets)
+                # Left over from a save that died before publishing; nobody can be reading it
+                shutil.rmtree(target, ignore_errors=True)
+                os.rename(staging, target)
+            except BaseException:
+                shutil.rmtree(staging, ignore_errors=True)
+                raise
+            tmp_path = os.path.join(directory, f".current.{generation}.tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"generation": generation, "trained_size": self.trained_size, "nprobe": self.nprobe}, f)
+            os.replace(tmp_path, manifest_path)
+
+            # Keep the previous generation for workers that have not reloaded yet
+            stale = os.path.join(directory, f"g{generation - 2}")
+            if os.path.isdir(stale):
+                shutil.rmtree(stale, ignore_errors=True)
+
+    @classmethod
+    def load(cls, directory: str, nprobe: int | None = None) -> "IVFIndex":
+        """Memory-map the published generation; only centroids and offsets are read into RAM"""
+        with open(os.path.join(directory, "current.json"), encoding="utf-8") as f:
+            manifest = json.load(f)
+        source = os.path.join(directory, f"g{manifest['generation']}")
+        vectors = QuantizedMatrix(np.load(os.path.join(source, "vectors.npy"), mmap_mode="r"))
+        return cls(
+            np.load(os.path.join(source, "centroids.npy")),
+            vectors,
+            np.load(os.path.join(source, "keys.npy"), mmap_mode="r"),
+            np.load(os.path.join(source, "offsets.npy")),
+            manifest["trained_size"],
+            nprobe or manifest.get("nprobe", ANN_NPROBE),
+            vectors.storage
+        )
+
+    def recall_at_k(self, queries: np.ndarray, vectors: np.ndarray, keys: list[str], k: int = 10,
+                    nprobe: int | None = None) -> dict[str, Any]:
+        """Mean recall@k and latency of search() against an exact scan of the same vectors"""
+        keys_array = np.asarray(keys, dtype=str)
+        recalls, ann_ms, exact_ms = [], [], []
+        for query in np.asarray(queries, dtype=np.float32):
+            started = time.perf_counter()
+            scores = vectors @ query
+            exact = keys_array[np.argpartition(-scores, min(k, len(scores)) - 1)[:k]]
+            exact_ms.append((time.perf_counter() - started) * 1000)
+
+            started = time.perf_counter()
+            found, _ = self.search(query, k, nprobe)
+            ann_ms.append((time.perf_counter() - started) * 1000)
+            recalls.append(len(set(found) & set(exact.tolist())) / len(exact))
+        return {
+            "k": k,
+            "nprobe": min(nprobe or self.nprobe, self.n_lists),
+            "n_lists": self.n_lists,
+            "recall_at_k": round(float(np.mean(recalls)), 4),
+            "ann_ms_p50": round(float(np.percentile(ann_ms, 50)), 3),
+            "ann_ms_p95": round(float(np.percentile(ann_ms, 95)), 3),
+            "exact_ms_p50": round(float(np.percentile(exact_ms, 50)), 3),
+        }
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "size": len(self),
+            "n_lists": self.n_lists,
+            "nprobe": self.nprobe,
+            "storage": self.storage,
+            "vector_bytes": self.vectors.nbytes,
+            "trained_size": self.trained_size,
+            "pending_inserts": len(self.delta_list),
+            "tombstones": int((~self.alive).sum()),
+        }
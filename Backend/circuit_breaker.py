@@ -0,0 +1,110 @@
+"""
+Circuit Breaker
+Opens when recent calls to a dependency are too slow or failing, so callers serve their heuristic at once; a background probe closes it
+"""
+
+import asyncio
+import logging
+import statistics
+import time
+from collections import deque
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+class CircuitBreaker:
+    """Closed while the rolling window is healthy; open (every call short-circuits) until `probe` succeeds"""
+
+    def __init__(self, name: str, probe: Callable[[], Awaitable[None]], window_seconds: float = 60,
+                 min_calls: int = 20, max_error_rate: float = 0.5, max_p95_seconds: float = 8,
+                 probe_interval_seconds: float = 15):
+        self.name = name
+        self.probe = probe
+        self.window_seconds = window_seconds
+        self.min_calls = min_calls
+        self.max_error_rate = max_error_rate
+        self.max_p95_seconds = max_p95_seconds
+        self.probe_interval_seconds = probe_interval_seconds
+        self.samples: deque[tuple[float, float, bool]] = deque()
+        self.state = "closed"
+        self.reason = ""
+        self.opened_at: float | None = None
+        self.trips = 0
+        self.short_circuits = 0
+        self.probes = 0
+        self._probe_task: asyncio.Task | None = None
+
+    @property
+    def is_open(self) -> bool:
+        return self.state == "open"
+
+    def allow(self) -> bool:
+        """Whether a call may go out; refused calls are counted as short circuits"""
+        if self.is_open:
+            self.short_circuits += 1
+            return False
+        return True
+
+    def record(self, seconds: float, ok: bool) -> None:
+        """Add one call outcome and open the breaker if the window now breaches a threshold"""
+        now = time.monotonic()
+        self.samples.append((now, seconds, ok))
+        while self.samples and self.samples[0][0] < now - self.window_seconds:
+            self.samples.popleft()
+        if self.is_open or len(self.samples) < self.min_calls:
+            return
+        error_rate, p95 = self._window()
+        if error_rate >= self.max_error_rate:
+            self.open(f"error rate {error_rate:.0%} over {len(self.samples)} calls")
+        elif p95 >= self.max_p95_seconds:
+            self.open(f"p95 latency {p95:.1f}s over {len(self.samples)} calls")
+
+    def _window(self) -> tuple[float, float]:
+        latencies = [seconds for _, seconds, _ in self.samples]
+        p95 = statistics.quantiles(latencies, n=20)[18] if len(latencies) > 1 else latencies[0]
+        return sum(not ok for _, _, ok in self.samples) / len(self.samples), p95
+
+    def open(self, reason: str) -> None:
+        self.state = "open"
+        self.reason = reason
+        self.opened_at = time.monotonic()
+        self.trips += 1
+        logger.warning("Circuit %s opened: %s", self.name, reason)
+        loop = asyncio.get_running_loop()
+        if self._probe_task is None or self._probe_task.done() or self._probe_task.get_loop() is not loop:
+            self._probe_task = loop.create_task(self._probe_until_healthy())
+
+    def close(self) -> None:
+        self.state = "closed"
+        self.reason = ""
+        self.opened_at = None
+        # Start the next window from scratch; the samples that tripped the breaker are stale
+        self.samples.clear()
+        logger.info("Circuit %s closed", self.name)
+
+    async def _probe_until_healthy(self) -> None:
+        while self.is_open:
+            await asyncio.sleep(self.probe_interval_seconds)
+            self.probes += 1
+            try:
+                await asyncio.wait_for(self.probe(), self.max_p95_seconds)
+            except Exception as e:
+                logger.info("Circuit %s probe failed: %s", self.name, e or type(e).__name__)
+                continue
+            self.close()
+
+    def stats(self) -> dict[str, Any]:
+        error_rate, p95 = self._window() if self.samples else (0.0, 0.0)
+        return {
+            "state": self.state,
+            "reason": self.reason,
+            "open_seconds": round(time.monotonic() - self.opened_at, 1) if self.opened_at else 0,
+            "window_calls": len(self.samples),
+            "error_rate": round(error_rate, 3),
+            "p95_seconds": round(p95, 3),
+            "trips": self.trips,
+            "short_circuits": self.short_circuits,
+            "probes": self.probes,
+        }
@@ -0,0 +1,43 @@
+"""
+Document Text Extraction
+Plain-text extraction from uploaded PDF / Word / text resumes, run in the governed parse process pool
+"""
+
+import hashlib
+import os
+import tempfile
+
+import docx2txt
+import fitz  # PyMuPDF
+
+from resource_governor import resource_governor
+from single_flight import single_flight
+
+# The same file uploaded by several users at once is parsed once
+parse_flight = single_flight("parse")
+
+def extract_text_from_content(contents: bytes, filename: str) -> str:
+    suffix = os.path.splitext(filename)[1].lower()
+    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
+        tmp.write(contents)
+        tmp.flush()
+        tmp_path = tmp.name
+    
+    try:
+        if suffix == ".pdf":
+            with fitz.open(stream=contents, filetype="pdf") as doc:
+                text = ""
+                for page in doc:
+                    text += page.get_text()
+        elif suffix in [".docx", ".doc"]:
+            text = docx2txt.process(tmp_path)
+        else:
+            text = contents.decode('utf-8', errors='ignore')
+        return text
+    finally:
+        os.unlink(tmp_path)
+
+async def extract_text_async(contents: bytes, filename: str) -> str:
+    """Extract text off the event loop, in a parse process when the resource plan allots any"""
+    key = (hashlib.sha256(contents).hexdigest(), os.path.splitext(filename)[1].lower())
+    return await parse_flight.do(key, lambda: resource_governor.run_parse(extract_text_from_content, contents, filename))
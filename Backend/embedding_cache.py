@@ -0,0 +1,234 @@
+"""
+Embedding Cache
+Two-tier embedding cache: an in-process LRU in front of an append-only memmap store on disk
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Any
+
+import numpy as np
+
+from quantization import EMBEDDING_STORAGE_DTYPE, decode_rows, encode_rows, row_dtype
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process use only
+    fcntl = None
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+DATA_DIR = os.getenv("CAREERFORGE_DATA_DIR", "data")
+EMBEDDING_CACHE_DIR = os.getenv("EMBEDDING_CACHE_DIR", os.path.join(DATA_DIR, "embedding_cache"))
+EMBEDDING_CACHE_MEMORY_ITEMS = int(os.getenv("EMBEDDING_CACHE_MEMORY_ITEMS", "20000"))
+EMBEDDING_CACHE_DISK = os.getenv("EMBEDDING_CACHE_DISK", "1") == "1"
+
+# Index records: 20-byte SHA-1 digest followed by the row number in the vector file
+_RECORD = np.dtype([("digest", "S20"), ("row", "<u4")])
+_GROW_ROWS = 4096
+
+# Models whose tokenizer lowercases its input; every other model gets case-sensitive cache keys
+UNCASED_MODELS = {"all-MiniLM-L6-v2", "all-MiniLM-L12-v2", "paraphrase-MiniLM-L6-v2", "multi-qa-MiniLM-L6-cos-v1"}
+
+def model_is_uncased(model_key: str) -> bool:
+    """Whether "Go" and "go" embed identically under the model named at the start of a cache model key"""
+    name = model_key.split("@", 1)[0]
+    return name.removeprefix("sentence-transformers/") in UNCASED_MODELS
+
+def normalize_text(text: str, fold_case: bool = True) -> str:
+    """Cache key form of a text; case is folded only where the model ignores it"""
+    text = re.sub(r"\s+", " ", text).strip()
+    return text.lower() if fold_case else text
+
+def text_digest(text: str, model_key: str, fold_case: bool = True) -> bytes:
+    return hashlib.sha1(f"{model_key}\x00{normalize_text(text, fold_case)}".encode()).digest()
+
+class DiskEmbeddingStore:
+    """Append-only vector file (memory-mapped, float32/float16/int8 rows) plus an append-only digest -> row index"""
+
+    def __init__(self, directory: str, storage: str = EMBEDDING_STORAGE_DTYPE):
+        self.directory = directory
+        self.storage = storage
+        os.makedirs(directory, exist_ok=True)
+        self.vectors_path = os.path.join(directory, "vectors.f32" if storage == "float32" else f"vectors.{storage}")
+        self.index_path = os.path.join(directory, "index.bin")
+        self.meta_path = os.path.join(directory, "meta.json")
+        self.dim: int | None = None
+        self.rows: dict[bytes, int] = {}
+        self._index_offset = 0
+        self._mmap: np.memmap | None = None
+        if os.path.exists(self.meta_path):
+            with open(self.meta_path, encoding="utf-8") as f:
+                self.dim = json.load(f)["dim"]
+        self._sync_index()
+
+    def _sync_index(self) -> None:
+        """Read index records appended since the last sync (possibly by another worker)"""
+        if not os.path.exists(self.index_path):
+            return
+        size = os.path.getsize(self.index_path)
+        usable = size - (size - self._index_offset) % _RECORD.itemsize
+        if usable <= self._index_offset:
+            return
+        with open(self.index_path, "rb") as f:
+            f.seek(self._index_offset)
+            records = np.frombuffer(f.read(usable - self._index_offset), dtype=_RECORD)
+        self.rows.update(zip(records["digest"].tolist(), records["row"].tolist(), strict=True))
+        self._index_offset = usable
+
+    @property
+    def row_bytes(self) -> int:
+        return row_dtype(self.dim, self.storage).itemsize
+
+    def _vectors(self, min_rows: int = 0) -> np.memmap | None:
+        if self.dim is None or not os.path.exists(self.vectors_path):
+            return None
+        capacity = os.path.getsize(self.vectors_path) // self.row_bytes
+        if self._mmap is None or len(self._mmap) < max(min_rows, capacity):
+            self._mmap = np.memmap(self.vectors_path, dtype=row_dtype(self.dim, self.storage), mode="r+", shape=(capacity,))
+        return self._mmap
+
+    def get(self, digest: bytes) -> np.ndarray | None:
+        row = self.rows.get(digest)
+        if row is None:
+            self._sync_index()
+            row = self.rows.get(digest)
+            if row is None:
+                return None
+        vectors = self._vectors(row + 1)
+        return decode_rows(vectors[row:row + 1])[0] if vectors is not None and row < len(vectors) else None
+
+    def put_many(self, items: list[tuple[bytes, np.ndarray]]) -> None:
+        with open(self.index_path, "ab") as index_file:
+            if fcntl:
+                fcntl.flock(index_file, fcntl.LOCK_EX)
+            try:
+                self._sync_index()
+                items = [(digest, vector) for digest, vector in items if digest not in self.rows]
+                if not items:
+                    return
+                if self.dim is None:
+                    self.dim = int(items[0][1].shape[-1])
+                    with open(self.meta_path, "w", encoding="utf-8") as f:
+                        json.dump({"dim": self.dim}, f)
+                first_row = self._index_offset // _RECORD.itemsize
+                needed = first_row + len(items)
+                size = os.path.getsize(self.vectors_path) if os.path.exists(self.vectors_path) else 0
+                if size < needed * self.row_bytes:
+                    with open(self.vectors_path, "ab") as f:
+                        f.truncate((needed + _GROW_ROWS) * self.row_bytes)
+                vectors = self._vectors(needed)
+                vectors[first_row:needed] = encode_rows(np.vstack([vector for _, vector in items]), self.storage)
+                records = np.zeros(len(items), dtype=_RECORD)
+                for i, (digest, _) in enumerate(items):
+                    records[i] = (digest, first_row + i)
+                vectors.flush()
+                # Vectors are durable before the index points at them
+                index_file.write(records.tobytes())
+                index_file.flush()
+                self._sync_index()
+            finally:
+                if fcntl:
+                    fcntl.flock(index_file, fcntl.LOCK_UN)
+
+    def bytes_used(self) -> int:
+        return (len(self.rows) * self.row_bytes if self.dim else 0) + self._index_offset
+
+class EmbeddingCache:
+    """In-process LRU of (optionally quantized) vectors backed by a persistent disk store"""
+
+    def __init__(self, model_key: str, memory_items: int = EMBEDDING_CACHE_MEMORY_ITEMS, disk: bool = EMBEDDING_CACHE_DISK,
+                 storage: str = EMBEDDING_STORAGE_DTYPE):
+        self.model_key = model_key
+        self.fold_case = model_is_uncased(model_key)
+        self.memory_items = memory_items
+        self.storage = storage
+        self._memory: OrderedDict[bytes, np.ndarray] = OrderedDict()
+        self._lock = threading.Lock()
+        # DiskEmbeddingStore is not thread-safe; its I/O is serialised separately from the memory tier
+        self._disk_lock = threading.Lock()
+        self.disk = None
+        if disk:
+            slug = re.sub(r"[^A-Za-z0-9_.-]+", "_", model_key)
+            if storage != "float32":
+                slug = f"{slug}-{storage}"
+            try:
+                self.disk = DiskEmbeddingStore(os.path.join(EMBEDDING_CACHE_DIR, slug), storage)
+            except Exception as e:
+                logger.error("Embedding disk cache disabled: %s", e)
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def get(self, text: str) -> np.ndarray | None:
+        vector = self.get_memory(text)
+        return vector if vector is not None else self.get_disk([text])[0]
+
+    def get_memory(self, text: str) -> np.ndarray | None:
+        """In-process tier only; cheap enough to call on the event loop. A None here is not counted as a miss"""
+        digest = text_digest(text, self.model_key, self.fold_case)
+        with self._lock:
+            record = self._memory.get(digest)
+            if record is None:
+                return None
+            self._memory.move_to_end(digest)
+            self.memory_hits += 1
+        return decode_rows(record)[0]
+
+    def get_disk(self, texts: list[str]) -> list[np.ndarray | None]:
+        """Disk tier for texts the memory tier missed; touches the filesystem, so call it from a worker thread"""
+        digests = [text_digest(text, self.model_key, self.fold_case) for text in texts]
+        if self.disk is None:
+            vectors = [None] * len(digests)
+        else:
+            with self._disk_lock:
+                vectors = [self.disk.get(digest) for digest in digests]
+        with self._lock:
+            for digest, vector in zip(digests, vectors, strict=True):
+                if vector is not None:
+                    self.disk_hits += 1
+                    self._remember(digest, vector)
+                else:
+                    self.misses += 1
+        return vectors
+
+    def put_many(self, texts: list[str], vectors: np.ndarray) -> None:
+        items = [(text_digest(text, self.model_key, self.fold_case), np.asarray(vector, dtype=np.float32)) for text, vector in zip(texts, vectors, strict=True)]
+        with self._lock:
+            for digest, vector in items:
+                self._remember(digest, vector)
+        # The disk write runs outside the memory lock so lookups keep being served while it flushes
+        if self.disk is not None:
+            try:
+                with self._disk_lock:
+                    self.disk.put_many(items)
+            except Exception as e:
+                logger.error("Error writing embeddings to disk cache: %s", e)
+
+    def _remember(self, digest: bytes, vector: np.ndarray) -> None:
+        self._memory[digest] = encode_rows(vector, self.storage)
+        self._memory.move_to_end(digest)
+        if len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+
+    def stats(self) -> dict[str, Any]:
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "model": self.model_key,
+            "case_folded": self.fold_case,
+            "storage": self.storage,
+            "memory_entries": len(self._memory),
+            "memory_bytes": sum(record.nbytes for record in self._memory.values()),
+            "disk_entries": len(self.disk.rows) if self.disk else 0,
+            "disk_bytes": self.disk.bytes_used() if self.disk else 0,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.memory_hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+        }
@@ -0,0 +1,97 @@
+"""
+Sentence Embeddings
+Shared SentenceTransformer model (torch, int8-quantized torch or ONNX Runtime) behind a cross-request micro-batcher
+"""
+
+import asyncio
+import logging
+import os
+
+import numpy as np
+from sentence_transformers import SentenceTransformer
+
+from embedding_cache import EmbeddingCache
+from inference_batcher import MicroBatcher
+from single_flight import single_flight
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+EMBEDDING_MODEL_REVISION = os.getenv("EMBEDDING_MODEL_REVISION", "main")
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "32"))
+EMBEDDING_BATCH_WAIT_MS = float(os.getenv("EMBEDDING_BATCH_WAIT_MS", "5"))
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")  # torch | torch-int8 | onnx
+EMBEDDING_ONNX_FILE = os.getenv("EMBEDDING_ONNX_FILE", "")  # e.g. onnx/model_qint8_avx512_vnni.onnx
+EMBEDDING_MAX_SEQ_LENGTH = int(os.getenv("EMBEDDING_MAX_SEQ_LENGTH", "0"))  # 0 keeps the model default
+
+def load_model(backend: str = EMBEDDING_BACKEND, max_seq_length: int = EMBEDDING_MAX_SEQ_LENGTH) -> SentenceTransformer:
+    """Load the embedder on CPU with the requested inference backend"""
+    if backend == "onnx":
+        # Uses the repo's exported ONNX graph if present, otherwise exports one (needs optimum[onnxruntime])
+        model_kwargs = {"file_name": EMBEDDING_ONNX_FILE} if EMBEDDING_ONNX_FILE else None
+        loaded = SentenceTransformer(EMBEDDING_MODEL, device="cpu", revision=EMBEDDING_MODEL_REVISION,
+                                     backend="onnx", model_kwargs=model_kwargs)
+    else:
+        loaded = SentenceTransformer(EMBEDDING_MODEL, device="cpu", revision=EMBEDDING_MODEL_REVISION)
+        if backend == "torch-int8":
+            import torch
+            loaded = torch.ao.quantization.quantize_dynamic(loaded, {torch.nn.Linear}, dtype=torch.qint8)
+        elif backend != "torch":
+            raise ValueError(f"Unknown embedding backend: {backend}")
+    if max_seq_length:
+        loaded.max_seq_length = max_seq_length
+    return loaded
+
+# Load sentence transformer model for semantic matching
+try:
+    model = load_model()
+    logger.info("Loaded SentenceTransformer %s (%s backend, max_seq_length=%s)", EMBEDDING_MODEL, EMBEDDING_BACKEND, model.max_seq_length)
+except Exception as backend_error:
+    if EMBEDDING_BACKEND == "torch":
+        logger.error("Error loading sentence transformer: %s", backend_error)
+        model = None
+    else:
+        logger.error("Error loading %s embedding backend, falling back to torch: %s", EMBEDDING_BACKEND, backend_error)
+        EMBEDDING_BACKEND = "torch"
+        try:
+            model = load_model("torch")
+        except Exception as model_error:
+            logger.error("Error loading sentence transformer: %s", model_error)
+            model = None
+
+# Vectors from different backends or sequence caps differ slightly, so each gets its own cache namespace
+EMBEDDING_MODEL_KEY = f"{EMBEDDING_MODEL}@{EMBEDDING_MODEL_REVISION}/{EMBEDDING_BACKEND}/{EMBEDDING_MAX_SEQ_LENGTH or 'default'}"
+embedding_cache = EmbeddingCache(EMBEDDING_MODEL_KEY)
+
+def encode_batch(texts: list[str]) -> np.ndarray:
+    """Run one forward pass over a batch of texts (called from the batcher's worker thread)"""
+    vectors = model.encode(texts, batch_size=len(texts), convert_to_numpy=True, show_progress_bar=False)
+    embedding_cache.put_many(texts, vectors)
+    return vectors
+
+embedding_batcher = MicroBatcher(
+    encode_batch,
+    max_batch_size=EMBEDDING_BATCH_SIZE,
+    max_wait_ms=EMBEDDING_BATCH_WAIT_MS,
+    name="embedder"
+)
+
+# A text another request is already encoding is awaited rather than encoded twice
+embedding_flight = single_flight("embedding")
+
+async def embed_texts(texts: list[str]) -> np.ndarray:
+    """Embed texts, serving repeats from the cache and sharing forward passes with concurrent requests"""
+    vectors = [embedding_cache.get_memory(text) for text in texts]
+    cold = list(dict.fromkeys(text for text, vector in zip(texts, vectors, strict=True) if vector is None))
+    if cold:
+        # Disk lookups read the memmap and may re-sync the index file, so they stay off the event loop
+        from_disk = dict(zip(cold, await asyncio.to_thread(embedding_cache.get_disk, cold), strict=True))
+        vectors = [from_disk[text] if vector is None else vector for text, vector in zip(texts, vectors, strict=True)]
+    missing = list(dict.fromkeys(text for text, vector in zip(texts, vectors, strict=True) if vector is None))
+    if missing:
+        if model is None:
+            raise RuntimeError("Sentence transformer model is not available")
+        encoded = dict(zip(missing, await embedding_flight.do_many(missing, embedding_batcher.submit_many), strict=True))
+        vectors = [encoded[text] if vector is None else vector for text, vector in zip(texts, vectors, strict=True)]
+    return np.vstack(vectors).astype(np.float32, copy=False)
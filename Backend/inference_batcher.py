@@ -0,0 +1,107 @@
+"""
+Inference Micro-Batcher
+Coalesces concurrent single-item inference calls into batched forward passes run in a worker thread
+"""
+
+import asyncio
+import logging
+import time
+from collections.abc import Callable, Sequence
+from concurrent.futures import Executor
+from typing import Any
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+class MicroBatcher:
+    """Gathers pending inputs for up to max_wait_ms or max_batch_size items, then runs one batch"""
+
+    def __init__(
+        self,
+        batch_fn: Callable[[list[Any]], Sequence[Any]],
+        max_batch_size: int = 32,
+        max_wait_ms: float = 5.0,
+        name: str = "batcher",
+        executor: Executor | None = None,
+    ):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.name = name
+        self.executor = executor
+        self._queue: asyncio.Queue | None = None
+        self._worker: asyncio.Task | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self.batches = 0
+        self.items = 0
+        self.busy_seconds = 0.0
+
+    def _ensure_worker(self) -> asyncio.Queue:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._worker is None or self._worker.done():
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._worker = loop.create_task(self._run(self._queue), name=f"{self.name}-worker")
+        return self._queue
+
+    async def submit(self, item: Any) -> Any:
+        """Queue one input and wait for its result from the next batch"""
+        future = asyncio.get_running_loop().create_future()
+        self._ensure_worker().put_nowait((item, future))
+        return await future
+
+    async def submit_many(self, items: list[Any]) -> list[Any]:
+        """Queue several inputs; they may be split across or share batches with other callers"""
+        return list(await asyncio.gather(*(self.submit(item) for item in items)))
+
+    async def _collect(self, queue: asyncio.Queue) -> list[tuple[Any, asyncio.Future]]:
+        batch = [await queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(queue.get(), timeout))
+            except TimeoutError:
+                break
+        # Drop callers that gave up while waiting
+        return [(item, future) for item, future in batch if not future.done()]
+
+    async def _run(self, queue: asyncio.Queue) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect(queue)
+            if not batch:
+                continue
+            inputs = [item for item, _ in batch]
+            started = time.perf_counter()
+            try:
+                outputs = await loop.run_in_executor(self.executor, self.batch_fn, inputs)
+                if len(outputs) != len(inputs):
+                    raise ValueError(f"batch_fn returned {len(outputs)} outputs for {len(inputs)} inputs")
+            except Exception as e:
+                logger.error("%s batch of %d failed: %s", self.name, len(inputs), e)
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            finally:
+                self.busy_seconds += time.perf_counter() - started
+                self.batches += 1
+                self.items += len(inputs)
+            for (_, future), output in zip(batch, outputs, strict=True):
+                if not future.done():
+                    future.set_result(output)
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "name": self.name,
+            "batches": self.batches,
+            "items": self.items,
+            "avg_batch_size": round(self.items / self.batches, 2) if self.batches else 0,
+            "busy_seconds": round(self.busy_seconds, 3),
+            "pending": self._queue.qsize() if self._queue else 0,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+        }
@@ -0,0 +1,93 @@
+"""
+Job Catalog Loader
+Reads job postings from jobs.json and the jobs table into one normalized list
+"""
+
+import json
+import logging
+import os
+from typing import Any
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+JOBS_JSON_PATH = os.getenv("JOBS_JSON_PATH", "jobs.json")
+
+def _parse_skills(raw: Any) -> list[str]:
+    """Parse a skills field stored as a list, a JSON string or a comma separated string"""
+    if not raw:
+        return []
+    if isinstance(raw, list):
+        return [str(skill).strip() for skill in raw if str(skill).strip()]
+    try:
+        parsed = json.loads(raw)
+        if isinstance(parsed, list):
+            return [str(skill).strip() for skill in parsed if str(skill).strip()]
+    except (TypeError, ValueError):
+        pass
+    return [skill.strip() for skill in str(raw).split(",") if skill.strip()]
+
+def load_json_jobs(path: str = JOBS_JSON_PATH) -> list[dict[str, Any]]:
+    """Load jobs from the bundled jobs.json catalog"""
+    if not os.path.exists(path):
+        return []
+    try:
+        with open(path, encoding="utf-8") as f:
+            raw_jobs = json.load(f)
+    except Exception as e:
+        logger.error("Error reading job catalog %s: %s", path, e)
+        return []
+
+    jobs = []
+    for index, job in enumerate(raw_jobs):
+        jobs.append({
+            "id": f"json:{index}",
+            "title": job.get("title", ""),
+            "company": job.get("company", ""),
+            "description": job.get("description", ""),
+            "location": job.get("location", ""),
+            "salary_range": job.get("salary_range", ""),
+            "skills": _parse_skills(job.get("skills_required") or job.get("required_skills")),
+            "is_active": job.get("is_active", True),
+        })
+    return jobs
+
+def load_db_jobs(include_inactive: bool = False) -> list[dict[str, Any]]:
+    """Load jobs from the jobs table, returning an empty list if the database is unavailable"""
+    try:
+        from database import SessionLocal
+        from schemas import Job
+    except Exception as e:
+        logger.warning("Job table unavailable: %s", e)
+        return []
+
+    db = SessionLocal()
+    try:
+        query = db.query(Job)
+        if not include_inactive:
+            query = query.filter(Job.is_active.is_(True))
+        return [
+            {
+                "id": f"db:{job.id}",
+                "title": job.title or "",
+                "company": job.company or "",
+                "description": job.description or "",
+                "location": job.location or "",
+                "salary_range": job.salary_range or "",
+                "skills": _parse_skills(job.required_skills),
+                "is_active": bool(job.is_active),
+            }
+            for job in query.all()
+        ]
+    except Exception as e:
+        logger.warning("Error loading jobs from database: %s", e)
+        return []
+    finally:
+        db.close()
+
+def load_catalog_jobs(include_inactive: bool = False) -> list[dict[str, Any]]:
+    """Load the full job catalog (jobs.json plus the jobs table)"""
+    jobs = load_json_jobs() + load_db_jobs(include_inactive=include_inactive)
+    if not include_inactive:
+        jobs = [job for job in jobs if job["is_active"]]
+    return jobs
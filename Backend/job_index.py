@@ -0,0 +1,319 @@
+"""
+Job Embedding Index
+Precomputed, L2-normalized job embedding matrix (memory-mapped, optionally quantized) for ranking resumes against the job catalog
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import Any
+
+import numpy as np
+
+from ann_index import IVFIndex
+from embeddings import EMBEDDING_MODEL_KEY, embed_texts
+from job_catalog import load_catalog_jobs
+from quantization import QuantizedMatrix, encode_rows
+from skill_graph import DATA_DIR, normalize_skill
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process use only
+    fcntl = None
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+JOB_INDEX_PATH = os.getenv("JOB_INDEX_PATH", os.path.join(DATA_DIR, "job_embeddings"))
+JOB_RANK_SEMANTIC_WEIGHT = float(os.getenv("JOB_RANK_SEMANTIC_WEIGHT", "0.6"))
+JOB_ANN_PATH = os.getenv("JOB_ANN_PATH", os.path.join(DATA_DIR, "job_ann"))
+JOB_ANN_THRESHOLD = int(os.getenv("JOB_ANN_THRESHOLD", "50000"))
+JOB_ANN_CANDIDATES = int(os.getenv("JOB_ANN_CANDIDATES", "200"))
+
+def job_text(job: dict[str, Any]) -> str:
+    """Text embedded for a job: title, skills and description"""
+    return f"{job['title']}. Skills: {', '.join(job['skills'])}. {job['description']}"
+
+def job_hash(job: dict[str, Any]) -> str:
+    return hashlib.sha1(job_text(job).encode()).hexdigest()
+
+def _temp_path(path: str, suffix: str) -> str:
+    """A fresh file next to `path` (same filesystem, so os.replace stays atomic)"""
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix=f"{os.path.basename(path)}.", suffix=f".tmp{suffix}", dir=directory)
+    os.close(fd)
+    return tmp_path
+
+@asynccontextmanager
+async def _build_lock(path: str) -> AsyncIterator[None]:
+    """Exclusive across workers for a load-diff-publish of the index at `path`; waits off the event loop"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(f"{path}.lock", "w") as lock_file:
+        if fcntl:
+            await asyncio.to_thread(fcntl.flock, lock_file, fcntl.LOCK_EX)
+        yield
+
+def l2_normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+class JobIndexState:
+    """One immutable version of the index; rank() reads a single reference"""
+
+    def __init__(self, matrix: QuantizedMatrix, jobs: list[dict[str, Any]], hashes: list[str], built_at: str,
+                 ann: IVFIndex | None = None):
+        self.matrix = matrix
+        self.ann = ann
+        self.jobs = jobs
+        self.hashes = hashes
+        self.built_at = built_at
+        self.row_by_id = {job["id"]: row for row, job in enumerate(jobs)}
+
+        # CSR job x skill incidence for vectorised skill-overlap scoring
+        self.skill_ids: dict[str, int] = {}
+        indptr = [0]
+        indices: list[int] = []
+        for job in jobs:
+            for skill in {normalize_skill(skill) for skill in job["skills"]}:
+                indices.append(self.skill_ids.setdefault(skill, len(self.skill_ids)))
+            indptr.append(len(indices))
+        self.skill_indptr = np.asarray(indptr, dtype=np.int64)
+        self.skill_indices = np.asarray(indices, dtype=np.int32)
+        self.skill_totals = np.diff(self.skill_indptr).astype(np.float32)
+
+    def skill_overlap(self, resume_skills: list[str], rows: np.ndarray | None = None) -> np.ndarray:
+        """Fraction of each job's required skills present in the resume (all jobs, or just the given rows)"""
+        have = np.zeros(len(self.skill_ids) + 1, dtype=np.float32)
+        for skill in resume_skills:
+            skill_id = self.skill_ids.get(normalize_skill(skill))
+            if skill_id is not None:
+                have[skill_id] = 1
+        if rows is not None:
+            starts, ends = self.skill_indptr[rows], self.skill_indptr[rows + 1]
+            hits = np.array([have[self.skill_indices[start:end]].sum() for start, end in zip(starts, ends, strict=True)], dtype=np.float32)
+            return hits / np.maximum(self.skill_totals[rows], 1)
+        # Trailing zero keeps every row start a valid reduceat offset; empty rows are zeroed afterwards
+        values = np.append(have[self.skill_indices], np.float32(0))
+        hits = np.add.reduceat(values, self.skill_indptr[:-1])
+        hits[self.skill_totals == 0] = 0
+        return hits / np.maximum(self.skill_totals, 1)
+
+class JobEmbeddingIndex:
+    """Ranks a resume embedding against every job with one matrix-vector product.
+
+    Each build is one immutable generation directory (matrix plus the jobs and hashes of its rows) and
+    current.json names the published one, so a reader never pairs one build's matrix with another's jobs.
+    """
+
+    def __init__(self, path: str = JOB_INDEX_PATH):
+        self.path = path
+        self.manifest_path = os.path.join(path, "current.json")
+        self.state: JobIndexState | None = None
+        self.generation: int | None = None
+        self._refresh_lock: asyncio.Lock | None = None
+
+    def _published_generation(self) -> int | None:
+        try:
+            with open(self.manifest_path, encoding="utf-8") as f:
+                return int(json.load(f)["generation"])
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    def load(self) -> bool:
+        """Memory-map the published generation"""
+        generation = self._published_generation()
+        if generation is None:
+            return False
+        try:
+            source = os.path.join(self.path, f"g{generation}")
+            with open(os.path.join(source, "meta.json"), encoding="utf-8") as f:
+                meta = json.load(f)
+            if meta.get("model") != EMBEDDING_MODEL_KEY:
+                logger.info("Job index was built with %s, re-embedding with %s", meta.get("model"), EMBEDDING_MODEL_KEY)
+                return False
+            matrix = QuantizedMatrix(np.load(os.path.join(source, "matrix.npy"), mmap_mode="r"))
+            if not len(matrix) == len(meta["jobs"]) == len(meta["hashes"]):
+                logger.error("Job index generation %d has %d rows for %d jobs, ignoring it",
+                             generation, len(matrix), len(meta["jobs"]))
+                return False
+            ann = None
+            if len(matrix) >= JOB_ANN_THRESHOLD and os.path.exists(os.path.join(JOB_ANN_PATH, "current.json")):
+                ann = IVFIndex.load(JOB_ANN_PATH)
+            self.state = JobIndexState(matrix, meta["jobs"], meta["hashes"], meta["built_at"], ann)
+            self.generation = generation
+            return True
+        except Exception as e:
+            logger.error("Error loading job index: %s", e)
+            return False
+
+    async def refresh(self) -> dict[str, int]:
+        """Re-embed only new or changed jobs, drop removed ones and swap in the new matrix"""
+        if self._refresh_lock is None:
+            self._refresh_lock = asyncio.Lock()
+        # Workers starting together all refresh; under the build lock the later ones diff against the
+        # generation the first one published and usually have nothing left to embed
+        async with self._refresh_lock, _build_lock(self.path):
+            published = await asyncio.to_thread(self._published_generation)
+            if self.state is None or published != self.generation:
+                self.load()
+            jobs = await asyncio.to_thread(load_catalog_jobs)
+            hashes = [job_hash(job) for job in jobs]
+            old = self.state
+            if old is not None and old.hashes == hashes and [job["id"] for job in old.jobs] == [job["id"] for job in jobs]:
+                logger.info("Job index generation %s is current (%d jobs)", self.generation, len(jobs))
+                return {"jobs": len(jobs), "embedded": 0, "removed": 0}
+            old_rows = {}
+            if old is not None:
+                old_rows = {(job["id"], digest): row for row, (job, digest) in enumerate(zip(old.jobs, old.hashes, strict=True))}
+
+            changed = [i for i, (job, digest) in enumerate(zip(jobs, hashes, strict=True)) if (job["id"], digest) not in old_rows]
+            new_vectors = l2_normalize(await embed_texts([job_text(jobs[i]) for i in changed])) if changed else None
+
+            dim = new_vectors.shape[1] if new_vectors is not None else (old.matrix.shape[1] if old is not None else 0)
+            matrix = np.zeros((len(jobs), dim), dtype=np.float32)
+            reused = [(i, old_rows[(job["id"], digest)]) for i, (job, digest) in enumerate(zip(jobs, hashes, strict=True))
+                      if (job["id"], digest) in old_rows]
+            if reused:
+                matrix[[i for i, _ in reused]] = old.matrix[[row for _, row in reused]]
+            if new_vectors is not None:
+                matrix[changed] = new_vectors
+
+            removed = {job["id"] for job in old.jobs} - {job["id"] for job in jobs} if old is not None else set()
+            ann = await self._update_ann(old, matrix, jobs, changed, removed)
+
+            built_at = datetime.now().isoformat()
+            records = encode_rows(matrix)
+            self.generation = await asyncio.to_thread(self._write, records, jobs, hashes, built_at)
+            self.state = JobIndexState(QuantizedMatrix(records), jobs, hashes, built_at, ann)
+            summary = {"jobs": len(jobs), "embedded": len(changed), "removed": len(removed)}
+            logger.info("Job index refreshed: %s", summary)
+            return summary
+
+    async def _update_ann(self, old: JobIndexState | None, matrix: np.ndarray, jobs: list[dict[str, Any]],
+                          changed: list[int], removed: set[str]) -> IVFIndex | None:
+        """Apply inserts/deletes to the ANN index (or retrain it) once the catalog is large enough"""
+        if len(jobs) < JOB_ANN_THRESHOLD:
+            return None
+        ann = old.ann if old is not None else None
+        ids = [job["id"] for job in jobs]
+        if ann is None or ann.needs_retrain():
+            ann = await asyncio.to_thread(IVFIndex.train, matrix, ids)
+        else:
+            # Jobs leaving the active catalog are deleted; new and edited jobs are (re)inserted
+            ann.remove(sorted(removed))
+            ann.add([ids[i] for i in changed], matrix[changed])
+        await asyncio.to_thread(ann.save, JOB_ANN_PATH)
+        return IVFIndex.load(JOB_ANN_PATH)
+
+    def _write(self, records: np.ndarray, jobs: list[dict[str, Any]], hashes: list[str], built_at: str) -> int:
+        """Write a new generation and publish it; runs under the build lock. Returns the generation number"""
+        generation = (self._published_generation() or 0) + 1
+        target = os.path.join(self.path, f"g{generation}")
+        os.makedirs(self.path, exist_ok=True)
+        staging = tempfile.mkdtemp(prefix=f".g{generation}.", dir=self.path)
+        try:
+            np.save(os.path.join(staging, "matrix.npy"), records)
+            with open(os.path.join(staging, "meta.json"), "w", encoding="utf-8") as f:
+                json.dump({"model": EMBEDDING_MODEL_KEY, "jobs": jobs, "hashes": hashes, "built_at": built_at}, f)
+            # Left over from a build that died before publishing; nobody can be reading it
+            shutil.rmtree(target, ignore_errors=True)
+            os.rename(staging, target)
+        except BaseException:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+
+        tmp_manifest = _temp_path(self.manifest_path, ".json")
+        try:
+            with open(tmp_manifest, "w", encoding="utf-8") as f:
+                json.dump({"generation": generation, "built_at": built_at}, f)
+            os.replace(tmp_manifest, self.manifest_path)
+        finally:
+            if os.path.exists(tmp_manifest):
+                os.unlink(tmp_manifest)
+
+        # Keep the previous generation for workers still loading it
+        shutil.rmtree(os.path.join(self.path, f"g{generation - 2}"), ignore_errors=True)
+        return generation
+
+    async def ensure_ready(self) -> JobIndexState:
+        if self.state is None and not self.load():
+            await self.refresh()
+        return self.state
+
+    def rank(self, resume_vector: np.ndarray, resume_skills: list[str], top_k: int = 3) -> list[dict[str, Any]]:
+        """Top-k jobs by a blend of cosine similarity and skill overlap"""
+        state = self.state
+        if state is None or not state.jobs:
+            return []
+        query = l2_normalize(np.asarray(resume_vector, dtype=np.float32))
+        if state.ann is not None:
+            # Shortlist semantically by ANN, then blend in skill overlap for the shortlist only
+            keys, semantic = state.ann.search(query, max(JOB_ANN_CANDIDATES, top_k))
+            candidates = [(state.row_by_id[key], score) for key, score in zip(keys, semantic, strict=True) if key in state.row_by_id]
+            rows = np.array([row for row, _ in candidates], dtype=np.int64)
+            semantic = np.array([score for _, score in candidates], dtype=np.float32)
+            overlap = state.skill_overlap(resume_skills, rows)
+        else:
+            rows = np.arange(len(state.jobs))
+            semantic = state.matrix @ query
+            overlap = state.skill_overlap(resume_skills)
+        scores = JOB_RANK_SEMANTIC_WEIGHT * semantic + (1 - JOB_RANK_SEMANTIC_WEIGHT) * overlap
+
+        top_k = min(top_k, len(scores))
+        if top_k <= 0:
+            return []
+        top = np.argpartition(-scores, top_k - 1)[:top_k]
+        top = top[np.argsort(-scores[top])]
+
+        resume_keys = {normalize_skill(skill) for skill in resume_skills}
+        results = []
+        for i in top:
+            job = state.jobs[rows[i]]
+            results.append({
+                "job_id": job["id"],
+                "title": job["title"],
+                "company": job["company"],
+                "location": job["location"],
+                "score": round(float(scores[i]) * 100, 2),
+                "semantic_score": round(float(semantic[i]) * 100, 2),
+                "skill_overlap": round(float(overlap[i]) * 100, 2),
+                "matched_skills": [skill for skill in job["skills"] if normalize_skill(skill) in resume_keys],
+                "missing_skills": [skill for skill in job["skills"] if normalize_skill(skill) not in resume_keys],
+            })
+        return results
+
+    def evaluate_ann(self, sample: int = 200, k: int = 10, nprobe_values: tuple[int, ...] = (1, 4, 16, 64)) -> list[dict[str, Any]]:
+        """Recall@k and latency of the ANN index against the exact scan, using catalog jobs as queries"""
+        state = self.state
+        if state is None or state.ann is None:
+            return []
+        rng = np.random.default_rng(0)
+        queries = state.matrix[np.sort(rng.choice(len(state.jobs), min(sample, len(state.jobs)), replace=False))]
+        ids = [job["id"] for job in state.jobs]
+        return [state.ann.recall_at_k(queries, state.matrix, ids, k, nprobe) for nprobe in nprobe_values]
+
+# Global instance
+job_index = JobEmbeddingIndex()
+
+async def rank_jobs_for_resume(resume_text: str, resume_skills: list[str], top_k: int = 3) -> list[dict[str, Any]]:
+    """Convenience function: embed a resume and return its top-k catalog jobs"""
+    await job_index.ensure_ready()
+    # Skills lead the text so they survive the model's sequence-length truncation
+    resume_vector = (await embed_texts([f"Skills: {', '.join(resume_skills)}. {resume_text}"]))[0]
+    return job_index.rank(resume_vector, resume_skills, top_k)
+
+async def refresh_job_index() -> dict[str, int] | None:
+    """Convenience function for startup and the skills update job; failures are logged, not raised"""
+    try:
+        return await job_index.refresh()
+    except Exception as e:
+        logger.error("Error refreshing job index: %s", e)
+        return None
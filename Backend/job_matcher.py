@@ -4,17 +4,21 @@ Handles comprehensive job matching with AI enhancement, skill analysis, and real
 """
 
 
-import json
 import logging
 import os
-import re
 from datetime import datetime
 from typing import Any
 
-import openai
 from dotenv import load_dotenv
-from sentence_transformers import SentenceTransformer
-from sklearn.metrics.pairwise import cosine_similarity
+
+import llm_gateway
+from embeddings import model
+from llm_cache import canonical_list
+from market_intel import get_market_intel
+from prompt_builder import job_description_context, prompt_messages
+from skill_embeddings import skill_similarity
+from task_graph import TaskGraph
+from taxonomy import TaxonomySnapshot, VersionedCache, current_taxonomy
 
 
 def extract_skills_from_text(_):
@@ -24,254 +28,240 @@ def extract_skills_from_text(_):
 # Load environment variables
 load_dotenv()
 
-# Configure OpenAI
-openai.api_key = os.getenv("OPENAI_API_KEY")
-
 # Setup logging
 logger = logging.getLogger(__name__)
 
-# Load sentence transformer model for semantic matching
-try:
-    model = SentenceTransformer('all-MiniLM-L6-v2')
-    logger.info("Loaded pretrained SentenceTransformer: all-MiniLM-L6-v2")
-except Exception as model_error:
-    logger.error("Error loading sentence transformer: %s", model_error)
-    model = None
+# Per-branch deadlines inside the analysis pipelines; a late branch is replaced by its heuristic. AI branches
+# already fall back after the LLM latency budget, so by default they get just that plus a second of slack
+ANALYSIS_LLM_DEADLINE_SECONDS = float(
+    os.getenv("ANALYSIS_LLM_DEADLINE_SECONDS", str(llm_gateway.LLM_LATENCY_BUDGET_SECONDS + 1))
+)
+ANALYSIS_EMBEDDING_DEADLINE_SECONDS = float(os.getenv("ANALYSIS_EMBEDDING_DEADLINE_SECONDS", "3"))
+
+def match_metrics(resume_skills: list[str], job_skills: list[str]) -> dict[str, Any]:
+    """Exact skill overlap between a resume and a job"""
+    matched_skills = [skill for skill in job_skills if skill in resume_skills]
+    return {
+        "match_score": len(matched_skills) / max(1, len(job_skills)) * 100,
+        "matched_skills": matched_skills,
+        "missing_skills": [skill for skill in job_skills if skill not in resume_skills],
+        "extra_skills": [skill for skill in resume_skills if skill not in job_skills],
+    }
+
+def job_analysis_result(job_skills: list[str], ai_analysis: dict[str, Any], snapshot: TaxonomySnapshot) -> dict[str, Any]:
+    return {
+        "skills": job_skills,
+        "ai_analysis": ai_analysis,
+        "taxonomy_version": snapshot.version,
+        "timestamp": datetime.now().isoformat()
+    }
+
+def market_trends_result(skills: list[str], trends: dict[str, Any]) -> dict[str, Any]:
+    return {
+        "skills": skills,
+        "trends": trends,
+        "timestamp": datetime.now().isoformat()
+    }
+
+def fallback_job_analysis(job_skills: list[str]) -> dict[str, Any]:
+    """Heuristic job analysis used without AI or when the AI branch fails"""
+    return {
+        "required_skills": job_skills,
+        "experience_level": "mid",
+        "industry": "Technology",
+        "responsibilities": ["Develop software", "Collaborate with team"],
+        "salary_range": "$60k-$120k",
+        "qualifications": ["Bachelor's degree", "Relevant experience"],
+        "nice_to_have": []
+    }
+
+def fallback_match_analysis(metrics: dict[str, Any]) -> dict[str, Any]:
+    """Heuristic match analysis used without AI or when the AI branch fails"""
+    return {
+        "match_analysis": f"Match score: {metrics['match_score']}%",
+        "strengths": metrics["matched_skills"],
+        "improvements": metrics["missing_skills"],
+        "interview_tips": ["Highlight relevant experience"],
+        "salary_insights": "Research market rates",
+        "career_suggestions": ["Learn missing skills"]
+    }
+
+def fallback_market_trends() -> dict[str, Any]:
+    """Heuristic market trends used without AI or when the AI branch fails"""
+    return {
+        "demand_trends": "Stable",
+        "salary_trends": "Increasing",
+        "opportunities": "Good",
+        "risks": "Low",
+        "outlook": "Positive",
+        "hotspots": ["Silicon Valley", "New York", "London"]
+    }
 
-# Comprehensive skills database
-SKILLS_DATABASE = {
-    "programming_languages": [
-        "Python", "Java", "JavaScript", "TypeScript", "C++", "C#", "Go", "Rust",
-        "PHP", "Ruby", "Swift", "Kotlin", "Scala", "R", "MATLAB", "Perl", "Dart"
-    ],
-    "frameworks": [
-        "React", "Angular", "Vue.js", "Node.js", "Express", "Django", "Flask",
-        "Spring", "Laravel", "Ruby on Rails", "ASP.NET", "FastAPI", "Gin",
-        "Next.js", "Nuxt.js", "Svelte", "Ember.js"
-    ],
-    "databases": [
-        "MySQL", "PostgreSQL", "MongoDB", "Redis", "Cassandra", "Oracle",
-        "SQL Server", "SQLite", "Neo4j", "Elasticsearch", "DynamoDB",
-        "MariaDB", "CouchDB", "InfluxDB", "TimescaleDB"
-    ],
-    "cloud_platforms": [
-        "AWS", "Azure", "Google Cloud", "IBM Cloud", "Oracle Cloud",
-        "DigitalOcean", "Heroku", "Vercel", "Netlify", "Firebase",
-        "Alibaba Cloud", "Tencent Cloud"
-    ],
-    "devops_tools": [
-        "Docker", "Kubernetes", "Jenkins", "GitLab CI", "GitHub Actions",
-        "Terraform", "Ansible", "Chef", "Puppet", "Prometheus", "Grafana",
-        "ELK Stack", "Splunk", "Datadog", "New Relic"
-    ],
-    "ai_ml": [
-        "TensorFlow", "PyTorch", "Scikit-learn", "Keras", "OpenCV",
-        "NLTK", "spaCy", "Hugging Face", "Pandas", "NumPy", "Matplotlib",
-        "Seaborn", "Plotly", "Jupyter", "MLflow", "Kubeflow"
-    ],
-    "soft_skills": [
-        "Leadership", "Communication", "Problem Solving", "Teamwork",
-        "Time Management", "Adaptability", "Creativity", "Critical Thinking",
-        "Project Management", "Agile", "Scrum", "Kanban"
-    ]
-}
+def local_skill_recommendations(current_skills: list[str], target_role: str) -> dict[str, Any]:
+    """Skill recommendations from the local skill graph alone (no AI enrichment)"""
+    return {
+        "current_skills": current_skills,
+        "target_role": target_role,
+        "recommendations": {
+            "priority": "Medium",
+            "learning_path": "Online courses",
+            "time_to_acquire": "3-6 months",
+            "resources": ["Coursera", "Udemy", "YouTube"],
+            "market_demand": "High",
+            "salary_impact": "10-20% increase",
+            **current_taxonomy().skill_graph.recommend(current_skills, target_role)
+        },
+        "timestamp": datetime.now().isoformat()
+    }
 
 class RealTimeJobMatcher:
     """Real-time job matching with AI enhancement"""
     
     def __init__(self):
         self.model = model
-        self.skills_cache = {}
-        self.job_cache = {}
+        self.skills_cache = VersionedCache(maxsize=2048)
         
-    @staticmethod
-    def extract_skills_from_text(text: str) -> list[str]:
-        """Extract skills from text using comprehensive pattern matching"""
+    def extract_skills_from_text(self, text: str, snapshot: TaxonomySnapshot | None = None) -> list[str]:
+        """Extract skills from text using the compiled taxonomy snapshot"""
         if not text:
             return []
-            
-        text_lower = text.lower()
-        found_skills = []
+        snapshot = snapshot or current_taxonomy()
         
-        # Extract all skills from database
-        for _, skills in SKILLS_DATABASE.items():
-            for skill in skills:
-                # Check for exact match and variations
-                skill_variations = [
-                    skill.lower(),
-                    skill.lower().replace(" ", ""),
-                    skill.lower().replace(" ", "-"),
-                    skill.lower().replace(" ", "_")
-                ]
-                
-                for variation in skill_variations:
-                    if variation in text_lower:
-                        found_skills.append(skill)
-                        break
+        cached = self.skills_cache.get(text, snapshot.version)
+        if cached is not None:
+            return list(cached)
+        found_skills = snapshot.extract_skills(text)
+        self.skills_cache.set(text, tuple(found_skills), snapshot.version)
+        return found_skills
+    
+    async def job_ai_analysis(self, job_description: str, job_skills: list[str]) -> dict[str, Any]:
+        """AI insights for a job description, or the heuristic analysis when AI is not configured"""
+        if not llm_gateway.is_enabled():
+            return fallback_job_analysis(job_skills)
+        prompt = f"""
+        Analyze this job description and provide detailed insights:
         
-        # Additional pattern matching for common skill mentions
-        skill_patterns = [
-            r'\b(python|java|javascript|react|angular|vue|node\.js)\b',
-            r'\b(sql|mysql|postgresql|mongodb|redis)\b',
-            r'\b(aws|azure|gcp|docker|kubernetes|jenkins)\b',
-            r'\b(machine learning|ai|nlp|computer vision|deep learning)\b',
-            r'\b(html|css|bootstrap|tailwind|sass|less)\b',
-            r'\b(git|github|gitlab|bitbucket|svn)\b',
-            r'\b(agile|scrum|kanban|waterfall)\b',
-            r'\b(linux|unix|windows|macos)\b',
-            r'\b(excel|power bi|tableau|looker)\b',
-            r'\b(photoshop|illustrator|figma|sketch)\b'
-        ]
+        Job Description: {job_description_context(job_description)}
         
-        for pattern in skill_patterns:
-            matches = re.findall(pattern, text_lower)
-            found_skills.extend([match.title() for match in matches])
+        Please provide:
+        1. Required skills and their importance levels
+        2. Experience level (Junior/Mid/Senior)
+        3. Industry/domain
+        4. Key responsibilities
+        5. Salary range estimate
+        6. Required qualifications
+        7. Nice-to-have skills
         
-        return list(set(found_skills))
+        Format as JSON with these fields:
+        - required_skills: [list of skills with importance levels]
+        - experience_level: "junior/mid/senior"
+        - industry: "string"
+        - responsibilities: [list]
+        - salary_range: "string"
+        - qualifications: [list]
+        - nice_to_have: [list]
+        """
+        
+        return await llm_gateway.cached_chat_json(
+            prompt_messages("job_analysis", prompt),
+            max_tokens=600,
+            temperature=0.3
+        )
     
-    async def analyze_job_description(self, job_description: str) -> dict[str, Any]:
+    async def analyze_job_description(self, job_description: str, snapshot: TaxonomySnapshot | None = None) -> dict[str, Any]:
         """Analyze job description with AI enhancement"""
+        snapshot = snapshot or current_taxonomy()
         try:
             # Extract skills from job description
-            job_skills = self.extract_skills_from_text(job_description)
+            job_skills = self.extract_skills_from_text(job_description, snapshot)
             
             # AI-enhanced analysis
-            if openai.api_key:
-                prompt = f"""
-                Analyze this job description and provide detailed insights:
-                
-                Job Description: {job_description}
-                
-                Please provide:
-                1. Required skills and their importance levels
-                2. Experience level (Junior/Mid/Senior)
-                3. Industry/domain
-                4. Key responsibilities
-                5. Salary range estimate
-                6. Required qualifications
-                7. Nice-to-have skills
-                
-                Format as JSON with these fields:
-                - required_skills: [list of skills with importance levels]
-                - experience_level: "junior/mid/senior"
-                - industry: "string"
-                - responsibilities: [list]
-                - salary_range: "string"
-                - qualifications: [list]
-                - nice_to_have: [list]
-                """
-                
-                response = await openai.ChatCompletion.acreate(
-                    model="gpt-3.5-turbo",
-                    messages=[{"role": "user", "content": prompt}],
-                    max_tokens=600,
-                    temperature=0.3
-                )
-                
-                ai_analysis = json.loads(response.choices[0].message.content)
-            else:
-                # Fallback analysis
-                ai_analysis = {
-                    "required_skills": job_skills,
-                    "experience_level": "mid",
-                    "industry": "Technology",
-                    "responsibilities": ["Develop software", "Collaborate with team"],
-                    "salary_range": "$60k-$120k",
-                    "qualifications": ["Bachelor's degree", "Relevant experience"],
-                    "nice_to_have": []
-                }
-            
-            return {
-                "skills": job_skills,
-                "ai_analysis": ai_analysis,
-                "timestamp": datetime.now().isoformat()
-            }
+            ai_analysis, degraded = await llm_gateway.with_fallback(
+                lambda: self.job_ai_analysis(job_description, job_skills),
+                lambda: fallback_job_analysis(job_skills)
+            )
+            return {**job_analysis_result(job_skills, ai_analysis, snapshot), "degraded": degraded}
             
         except Exception as error:
             logger.error("Error analyzing job description: %s", error)
             return {
-                "skills": self.extract_skills_from_text(job_description),
+                "skills": self.extract_skills_from_text(job_description, snapshot),
                 "ai_analysis": {},
                 "error": str(error)
             }
     
+    async def semantic_similarity(self, resume_skills: list[str], job_skills: list[str], snapshot: TaxonomySnapshot) -> dict[str, Any]:
+        """Semantic skill match from the precomputed per-skill embedding table"""
+        if not (self.model and resume_skills and job_skills):
+            return {"score": 0.0, "best_matches": {}}
+        return await skill_similarity(resume_skills, job_skills, snapshot)
+    
+    @staticmethod
+    async def match_ai_analysis(resume_skills: list[str], job_skills: list[str], metrics: dict[str, Any]) -> dict[str, Any]:
+        """AI match analysis, or the heuristic one when AI is not configured"""
+        if not llm_gateway.is_enabled():
+            return fallback_match_analysis(metrics)
+        prompt = f"""
+        Analyze the match between candidate and job:
+        
+        Candidate Skills: {', '.join(resume_skills)}
+        Job Skills: {', '.join(job_skills)}
+        Match Score: {metrics["match_score"]}%
+        
+        Provide:
+        1. Detailed match analysis
+        2. Strengths of the candidate
+        3. Areas for improvement
+        4. Interview preparation tips
+        5. Salary negotiation insights
+        6. Career development suggestions
+        
+        Format as JSON.
+        """
+        
+        return await llm_gateway.chat_json(
+            prompt_messages("match_analysis", prompt),
+            max_tokens=500,
+            temperature=0.3
+        )
+    
     async def match_resume_to_job(self, resume_skills: list[str], job_description: str) -> dict[str, Any]:
         """Real-time resume to job matching with comprehensive analysis"""
+        # Pin the taxonomy for the whole request so a concurrent swap cannot mix versions
+        snapshot = current_taxonomy()
         try:
-            # Analyze job description
-            job_analysis = await self.analyze_job_description(job_description)
-            job_skills = job_analysis["skills"]
-            
-            # Calculate match metrics
-            matched_skills = [skill for skill in job_skills if skill in resume_skills]
-            missing_skills = [skill for skill in job_skills if skill not in resume_skills]
-            extra_skills = [skill for skill in resume_skills if skill not in job_skills]
-            
-            # Calculate match score
-            match_score = len(matched_skills) / max(1, len(job_skills)) * 100
-            
-            # Semantic similarity using sentence transformers
-            semantic_score = 0
-            if self.model and resume_skills and job_skills:
-                try:
-                    resume_text = " ".join(resume_skills)
-                    job_text = " ".join(job_skills)
-                    
-                    resume_embedding = self.model.encode([resume_text])
-                    job_embedding = self.model.encode([job_text])
-                    
-                    similarity = cosine_similarity(resume_embedding, job_embedding)[0][0]
-                    semantic_score = similarity * 100
-                except Exception as exc:
-                    logger.error("Error calculating semantic similarity: %s", exc)
-            
-            # AI-enhanced match analysis
-            if openai.api_key:
-                prompt = f"""
-                Analyze the match between candidate and job:
-                
-                Candidate Skills: {', '.join(resume_skills)}
-                Job Skills: {', '.join(job_skills)}
-                Match Score: {match_score}%
-                
-                Provide:
-                1. Detailed match analysis
-                2. Strengths of the candidate
-                3. Areas for improvement
-                4. Interview preparation tips
-                5. Salary negotiation insights
-                6. Career development suggestions
-                
-                Format as JSON.
-                """
-                
-                response = await openai.ChatCompletion.acreate(
-                    model="gpt-3.5-turbo",
-                    messages=[{"role": "user", "content": prompt}],
-                    max_tokens=500,
-                    temperature=0.3
-                )
-                
-                ai_analysis = json.loads(response.choices[0].message.content)
-            else:
-                ai_analysis = {
-                    "match_analysis": f"Match score: {match_score}%",
-                    "strengths": matched_skills,
-                    "improvements": missing_skills,
-                    "interview_tips": ["Highlight relevant experience"],
-                    "salary_insights": "Research market rates",
-                    "career_suggestions": ["Learn missing skills"]
-                }
+            # Only skill extraction and the match metrics are sequential; the two LLM calls and the
+            # embedding lookup run side by side, each falling back to its heuristic on error or deadline
+            graph = TaskGraph("match_resume_to_job")
+            graph.add("job_skills", lambda: self.extract_skills_from_text(job_description, snapshot))
+            graph.add("metrics", lambda job_skills: match_metrics(resume_skills, job_skills), after=("job_skills",))
+            graph.add(
+                "job_ai", lambda job_skills: self.job_ai_analysis(job_description, job_skills),
+                after=("job_skills",), deadline=ANALYSIS_LLM_DEADLINE_SECONDS, fallback=fallback_job_analysis
+            )
+            graph.add(
+                "semantic", lambda job_skills: self.semantic_similarity(resume_skills, job_skills, snapshot),
+                after=("job_skills",), deadline=ANALYSIS_EMBEDDING_DEADLINE_SECONDS,
+                fallback=lambda job_skills: {"score": 0.0, "best_matches": {}}
+            )
+            graph.add(
+                "match_ai", lambda job_skills, metrics: self.match_ai_analysis(resume_skills, job_skills, metrics),
+                after=("job_skills", "metrics"), deadline=ANALYSIS_LLM_DEADLINE_SECONDS,
+                fallback=lambda job_skills, metrics: fallback_match_analysis(metrics)
+            )
+            results = await graph.run()
             
+            metrics = results["metrics"]
+            semantic_score = results["semantic"]["score"] * 100
             return {
-                "match_score": match_score,
+                **metrics,
                 "semantic_score": semantic_score,
-                "overall_score": (match_score + semantic_score) / 2,
-                "matched_skills": matched_skills,
-                "missing_skills": missing_skills,
-                "extra_skills": extra_skills,
-                "job_analysis": job_analysis,
-                "ai_analysis": ai_analysis,
+                "semantic_matches": results["semantic"]["best_matches"],
+                "overall_score": (metrics["match_score"] + semantic_score) / 2,
+                "job_analysis": job_analysis_result(results["job_skills"], results["job_ai"], snapshot),
+                "ai_analysis": results["match_ai"],
+                "pipeline": graph.report,
+                "degraded": graph.degraded,
                 "timestamp": datetime.now().isoformat()
             }
             
@@ -286,15 +276,19 @@ class RealTimeJobMatcher:
             }
     
     @staticmethod
-    async def get_skill_recommendations(current_skills: list[str], target_role: str) -> dict[str, Any]:
-        """Get personalized skill recommendations"""
+    async def get_skill_recommendations(current_skills: list[str], target_role: str, enrich: bool = False) -> dict[str, Any]:
+        """Get personalized skill recommendations from the local skill model, optionally enriched by AI"""
         try:
-            if openai.api_key:
+            result = local_skill_recommendations(current_skills, target_role)
+            recommendations = result["recommendations"]
+            
+            if enrich and llm_gateway.is_enabled():
                 prompt = f"""
                 Provide skill recommendations for career advancement:
                 
-                Current Skills: {', '.join(current_skills)}
+                Current Skills: {', '.join(canonical_list(current_skills))}
                 Target Role: {target_role}
+                Suggested Skills: {', '.join(recommendations["missing_skills"])}
                 
                 Provide:
                 1. Missing skills for target role
@@ -307,31 +301,17 @@ class RealTimeJobMatcher:
                 Format as JSON.
                 """
                 
-                response = await openai.ChatCompletion.acreate(
-                    model="gpt-3.5-turbo",
-                    messages=[{"role": "user", "content": prompt}],
-                    max_tokens=400,
-                    temperature=0.4
+                # The local recommendations already stand on their own; a late or failed enrichment is just omitted
+                enrichment, result["degraded"] = await llm_gateway.with_fallback(
+                    lambda: llm_gateway.cached_chat_json(
+                        prompt_messages("skill_recommendations", prompt), max_tokens=400, temperature=0.4
+                    ),
+                    lambda: None
                 )
-                
-                recommendations = json.loads(response.choices[0].message.content)
-            else:
-                recommendations = {
-                    "missing_skills": [],
-                    "priority": "Medium",
-                    "learning_path": "Online courses",
-                    "time_to_acquire": "3-6 months",
-                    "resources": ["Coursera", "Udemy", "YouTube"],
-                    "market_demand": "High",
-                    "salary_impact": "10-20% increase"
-                }
+                if enrichment is not None:
+                    recommendations["ai_enrichment"] = enrichment
             
-            return {
-                "current_skills": current_skills,
-                "target_role": target_role,
-                "recommendations": recommendations,
-                "timestamp": datetime.now().isoformat()
-            }
+            return result
             
         except Exception as err:
             logger.error("Error getting skill recommendations: %s", err)
@@ -343,11 +323,16 @@ class RealTimeJobMatcher:
     
     @staticmethod
     async def analyze_market_trends(skills: list[str]) -> dict[str, Any]:
-        """Analyze market trends for skills"""
+        """Analyze market trends for skills: from the precomputed table when it knows any of them, else the LLM"""
         try:
-            if openai.api_key:
+            table = get_market_intel()
+            trends = table.trends(skills) if table else None
+            if trends is not None:
+                return {**market_trends_result(skills, trends), **table.freshness(), "degraded": False}
+            
+            if llm_gateway.is_enabled():
                 prompt = f"""
-                Analyze market trends for these skills: {', '.join(skills)}
+                Analyze market trends for these skills: {', '.join(canonical_list(skills))}
                 
                 Provide:
                 1. Market demand trends
@@ -360,29 +345,16 @@ class RealTimeJobMatcher:
                 Format as JSON.
                 """
                 
-                response = await openai.ChatCompletion.acreate(
-                    model="gpt-3.5-turbo",
-                    messages=[{"role": "user", "content": prompt}],
-                    max_tokens=400,
-                    temperature=0.3
+                trends, degraded = await llm_gateway.with_fallback(
+                    lambda: llm_gateway.cached_chat_json(
+                        prompt_messages("market_trends", prompt), max_tokens=400, temperature=0.3
+                    ),
+                    fallback_market_trends
                 )
-                
-                trends = json.loads(response.choices[0].message.content)
             else:
-                trends = {
-                    "demand_trends": "Stable",
-                    "salary_trends": "Increasing",
-                    "opportunities": "Good",
-                    "risks": "Low",
-                    "outlook": "Positive",
-                    "hotspots": ["Silicon Valley", "New York", "London"]
-                }
+                trends, degraded = fallback_market_trends(), False
             
-            return {
-                "skills": skills,
-                "trends": trends,
-                "timestamp": datetime.now().isoformat()
-            }
+            return {**market_trends_result(skills, trends), "degraded": degraded}
             
         except Exception as exc:
             logger.error("Error analyzing market trends: %s", exc)
@@ -404,9 +376,9 @@ async def analyze_job_description(job_description: str) -> dict[str, Any]:
     """Convenience function for job analysis"""
     return await job_matcher.analyze_job_description(job_description)
 
-async def get_skill_recommendations(current_skills: list[str], target_role: str) -> dict[str, Any]:
+async def get_skill_recommendations(current_skills: list[str], target_role: str, enrich: bool = False) -> dict[str, Any]:
     """Convenience function for skill recommendations"""
-    return await job_matcher.get_skill_recommendations(current_skills, target_role)
+    return await job_matcher.get_skill_recommendations(current_skills, target_role, enrich)
 
 async def analyze_market_trends(skills: list[str]) -> dict[str, Any]:
     """Convenience function for market analysis"""
@@ -0,0 +1,215 @@
+"""
+Live Resume Analysis
+Per-connection parsed resume state for live editing; edits re-extract only the lines they touch
+"""
+
+import logging
+import os
+import re
+from bisect import bisect_right
+from collections import Counter
+from datetime import datetime
+from typing import Any
+
+from taxonomy import TaxonomySnapshot, current_taxonomy
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+LIVE_MAX_LINES = int(os.getenv("LIVE_MAX_LINES", "2000"))
+
+SECTION_HEADING = re.compile(
+    r"(?:professional |work |technical |core )?"
+    r"(summary|profile|objective|experience|employment|education|skills|competencies|projects"
+    r"|certifications|awards|publications|languages|interests|volunteering)"
+    r"(?: history| & \w+)?\s*:?",
+    re.IGNORECASE
+)
+
+def section_of(line: str) -> str | None:
+    """Section name if the line is a resume heading ("Work Experience", "SKILLS:"), else None"""
+    match = SECTION_HEADING.fullmatch(line.strip())
+    return match.group(1).lower() if match else None
+
+class LiveSession:
+    """Line index, per-line skills and section map of one resume being edited, with an incrementally kept match score
+
+    Skills are extracted per line, so a skill name broken across two lines is not found (the same
+    trade-off as every line-oriented editor index).
+    """
+
+    def __init__(self, text: str = "", job_description: str = "", snapshot: TaxonomySnapshot | None = None):
+        self.snapshot = snapshot or current_taxonomy()
+        self.lines: list[str] = []
+        self.line_skills: list[tuple[str, ...]] = []
+        self.headings: list[tuple[int, str]] = []  # (line, section), sorted by line
+        self.skill_counts: Counter[str] = Counter()
+        self.version = 0
+        self.lines_extracted = 0
+        self.last_edited = 0
+        self.set_job(job_description)
+        self.splice(0, 0, text.splitlines())
+
+    def set_job(self, job_description: str) -> None:
+        self.job_description = job_description
+        self.job_skills = self.snapshot.extract_skills(job_description)
+        self.job_skill_set = set(self.job_skills)
+        self.matched = sum(1 for skill in self.job_skills if self.skill_counts[skill])
+
+    def rebuild(self, snapshot: TaxonomySnapshot) -> None:
+        """Re-extract every line, e.g. after a taxonomy swap changed what counts as a skill"""
+        logger.info("Live session re-extracting %d lines for taxonomy v%d", len(self.lines), snapshot.version)
+        self.snapshot = snapshot
+        self.line_skills = [tuple(snapshot.extract_skills(line)) for line in self.lines]
+        self.skill_counts = Counter(skill for skills in self.line_skills for skill in skills)
+        self.lines_extracted += len(self.lines)
+        self.set_job(self.job_description)
+
+    def _count(self, skills: tuple[str, ...], delta: int) -> None:
+        for skill in skills:
+            before = self.skill_counts[skill]
+            after = before + delta
+            if after:
+                self.skill_counts[skill] = after
+            else:
+                del self.skill_counts[skill]
+            # The match score only moves when a job skill appears in or vanishes from the whole resume
+            if skill in self.job_skill_set and (before == 0) != (after == 0):
+                self.matched += 1 if after else -1
+
+    def splice(self, start: int, end: int, lines: list[str]) -> tuple[list[str], list[str]]:
+        """Replace lines[start:end]; returns the skills that appeared in and vanished from the resume"""
+        if not 0 <= start <= end <= len(self.lines):
+            raise ValueError(f"Edit range {start}:{end} is outside the {len(self.lines)}-line resume")
+        if len(self.lines) - (end - start) + len(lines) > LIVE_MAX_LINES:
+            raise ValueError(f"Resume exceeds {LIVE_MAX_LINES} lines")
+
+        new_skills = [tuple(self.snapshot.extract_skills(line)) for line in lines]
+        touched = {skill for skills in self.line_skills[start:end] + new_skills for skill in skills}
+        before = {skill: self.skill_counts[skill] for skill in touched}
+        for skills in self.line_skills[start:end]:
+            self._count(skills, -1)
+        for skills in new_skills:
+            self._count(skills, 1)
+        self.lines[start:end] = lines
+        self.line_skills[start:end] = new_skills
+        self.lines_extracted += len(lines)
+
+        shift = len(lines) - (end - start)
+        self.headings = (
+            [heading for heading in self.headings if heading[0] < start]
+            + [(start + i, section) for i, line in enumerate(lines) if (section := section_of(line))]
+            + [(line + shift, section) for line, section in self.headings if line >= end]
+        )
+        self.version += 1
+        self.last_edited = start
+        appeared = [skill for skill, count in before.items() if not count and self.skill_counts[skill]]
+        vanished = [skill for skill, count in before.items() if count and not self.skill_counts[skill]]
+        return sorted(appeared), sorted(vanished)
+
+    def replace_text(self, text: str) -> tuple[list[str], list[str]]:
+        """Full-text update: only the span between the unchanged leading and trailing lines is re-extracted"""
+        lines = text.splitlines()
+        prefix = 0
+        limit = min(len(lines), len(self.lines))
+        while prefix < limit and lines[prefix] == self.lines[prefix]:
+            prefix += 1
+        suffix = 0
+        while suffix < limit - prefix and lines[-1 - suffix] == self.lines[-1 - suffix]:
+            suffix += 1
+        return self.splice(prefix, len(self.lines) - suffix, lines[prefix:len(lines) - suffix])
+
+    def apply(self, update: dict[str, Any]) -> dict[str, Any]:
+        """Apply a `live_update` payload: `edits` ({start, end, lines} against the previous edit's result) or `text`"""
+        base_version = update.get("base_version")
+        if base_version is not None and base_version != self.version:
+            raise ValueError(f"Edit is against version {base_version}, session is at {self.version}; resend the text")
+        # The whole update is checked before anything is applied, so a rejected one leaves the session untouched
+        if "text" in update:
+            text, edits = self._validate_text(update["text"]), None
+        else:
+            text, edits = None, self._validate_edits(update.get("edits", []))
+        job_description = update.get("job_description")
+        if job_description is not None and not isinstance(job_description, str):
+            raise ValueError("`job_description` must be a string")
+
+        if self.snapshot.version != current_taxonomy().version:
+            # A new taxonomy can change any line's skills; this is the one update that re-reads everything
+            self.rebuild(current_taxonomy())
+        if "job_description" in update:
+            self.set_job(job_description or "")
+
+        start_version, start_extracted = self.version, self.lines_extracted
+        appeared, vanished = set(), set()
+        if edits is None:
+            ops = [self.replace_text(text)]
+        else:
+            ops = [self.splice(start, end, lines) for start, end, lines in edits]
+        for added, removed in ops:
+            appeared.update(added)
+            appeared.difference_update(removed)
+            vanished.update(removed)
+        vanished.difference_update(appeared)
+        return self.result(
+            added_skills=sorted(skill for skill in appeared if self.skill_counts[skill]),
+            removed_skills=sorted(skill for skill in vanished if not self.skill_counts[skill]),
+            edits=self.version - start_version,
+            lines_extracted=self.lines_extracted - start_extracted,
+            section=self.section_at(self.last_edited)
+        )
+
+    @staticmethod
+    def _validate_text(text: Any) -> str:
+        if text is None:
+            return ""
+        if not isinstance(text, str):
+            raise ValueError("`text` must be a string")
+        if len(text.splitlines()) > LIVE_MAX_LINES:
+            raise ValueError(f"Resume exceeds {LIVE_MAX_LINES} lines")
+        return text
+
+    def _validate_edits(self, edits: Any) -> list[tuple[int, int, list[str]]]:
+        """Parse `edits` and check each range against the line count the edits before it leave"""
+        if not isinstance(edits, list):
+            raise ValueError("`edits` must be a list")
+        parsed = []
+        line_count = len(self.lines)
+        for i, edit in enumerate(edits):
+            try:
+                start, end, lines = int(edit["start"]), int(edit["end"]), edit.get("lines", [])
+            except (KeyError, TypeError, ValueError, AttributeError) as e:
+                raise ValueError(f"Edit {i} needs integer `start` and `end`") from e
+            if not isinstance(lines, list) or not all(isinstance(line, str) for line in lines):
+                raise ValueError(f"Edit {i}: `lines` must be a list of strings")
+            if not 0 <= start <= end <= line_count:
+                raise ValueError(f"Edit {i} range {start}:{end} is outside the {line_count}-line resume")
+            line_count += len(lines) - (end - start)
+            if line_count > LIVE_MAX_LINES:
+                raise ValueError(f"Resume exceeds {LIVE_MAX_LINES} lines")
+            parsed.append((start, end, lines))
+        return parsed
+
+    def section_at(self, line: int) -> str | None:
+        index = bisect_right(self.headings, line, key=lambda heading: heading[0]) - 1
+        return self.headings[index][1] if index >= 0 else None
+
+    def metrics(self) -> dict[str, Any]:
+        """Same shape as job_matcher.match_metrics, from the maintained counts instead of a rescan"""
+        return {
+            "match_score": self.matched / max(1, len(self.job_skills)) * 100,
+            "matched_skills": [skill for skill in self.job_skills if self.skill_counts[skill]],
+            "missing_skills": [skill for skill in self.job_skills if not self.skill_counts[skill]],
+            "extra_skills": sorted(skill for skill in self.skill_counts if skill not in self.job_skill_set),
+        }
+
+    def result(self, **changes: Any) -> dict[str, Any]:
+        return {
+            **self.metrics(),
+            "version": self.version,
+            "skills": dict(sorted(self.skill_counts.items())),
+            "sections": [{"section": section, "line": line} for line, section in self.headings],
+            "line_count": len(self.lines),
+            "changes": changes,
+            "taxonomy_version": self.snapshot.version,
+            "timestamp": datetime.now().isoformat()
+        }
@@ -0,0 +1,178 @@
+"""
+LLM Response Cache
+Deterministic cache for analysis completions, keyed by model, normalized prompt and parameters, persisted in SQLite
+"""
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any
+
+from skill_graph import DATA_DIR
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", os.path.join(DATA_DIR, "llm_cache.sqlite3"))
+LLM_CACHE_TTL_SECONDS = float(os.getenv("LLM_CACHE_TTL_SECONDS", "86400"))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "50000"))
+LLM_CACHE_MEMORY_ENTRIES = int(os.getenv("LLM_CACHE_MEMORY_ENTRIES", "1024"))
+
+# Evict once every this many writes rather than counting rows on each one
+_EVICT_EVERY = 256
+
+def canonical_list(items: list[str]) -> list[str]:
+    """Order- and case-insensitive form of a skill list: deduplicated, whitespace-collapsed, sorted"""
+    unique = {}
+    for item in items:
+        text = " ".join(str(item).split())
+        if text:
+            key = text.casefold()
+            # Smallest spelling wins so the result does not depend on which variant came first
+            unique[key] = min(unique.get(key, text), text)
+    return [unique[key] for key in sorted(unique)]
+
+def normalize_prompt(text: str) -> str:
+    """Collapse the indentation and blank lines that triple-quoted prompts carry"""
+    return " ".join(text.split())
+
+def cache_key(model: str, messages: list[dict[str, str]], params: dict[str, Any]) -> str:
+    """SHA-256 over the model, the normalized messages and the sorted sampling parameters"""
+    canonical = json.dumps({
+        "model": model,
+        "messages": [{"role": m.get("role"), "content": normalize_prompt(m.get("content", ""))} for m in messages],
+        "params": params,
+    }, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+class LLMResponseCache:
+    """SQLite table shared by all workers, fronted by a small per-process LRU"""
+
+    def __init__(self, path: str = LLM_CACHE_PATH, max_entries: int = LLM_CACHE_MAX_ENTRIES,
+                 memory_entries: int = LLM_CACHE_MEMORY_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self.memory_entries = memory_entries
+        self._memory: OrderedDict[str, tuple[float, str]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn: sqlite3.Connection | None = None
+        self._writes = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, timeout=5)
+            # WAL lets every uvicorn worker read while one of them writes
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL, last_used REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS llm_cache_last_used ON llm_cache (last_used)")
+            self._conn = conn
+        return self._conn
+
+    def get(self, key: str) -> str | None:
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._memory.move_to_end(key)
+                    self.memory_hits += 1
+                    return entry[1]
+                del self._memory[key]
+            try:
+                conn = self._connect()
+                row = conn.execute("SELECT value, expires_at FROM llm_cache WHERE key = ?", (key,)).fetchone()
+                if row is None or row[1] <= now:
+                    self.misses += 1
+                    return None
+                conn.execute("UPDATE llm_cache SET last_used = ? WHERE key = ?", (now, key))
+                conn.commit()
+            except sqlite3.Error as e:
+                logger.warning("LLM cache read failed: %s", e)
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            self._remember(key, row[1], row[0])
+            return row[0]
+
+    def set(self, key: str, value: str, ttl: float = LLM_CACHE_TTL_SECONDS) -> None:
+        now = time.time()
+        with self._lock:
+            self._remember(key, now + ttl, value)
+            try:
+                conn = self._connect()
+                conn.execute(
+                    "INSERT OR REPLACE INTO llm_cache (key, value, expires_at, last_used) VALUES (?, ?, ?, ?)",
+                    (key, value, now + ttl, now)
+                )
+                self._writes += 1
+                if self._writes % _EVICT_EVERY == 1:
+                    self._evict(conn, now)
+                conn.commit()
+            except sqlite3.Error as e:
+                logger.warning("LLM cache write failed: %s", e)
+
+    def _remember(self, key: str, expires_at: float, value: str) -> None:
+        self._memory[key] = (expires_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _evict(self, conn: sqlite3.Connection, now: float) -> None:
+        """Drop expired rows, then the least recently used ones beyond max_entries"""
+        removed = conn.execute("DELETE FROM llm_cache WHERE expires_at <= ?", (now,)).rowcount
+        excess = conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0] - self.max_entries
+        if excess > 0:
+            removed += conn.execute(
+                "DELETE FROM llm_cache WHERE key IN (SELECT key FROM llm_cache ORDER BY last_used LIMIT ?)", (excess,)
+            ).rowcount
+        self.evictions += removed
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+            conn = self._connect()
+            conn.execute("DELETE FROM llm_cache")
+            conn.commit()
+
+    def stats(self) -> dict[str, Any]:
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        with self._lock:
+            try:
+                entries = self._connect().execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+            except sqlite3.Error:
+                entries = None
+        return {
+            "path": self.path,
+            "entries": entries,
+            "memory_entries": len(self._memory),
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.memory_hits + self.disk_hits) / lookups, 3) if lookups else 0,
+            "evictions": self.evictions,
+            "ttl_seconds": LLM_CACHE_TTL_SECONDS,
+            "max_entries": self.max_entries,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+# Global instance
+llm_cache = LLMResponseCache()
@@ -0,0 +1,453 @@
+"""
+LLM Gateway
+Single async client for chat completions: pooled HTTP connections, deadlines, bounded concurrency, retries and a circuit breaker
+"""
+
+import asyncio
+import json
+import logging
+import os
+import random
+import re
+import time
+from collections.abc import AsyncIterator, Awaitable, Callable
+from typing import Any
+
+import httpx
+from dotenv import load_dotenv
+
+from circuit_breaker import CircuitBreaker
+from llm_cache import LLM_CACHE_TTL_SECONDS, cache_key, llm_cache
+from single_flight import single_flight
+
+# Load environment variables
+load_dotenv()
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1")
+LLM_MODEL = os.getenv("LLM_MODEL", "gpt-3.5-turbo")
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "20"))
+LLM_CONNECT_TIMEOUT_SECONDS = float(os.getenv("LLM_CONNECT_TIMEOUT_SECONDS", "5"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "16"))
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "32"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+LLM_RETRY_BASE_SECONDS = float(os.getenv("LLM_RETRY_BASE_SECONDS", "0.5"))
+# Endpoints wait this long for the model before answering with their heuristic (marked degraded)
+LLM_LATENCY_BUDGET_SECONDS = float(os.getenv("LLM_LATENCY_BUDGET_SECONDS", "8"))
+LLM_BREAKER_WINDOW_SECONDS = float(os.getenv("LLM_BREAKER_WINDOW_SECONDS", "60"))
+LLM_BREAKER_MIN_CALLS = int(os.getenv("LLM_BREAKER_MIN_CALLS", "20"))
+LLM_BREAKER_ERROR_RATE = float(os.getenv("LLM_BREAKER_ERROR_RATE", "0.5"))
+LLM_BREAKER_P95_SECONDS = float(os.getenv("LLM_BREAKER_P95_SECONDS", "8"))
+LLM_BREAKER_PROBE_SECONDS = float(os.getenv("LLM_BREAKER_PROBE_SECONDS", "15"))
+
+_RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+# Identical prompts already on their way to the API are awaited, not sent again
+llm_flight = single_flight("llm")
+
+class LLMError(Exception):
+    """Raised when a completion cannot be obtained (disabled, deadline passed, HTTP or parse error)"""
+
+    def __init__(self, message: str, status_code: int | None = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+class LLMDegraded(LLMError):
+    """Raised without calling the API while the circuit breaker is open"""
+
+    def __init__(self, reason: str):
+        super().__init__(f"LLM circuit open: {reason}", 503)
+
+class LLMGateway:
+    """Chat completions over one pooled httpx.AsyncClient per event loop"""
+
+    def __init__(self, base_url: str = OPENAI_BASE_URL, model: str = LLM_MODEL):
+        self.base_url = base_url.rstrip("/")
+        self.model = model
+        self._client: httpx.AsyncClient | None = None
+        self._semaphore: asyncio.Semaphore | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self.calls = 0
+        self.retries = 0
+        self.failures = 0
+        self.in_flight = 0
+        self.total_seconds = 0.0
+        self.streams = 0
+        self.first_token_seconds = 0.0
+        self.degraded_responses = 0
+        self.breaker = CircuitBreaker(
+            "llm", self._probe, window_seconds=LLM_BREAKER_WINDOW_SECONDS, min_calls=LLM_BREAKER_MIN_CALLS,
+            max_error_rate=LLM_BREAKER_ERROR_RATE, max_p95_seconds=LLM_BREAKER_P95_SECONDS,
+            probe_interval_seconds=LLM_BREAKER_PROBE_SECONDS
+        )
+
+    @property
+    def api_key(self) -> str | None:
+        # Read on use: main.py loads key.env after the modules are imported
+        return os.getenv("OPENAI_API_KEY")
+
+    def is_enabled(self) -> bool:
+        return bool(self.api_key)
+
+    def is_degraded(self) -> bool:
+        """Configured, but the breaker is open and calls are answered by the heuristics"""
+        return self.is_enabled() and self.breaker.is_open
+
+    def _check_breaker(self) -> None:
+        if not self.is_enabled():
+            raise LLMError("LLM is not configured (OPENAI_API_KEY missing)")
+        if not self.breaker.allow():
+            raise LLMDegraded(self.breaker.reason)
+
+    def _ensure_client(self) -> tuple[httpx.AsyncClient, asyncio.Semaphore]:
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._loop is not loop:
+            self._loop = loop
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=httpx.Timeout(LLM_TIMEOUT_SECONDS, connect=LLM_CONNECT_TIMEOUT_SECONDS),
+                limits=httpx.Limits(max_connections=LLM_MAX_CONNECTIONS, max_keepalive_connections=LLM_MAX_CONNECTIONS)
+            )
+            self._semaphore = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+        return self._client, self._semaphore
+
+    async def chat(
+        self,
+        messages: list[dict[str, str]],
+        max_tokens: int = 300,
+        temperature: float = 0.7,
+        model: str | None = None,
+        timeout: float | None = None,
+        cache_ttl: float | None = None,
+        **params: Any,
+    ) -> str:
+        """Return the completion text; `timeout` is the deadline for the whole call including retries.
+
+        With `cache_ttl` the reply is served from / stored in the response cache for that many seconds.
+        """
+        if not cache_ttl:
+            return await self._complete(messages, max_tokens, temperature, model, timeout, **params)
+        key = self._cache_key(messages, max_tokens, temperature, model, params)
+        return await llm_flight.do(("text", key), lambda: self._cached_text(
+            key, cache_ttl, messages, max_tokens, temperature, model, timeout, params))
+
+    async def _cached_text(self, key: str, cache_ttl: float, messages: list[dict[str, str]], max_tokens: int,
+                           temperature: float, model: str | None, timeout: float | None, params: dict[str, Any]) -> str:
+        cached = await asyncio.to_thread(llm_cache.get, key)
+        if cached is not None:
+            return cached
+        content = await self._complete(messages, max_tokens, temperature, model, timeout, **params)
+        await asyncio.to_thread(llm_cache.set, key, content, cache_ttl)
+        return content
+
+    def _cache_key(self, messages: list[dict[str, str]], max_tokens: int, temperature: float,
+                   model: str | None, params: dict[str, Any]) -> str:
+        return cache_key(model or self.model, messages, {"max_tokens": max_tokens, "temperature": temperature, **params})
+
+    async def _complete(
+        self,
+        messages: list[dict[str, str]],
+        max_tokens: int,
+        temperature: float,
+        model: str | None,
+        timeout: float | None,
+        **params: Any,
+    ) -> str:
+        self._check_breaker()
+        client, semaphore = self._ensure_client()
+        deadline = time.monotonic() + (timeout or LLM_TIMEOUT_SECONDS)
+        payload = {"model": model or self.model, "messages": messages, "max_tokens": max_tokens,
+                   "temperature": temperature, **params}
+        headers = {"Authorization": f"Bearer {self.api_key}"}
+
+        self.calls += 1
+        started = time.monotonic()
+        attempt = 0
+        failed = False
+        try:
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise LLMError("LLM deadline exceeded", 504)
+                try:
+                    # The deadline covers the wait for a concurrency slot as well as the request itself
+                    async with asyncio.timeout(remaining), semaphore:
+                        self.in_flight += 1
+                        try:
+                            response = await client.post("/chat/completions", json=payload, headers=headers,
+                                                         timeout=self._request_timeout(deadline))
+                        finally:
+                            self.in_flight -= 1
+                    if response.status_code == 200:
+                        return self._content(response)
+                    if response.status_code not in _RETRYABLE_STATUS:
+                        raise LLMError(f"LLM request failed with {response.status_code}: {response.text[:200]}", response.status_code)
+                    error = LLMError(f"LLM request failed with {response.status_code}", response.status_code)
+                    retry_after = response.headers.get("retry-after")
+                except TimeoutError as e:
+                    raise LLMError("LLM deadline exceeded", 504) from e
+                except httpx.TimeoutException as e:
+                    error, retry_after = LLMError(f"LLM request timed out: {e}", 504), None
+                except httpx.TransportError as e:
+                    error, retry_after = LLMError(f"LLM transport error: {e}", 502), None
+
+                attempt += 1
+                await self._backoff(attempt, error, retry_after, deadline)
+        except asyncio.CancelledError:
+            # Abandoned by its caller, typically past with_fallback's budget: too slow to count as a success
+            failed = True
+            raise
+        except Exception:
+            self.failures += 1
+            failed = True
+            raise
+        finally:
+            # A caller that gave up (cancelled) still contributes its wait as a latency sample
+            elapsed = time.monotonic() - started
+            self.total_seconds += elapsed
+            self.breaker.record(elapsed, not failed)
+
+    @staticmethod
+    def _request_timeout(deadline: float) -> httpx.Timeout:
+        """httpx applies timeouts per phase, so they are only a backstop under the asyncio deadline"""
+        remaining = max(deadline - time.monotonic(), 0.001)
+        return httpx.Timeout(remaining, connect=min(LLM_CONNECT_TIMEOUT_SECONDS, remaining))
+
+    @staticmethod
+    def _content(response: httpx.Response) -> str:
+        try:
+            return response.json()["choices"][0]["message"]["content"].strip()
+        except (KeyError, IndexError, TypeError, AttributeError, ValueError) as e:
+            raise LLMError(f"LLM returned a malformed completion: {e!r}", 502) from e
+
+    @staticmethod
+    def _delta(data: str) -> str | None:
+        """Text of one SSE chunk; a chunk that is not a chat completion delta is an LLMError, not a crash"""
+        try:
+            choices = json.loads(data).get("choices") or [{}]
+            return choices[0].get("delta", {}).get("content")
+        except (AttributeError, IndexError, TypeError, ValueError) as e:
+            raise LLMError(f"LLM stream returned a malformed chunk: {e!r}", 502) from e
+
+    async def _probe(self) -> None:
+        """Smallest possible completion; the breaker closes when it succeeds within the p95 threshold"""
+        client, _ = self._ensure_client()
+        response = await client.post(
+            "/chat/completions",
+            json={"model": self.model, "messages": [{"role": "user", "content": "ping"}], "max_tokens": 1},
+            headers={"Authorization": f"Bearer {self.api_key}"}
+        )
+        if response.status_code != 200:
+            raise LLMError(f"LLM probe failed with {response.status_code}", response.status_code)
+
+    async def _backoff(self, attempt: int, error: LLMError, retry_after: str | None, deadline: float) -> None:
+        """Sleep before retry `attempt`, or raise `error` when out of retries or past the deadline"""
+        if attempt > LLM_MAX_RETRIES:
+            raise error
+        # Full jitter so retries from many requests do not arrive together
+        delay = random.uniform(0, LLM_RETRY_BASE_SECONDS * 2 ** (attempt - 1))
+        if retry_after and retry_after.replace(".", "", 1).isdigit():
+            delay = max(delay, float(retry_after))
+        if time.monotonic() + delay >= deadline:
+            raise error
+        self.retries += 1
+        logger.warning("LLM attempt %d failed (%s), retrying in %.2fs", attempt, error, delay)
+        await asyncio.sleep(delay)
+
+    async def stream_chat(
+        self,
+        messages: list[dict[str, str]],
+        max_tokens: int = 300,
+        temperature: float = 0.7,
+        model: str | None = None,
+        timeout: float | None = None,
+        **params: Any,
+    ) -> AsyncIterator[str]:
+        """Yield completion text as it is generated.
+
+        `timeout` bounds the wait for the first token, retries included; a failure after the first token is
+        raised, not retried. Closing the iterator early (client went away) closes the upstream response, so
+        the model stops generating for nobody.
+        """
+        self._check_breaker()
+        client, semaphore = self._ensure_client()
+        deadline = time.monotonic() + (timeout or LLM_TIMEOUT_SECONDS)
+        payload = {"model": model or self.model, "messages": messages, "max_tokens": max_tokens,
+                   "temperature": temperature, "stream": True, **params}
+        headers = {"Authorization": f"Bearer {self.api_key}"}
+
+        self.calls += 1
+        self.streams += 1
+        started = time.monotonic()
+        attempt = 0
+        first_token: float | None = None
+        failed = False
+        try:
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise LLMError("LLM deadline exceeded", 504)
+                try:
+                    # Until the first token the deadline covers the slot wait, the request and the model's
+                    # think time; after it the stream runs on the client's per-read timeout
+                    async with asyncio.timeout(remaining) as first_token_deadline, semaphore, client.stream(
+                        "POST", "/chat/completions", json=payload, headers=headers
+                    ) as response:
+                        if response.status_code == 200:
+                            self.in_flight += 1
+                            try:
+                                async for line in response.aiter_lines():
+                                    if not line.startswith("data:"):
+                                        continue
+                                    data = line[5:].strip()
+                                    if data == "[DONE]":
+                                        return
+                                    delta = self._delta(data)
+                                    if delta:
+                                        if first_token is None:
+                                            first_token_deadline.reschedule(None)
+                                            first_token = time.monotonic() - started
+                                            self.first_token_seconds += first_token
+                                        yield delta
+                                return
+                            finally:
+                                self.in_flight -= 1
+                        await response.aread()
+                        if response.status_code not in _RETRYABLE_STATUS:
+                            raise LLMError(f"LLM request failed with {response.status_code}: {response.text[:200]}", response.status_code)
+                        error = LLMError(f"LLM request failed with {response.status_code}", response.status_code)
+                        retry_after = response.headers.get("retry-after")
+                except TimeoutError as e:
+                    raise LLMError("LLM deadline exceeded before the first token", 504) from e
+                except httpx.TimeoutException as e:
+                    error, retry_after = LLMError(f"LLM stream timed out: {e}", 504), None
+                except httpx.TransportError as e:
+                    error, retry_after = LLMError(f"LLM transport error: {e}", 502), None
+                if first_token is not None:
+                    raise error
+
+                attempt += 1
+                await self._backoff(attempt, error, retry_after, deadline)
+        except (asyncio.CancelledError, GeneratorExit):
+            # Abandoned by the consumer; before the first token that means the model was too slow
+            failed = True
+            raise
+        except Exception:
+            self.failures += 1
+            failed = True
+            raise
+        finally:
+            elapsed = time.monotonic() - started
+            self.total_seconds += elapsed
+            # Streams are judged on time to first token, which is what the user waits for
+            self.breaker.record(elapsed if first_token is None else first_token, first_token is not None or not failed)
+
+    async def chat_json(
+        self,
+        messages: list[dict[str, str]],
+        max_tokens: int = 300,
+        temperature: float = 0.7,
+        model: str | None = None,
+        timeout: float | None = None,
+        cache_ttl: float | None = None,
+        **params: Any,
+    ) -> Any:
+        """Chat completion parsed as JSON (tolerates a ```json fenced reply); only valid JSON is cached.
+
+        Concurrent calls with the same prompt and parameters share one request and one (read-only) result.
+        """
+        key = self._cache_key(messages, max_tokens, temperature, model, params)
+        return await llm_flight.do(("json", key), lambda: self._json(
+            key, cache_ttl, messages, max_tokens, temperature, model, timeout, params))
+
+    async def _json(self, key: str, cache_ttl: float | None, messages: list[dict[str, str]], max_tokens: int,
+                    temperature: float, model: str | None, timeout: float | None, params: dict[str, Any]) -> Any:
+        if cache_ttl:
+            cached = await asyncio.to_thread(llm_cache.get, key)
+            if cached is not None:
+                return json.loads(cached)
+        content = await self._complete(messages, max_tokens, temperature, model, timeout, **params)
+        fenced = re.fullmatch(r"```(?:json)?\s*(.*?)\s*```", content, re.DOTALL)
+        try:
+            result = json.loads(fenced.group(1) if fenced else content)
+        except json.JSONDecodeError as e:
+            self.failures += 1
+            raise LLMError(f"LLM returned invalid JSON: {e}") from e
+        if cache_ttl:
+            await asyncio.to_thread(llm_cache.set, key, json.dumps(result), cache_ttl)
+        return result
+
+    async def with_fallback(self, call: Callable[[], Awaitable[Any]], fallback: Callable[[], Any],
+                            budget: float = LLM_LATENCY_BUDGET_SECONDS) -> tuple[Any, bool]:
+        """(result, degraded): the model's answer if it arrives within `budget`, else fallback() at once.
+
+        An open breaker answers without waiting. Coalesced calls (chat_json, cached chat) keep running after the
+        budget expires, so a late answer still lands in the response cache for the next caller.
+        """
+        if not self.is_enabled():
+            return fallback(), False
+        try:
+            return await asyncio.wait_for(call(), budget), False
+        except (LLMError, TimeoutError) as e:
+            self.degraded_responses += 1
+            logger.warning("Serving heuristic answer: %s", str(e) or f"no LLM answer within {budget}s")
+            return fallback(), True
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "enabled": self.is_enabled(),
+            "degraded": self.is_degraded(),
+            "model": self.model,
+            "base_url": self.base_url,
+            "calls": self.calls,
+            "retries": self.retries,
+            "failures": self.failures,
+            "in_flight": self.in_flight,
+            "max_concurrency": LLM_MAX_CONCURRENCY,
+            "avg_seconds": round(self.total_seconds / self.calls, 3) if self.calls else 0,
+            "streams": self.streams,
+            "avg_first_token_seconds": round(self.first_token_seconds / self.streams, 3) if self.streams else 0,
+            "degraded_responses": self.degraded_responses,
+            "breaker": self.breaker.stats(),
+            "cache": llm_cache.stats(),
+            "coalescing": llm_flight.stats(),
+        }
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+        llm_cache.close()
+
+# Global instance
+gateway = LLMGateway()
+
+def is_enabled() -> bool:
+    """Convenience function: whether an API key is configured"""
+    return gateway.is_enabled()
+
+def is_degraded() -> bool:
+    """Convenience function: whether AI answers are currently replaced by heuristics"""
+    return gateway.is_degraded()
+
+async def with_fallback(call: Callable[[], Awaitable[Any]], fallback: Callable[[], Any], **kwargs: Any) -> tuple[Any, bool]:
+    """Convenience function: (LLM result within the latency budget or the heuristic, degraded)"""
+    return await gateway.with_fallback(call, fallback, **kwargs)
+
+async def chat(messages: list[dict[str, str]], **kwargs: Any) -> str:
+    """Convenience function for a text completion"""
+    return await gateway.chat(messages, **kwargs)
+
+async def chat_json(messages: list[dict[str, str]], **kwargs: Any) -> Any:
+    """Convenience function for a JSON completion"""
+    return await gateway.chat_json(messages, **kwargs)
+
+def stream_chat(messages: list[dict[str, str]], **kwargs: Any) -> AsyncIterator[str]:
+    """Convenience function for a token stream"""
+    return gateway.stream_chat(messages, **kwargs)
+
+async def cached_chat_json(messages: list[dict[str, str]], ttl: float = LLM_CACHE_TTL_SECONDS, **kwargs: Any) -> Any:
+    """Convenience function for analysis prompts whose answer depends only on the prompt"""
+    return await gateway.chat_json(messages, cache_ttl=ttl, **kwargs)
@@ -0,0 +1,69 @@
+"""
+LLM Token Streaming
+Server-Sent Events and WebSocket frames for token-streamed completions, with the non-AI text as fallback
+"""
+
+import json
+import logging
+from collections.abc import AsyncIterator, Callable
+from contextlib import aclosing
+from typing import Any
+
+from fastapi.responses import StreamingResponse
+
+import llm_gateway
+from llm_gateway import LLMError
+from ws_tasks import WSRequest
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+# Disable proxy buffering so each event reaches the browser as soon as it is written
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+def sse_event(event: str, data: dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+async def stream_with_fallback(messages: list[dict[str, str]], fallback: Callable[[], str], **kwargs: Any) -> AsyncIterator[str]:
+    """Tokens from the gateway; when AI is off or fails before the first token, the fallback text as one chunk"""
+    if not llm_gateway.is_enabled():
+        yield fallback()
+        return
+    sent = False
+    try:
+        async with aclosing(llm_gateway.stream_chat(messages, **kwargs)) as tokens:
+            async for token in tokens:
+                sent = True
+                yield token
+    except LLMError as e:
+        if sent:
+            raise
+        logger.error("LLM stream unavailable, using fallback: %s", e)
+        yield fallback()
+
+async def sse_stream(tokens: AsyncIterator[str]) -> AsyncIterator[str]:
+    """`token` events as text arrives, then `done` with the full text (or `error` if the stream broke)"""
+    parts = []
+    try:
+        async with aclosing(tokens):
+            async for token in tokens:
+                parts.append(token)
+                yield sse_event("token", {"text": token})
+    except LLMError as e:
+        yield sse_event("error", {"message": str(e), "text": "".join(parts)})
+        return
+    yield sse_event("done", {"text": "".join(parts)})
+
+def sse_response(tokens: AsyncIterator[str]) -> StreamingResponse:
+    """Starlette cancels the generator when the client disconnects, which closes the upstream LLM stream"""
+    return StreamingResponse(sse_stream(tokens), media_type="text/event-stream", headers=SSE_HEADERS)
+
+async def send_token_frames(request: WSRequest, tokens: AsyncIterator[str]) -> str:
+    """Queue tokens as `token` frames and return the full text; once the socket is gone the upstream stream is closed"""
+    parts = []
+    async with aclosing(tokens):
+        async for token in tokens:
+            parts.append(token)
+            if not request.send("token", {"request": request.type, "text": token}):
+                break
+    return "".join(parts)
@@ -4,21 +4,20 @@ FastAPI-based backend for AI-powered career optimization
 """
 
 # Standard library imports
+import asyncio
 import hashlib
 import logging
 import os
 import re
 import secrets
-import tempfile
 from contextlib import asynccontextmanager
 from datetime import UTC, datetime, timedelta
 from pathlib import Path
 from typing import Any
 
-import docx2txt
-import fitz  # PyMuPDF
-import openai
-import spacy
+# Thread limits must reach the environment before numpy/torch load their BLAS and OpenMP pools
+from resource_governor import resource_governor  # isort: skip
+
 import uvicorn
 from Backend.auth import get_password_hash, verify_password
 
@@ -42,27 +41,34 @@ from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from fastapi.staticfiles import StaticFiles
 from jose import jwt
 from pydantic import BaseModel, EmailStr
-from sentence_transformers import SentenceTransformer
 from slowapi.errors import RateLimitExceeded
 from slowapi.extension import Limiter 
 from slowapi.util import get_remote_address
 from sqlalchemy.orm import Session
 
+import llm_gateway
 import usage_tracker
 
 # Local application imports
+from document_text import extract_text_async
+from job_index import rank_jobs_for_resume, refresh_job_index
+from llm_streaming import sse_response, stream_with_fallback
+from market_intel import refresh_market_intel
 from models import RevokedToken, SessionLocal
 from payment_router import router as payment_router
+from prompt_builder import job_description_context, prompt_messages, resume_context
 from realtime_router import router as realtime_router
 from schemas import User as DBUser
+from skill_embeddings import refresh_skill_embeddings
 from skills_jobs_router import router as skills_jobs_router
 from subscription_router import router as subscription_router
 from utils import (
     allowed_file,
-    parse_resume,
-    parse_resume_with_job_matching,
+    parse_resume_async,
+    parse_resume_with_job_matching_async,
     setup_logging,
 )
+from ws_hub import hub
 
 rate_limiter = Limiter(key_func=get_remote_address)
 
@@ -88,11 +94,22 @@ async def lifespan(_app: FastAPI):
     # Startup
     logger.info("Starting CareerForge AI API server...")
     app_state["startup_time"] = "2024-01-01T00:00:00Z"
+    resource_governor.apply()
+    # Embed new or changed catalog jobs in the background; unchanged rows are reused
+    app_state["job_index_refresh"] = asyncio.create_task(refresh_job_index())
+    app_state["skill_embeddings_refresh"] = asyncio.create_task(refresh_skill_embeddings())
+    # Market figures are precomputed; build the table only if there is none yet or it is stale
+    app_state["market_intel_refresh"] = asyncio.create_task(refresh_market_intel())
+    # Cross-worker WebSocket delivery (in-process unless PUBSUB_URL points at a broker)
+    await hub.start_backplane()
     
     yield
     
     # Shutdown
     logger.info("Shutting down CareerForge AI API server...")
+    resource_governor.shutdown()
+    await llm_gateway.gateway.aclose()
+    await hub.backplane.close()
 
 # Create FastAPI app
 app = FastAPI(
@@ -236,31 +253,6 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends()):
     db.close()
     return {"access_token": access_token, "token_type": "bearer"}
 
-# NLP Models
-nlp = spacy.load("en_core_web_sm")
-model = SentenceTransformer("all-MiniLM-L6-v2")
-
-def extract_text_from_content(contents: bytes, filename: str) -> str:
-    suffix = os.path.splitext(filename)[1].lower()
-    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
-        tmp.write(contents)
-        tmp.flush()
-        tmp_path = tmp.name
-    
-    try:
-        if suffix == ".pdf":
-            with fitz.open(stream=contents, filetype="pdf") as doc:
-                text = ""
-                for page in doc:
-                    text += page.get_text()
-        elif suffix in [".docx", ".doc"]:
-            text = docx2txt.process(tmp_path)
-        else:
-            text = contents.decode('utf-8', errors='ignore')
-        return text
-    finally:
-        os.unlink(tmp_path)
-
 def extract_email(text: str):
     return next(iter(re.findall(r'[\w.+-]+@[\w-]+\.[\w.-]+', text)), None)
 
@@ -427,8 +419,8 @@ async def upload_resume(request: Request, file: UploadFile = File(...), current_
     if len(contents) > 5 * 1024 * 1024:  # 5MB limit
         raise HTTPException(status_code=400, detail="File size must be less than 5MB.")
     try:
-        text = extract_text_from_content(contents, file.filename)
-        parsed_data = parse_resume(text)
+        text = await extract_text_async(contents, file.filename)
+        parsed_data = await parse_resume_async(text)
         return {
             "message": "Resume uploaded and parsed successfully",
             "parsed_resume": parsed_data.dict() if hasattr(parsed_data, 'dict') else parsed_data
@@ -467,8 +459,8 @@ async def get_parsed_resume(current_user: User = Depends(get_current_user)):
         
         # Parse resume
         with open(latest_file, "rb") as f:
-            text = extract_text_from_content(f.read(), latest_file.name)
-            parsed_data = parse_resume(text)
+            text = await extract_text_async(f.read(), latest_file.name)
+            parsed_data = await parse_resume_async(text)
         
         return parsed_data
     except HTTPException as e:
@@ -571,8 +563,14 @@ async def job_match(file: UploadFile = None, current_user: dict = None, _top_n:
         contents = await file.read()
         if not contents:
             raise HTTPException(status_code=400, detail="Empty file uploaded")
-        text = extract_text_from_content(contents, file.filename)
-        resume_data = parse_resume(text)
+        text = await extract_text_async(contents, file.filename)
+        resume_data = await parse_resume_async(text)
+        try:
+            resume_data["top_matches"] = await rank_jobs_for_resume(text, resume_data.get("skills", []), _top_n)
+        except Exception as e:
+            # The parsed resume is still worth returning when the job index is unavailable
+            logger.error("Error ranking jobs for resume: %s", e)
+            resume_data["top_matches"] = []
         return resume_data
     except HTTPException as e:
         raise e
@@ -596,11 +594,11 @@ async def analyze_resume(file: UploadFile = None, job_description: str = None, c
         contents = await file.read()
         if not contents:
             raise HTTPException(status_code=400, detail="Empty file uploaded")
-        text = extract_text_from_content(contents, file.filename)
+        text = await extract_text_async(contents, file.filename)
         if job_description:
-            resume_data = parse_resume_with_job_matching(text, job_description)
+            resume_data = await parse_resume_with_job_matching_async(text, job_description)
         else:
-            resume_data = parse_resume(text)
+            resume_data = await parse_resume_async(text)
         return resume_data
     except HTTPException as e:
         raise e
@@ -634,8 +632,8 @@ async def match_resume(file: UploadFile = None, job_description: str = None, cur
         contents = await file.read()
         if not contents:
             raise HTTPException(status_code=400, detail="Empty file uploaded")
-        text = extract_text_from_content(contents, file.filename)
-        resume_data = parse_resume_with_job_matching(text, job_description)
+        text = await extract_text_async(contents, file.filename)
+        resume_data = await parse_resume_with_job_matching_async(text, job_description)
         return resume_data
     except HTTPException as e:
         raise e
@@ -666,6 +664,31 @@ async def chat_with_resume(prompt: str = None, resume_text: str = None, current_
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e)) from e
 
+def cover_letter_messages(resume_data: dict, job_description: str, original_cover_letter: str) -> list[dict[str, str]]:
+    # The letter itself is what gets rewritten, so only the resume and the job description are budgeted
+    prompt = (
+        f"Rewrite the following cover letter to better match the job description.\n\n"
+        f"Job Description:\n{job_description_context(job_description)}\n\n"
+        f"Resume Data:\n{resume_context(resume_data, 'cover_letter')}\n\n"
+        f"Original Cover Letter:\n{original_cover_letter}\n\n"
+        f"Rewritten Cover Letter:"
+    )
+    return prompt_messages(
+        "cover_letter_rewrite", prompt,
+        system="You are a helpful assistant that rewrites cover letters for job applications."
+    )
+
+def fallback_cover_letter(resume_data: dict) -> str:
+    skills = ', '.join(resume_data.get('skills', []))
+    full_name = resume_data.get('full_name', 'Your Name')
+    return (
+        f"Dear Hiring Manager,\n\n"
+        f"I am excited to apply for this position. My background in {skills} "
+        f"and experience in similar roles make me a strong fit. "
+        f"I am eager to contribute to your team.\n\n"
+        f"Sincerely,\n{full_name}"
+    )
+
 @app.post("/cover-letter-rewrite")
 async def cover_letter_rewrite(resume_data: dict = None, job_description: str = None, original_cover_letter: str = None):
     if resume_data is None:
@@ -674,62 +697,55 @@ async def cover_letter_rewrite(resume_data: dict = None, job_description: str =
         job_description = Body(...)
     if original_cover_letter is None:
         original_cover_letter = Body(...)
-    # Try OpenAI if available
-    try:
-        if openai.api_key:
-            prompt = (
-                f"Rewrite the following cover letter to better match the job description.\n\n"
-                f"Job Description:\n{job_description}\n\n"
-                f"Resume Data:\n{resume_data}\n\n"
-                f"Original Cover Letter:\n{original_cover_letter}\n\n"
-                f"Rewritten Cover Letter:"
-            )
-            response = openai.ChatCompletion.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {
-                        "role": "system", 
-                        "content": "You are a helpful assistant that rewrites cover letters for job applications."
-                    },
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=500,
-                temperature=0.7
-            )
-            rewritten = response.choices[0].message.content.strip()
-            return {"rewritten_cover_letter": rewritten}
-    except Exception as e:
-        print(f"OpenAI error: {e}")
-    skills = ', '.join(resume_data.get('skills', []))
-    full_name = resume_data.get('full_name', 'Your Name')
-    rewritten = (
-        f"Dear Hiring Manager,\n\n"
-        f"I am excited to apply for this position. My background in {skills} "
-        f"and experience in similar roles make me a strong fit. "
-        f"I am eager to contribute to your team.\n\n"
-        f"Sincerely,\n{full_name}"
+    # Try OpenAI if available, within the latency budget
+    rewritten, degraded = await llm_gateway.with_fallback(
+        lambda: llm_gateway.chat(
+            cover_letter_messages(resume_data, job_description, original_cover_letter),
+            max_tokens=500,
+            temperature=0.7
+        ),
+        lambda: fallback_cover_letter(resume_data)
     )
-    return {"rewritten_cover_letter": rewritten}
+    return {"rewritten_cover_letter": rewritten, "degraded": degraded}
+
+@app.post("/cover-letter-rewrite/stream")
+async def cover_letter_rewrite_stream(resume_data: dict = None, job_description: str = None, original_cover_letter: str = None):
+    """Same as /cover-letter-rewrite, streamed as Server-Sent Events (`token` ... `done`)"""
+    if resume_data is None:
+        resume_data = Body(...)
+    if job_description is None:
+        job_description = Body(...)
+    if original_cover_letter is None:
+        original_cover_letter = Body(...)
+    return sse_response(stream_with_fallback(
+        cover_letter_messages(resume_data, job_description, original_cover_letter),
+        lambda: fallback_cover_letter(resume_data),
+        max_tokens=500,
+        temperature=0.7
+    ))
 
 @app.post("/gpt-chat")
 async def gpt_chat(messages: list = None):
     if messages is None:
         messages = Body(...)
-    try:
-        if openai.api_key:
-            response = openai.ChatCompletion.create(
-                model="gpt-3.5-turbo",
-                messages=messages,
-                max_tokens=300,
-                temperature=0.7
-            )
-            reply = response.choices[0].message.content.strip()
-            logger.info("GPT chat reply: %s", reply)
-            return {"reply": reply}
-    except Exception as e:
-        logger.error("OpenAI error: %s", e)
-        return {"reply": "Sorry, the AI chat is currently unavailable."}
-    return {"reply": "Sorry, the AI chat is currently unavailable."}
+    reply, degraded = await llm_gateway.with_fallback(
+        lambda: llm_gateway.chat(messages, max_tokens=300, temperature=0.7),
+        lambda: "Sorry, the AI chat is currently unavailable."
+    )
+    logger.info("GPT chat reply: %s", reply)
+    return {"reply": reply, "degraded": degraded}
+
+@app.post("/gpt-chat/stream")
+async def gpt_chat_stream(messages: list = None):
+    """Same as /gpt-chat, streamed as Server-Sent Events (`token` ... `done`)"""
+    if messages is None:
+        messages = Body(...)
+    return sse_response(stream_with_fallback(
+        messages,
+        lambda: "Sorry, the AI chat is currently unavailable.",
+        max_tokens=300,
+        temperature=0.7
+    ))
 
 # User Logout Endpoint
 @app.post("/logout")
@@ -786,6 +802,15 @@ async def admin_analytics(x_api_key: str = None):
     db.close()
     return analytics
 
+@app.get("/admin/resources")
+async def admin_resources(x_api_key: str = None):
+    """CPU allocation of this worker and current run-queue pressure (requires X-API-KEY header)"""
+    if x_api_key is None:
+        x_api_key = Header(...)
+    if x_api_key != ADMIN_API_KEY:
+        return {"error": "Unauthorized"}
+    return resource_governor.status()
+
 # Admin User Management Endpoints
 @app.get("/admin/users")
 async def admin_list_users(x_api_key: str = None):
@@ -970,7 +995,7 @@ async def reset_usage(user_id: str, feature: str = None):
 async def health_check():
     """Health check endpoint"""
     return {
-        "status": "healthy",
+        "status": "degraded" if llm_gateway.is_degraded() else "healthy",
         "service": "CareerForge AI API",
         "version": "1.0.0",
         "startup_time": app_state.get("startup_time")
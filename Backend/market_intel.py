@@ -0,0 +1,386 @@
+"""
+Skill Market Intelligence
+Precomputed skill x location table of demand, salary and trend figures from the job catalog, served with O(1) lookups
+"""
+
+import asyncio
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+from collections import Counter, defaultdict
+from collections.abc import Iterator
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Any
+
+import numpy as np
+
+from job_catalog import load_catalog_jobs
+from skill_graph import DATA_DIR, normalize_skill
+from taxonomy import TaxonomySnapshot, current_taxonomy
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process use only
+    fcntl = None
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+MARKET_INTEL_PATH = os.getenv("MARKET_INTEL_PATH", os.path.join(DATA_DIR, "market_intel.npz"))
+MARKET_INTEL_MAX_AGE_HOURS = float(os.getenv("MARKET_INTEL_MAX_AGE_HOURS", "168"))
+MARKET_MIN_LOCATION_JOBS = int(os.getenv("MARKET_MIN_LOCATION_JOBS", "5"))
+MARKET_MIN_SALARY_POSTINGS = int(os.getenv("MARKET_MIN_SALARY_POSTINGS", "3"))
+# Trends compare against a baseline build that is kept until it is this old, whatever happens in between
+MARKET_TREND_WINDOW_DAYS = float(os.getenv("MARKET_TREND_WINDOW_DAYS", "7"))
+MARKET_INTEL_POLL_SECONDS = float(os.getenv("MARKET_INTEL_POLL_SECONDS", "30"))
+
+GLOBAL_LOCATION = "global"
+# Used where neither the location nor the global bucket has enough salaried postings for a skill
+BASELINE_SALARY = (60000.0, 90000.0, 120000.0)
+SALARY_SOURCES = ("baseline", "global", "location")
+
+_SALARY_NUMBER = re.compile(r"(\d+(?:[.,]\d+)*)\s*([kK])?")
+
+def location_buckets(location: str) -> list[str]:
+    """Buckets a posting counts towards: global, 'remote', and each part of 'City, Country'"""
+    buckets = [GLOBAL_LOCATION]
+    text = " ".join(location.lower().split())
+    if "remote" in text:
+        buckets.append("remote")
+    buckets.extend(part.strip() for part in text.split(",") if part.strip() and "remote" not in part)
+    return list(dict.fromkeys(buckets))
+
+def parse_salary_range(text: str) -> tuple[float, float] | None:
+    """(low, high) yearly amounts from '$80k-$120k', '80,000 - 120,000' or '90-110K'; None if unparseable"""
+    numbers = [(float(value.replace(",", "")), bool(k)) for value, k in _SALARY_NUMBER.findall(text or "")]
+    if not numbers:
+        return None
+    # A trailing K covers the whole range ("90-110K")
+    thousands = numbers[-1][1]
+    values = [value * 1000 if k or (thousands and value < 1000) else value for value, k in numbers[:2]]
+    low, high = min(values), max(values)
+    return (low, high) if low >= 1000 else None
+
+def format_salary(low: float, high: float) -> str:
+    return f"${low / 1000:.0f}k-${high / 1000:.0f}k"
+
+def growth_trend(growth: float | None) -> str:
+    if growth is None:
+        return "Stable"
+    return "Growing" if growth > 0.1 else "Declining" if growth < -0.1 else "Stable"
+
+class MarketIntelTable:
+    """Columnar skill x location arrays; a record is a handful of array reads"""
+
+    def __init__(self, skills: list[str], locations: list[str], postings: np.ndarray, location_jobs: np.ndarray,
+                 prev_share: np.ndarray, salary: np.ndarray, salary_source: np.ndarray,
+                 related: list[list[str]], built_at: str, taxonomy_version: int, baseline_at: str | None = None):
+        self.skills = skills
+        self.locations = locations
+        self.postings = postings
+        self.location_jobs = location_jobs
+        self.prev_share = prev_share
+        self.salary = salary
+        self.salary_source = salary_source
+        self.related = related
+        self.built_at = built_at
+        self.taxonomy_version = taxonomy_version
+        self.baseline_at = baseline_at
+        self.skill_index = {normalize_skill(skill): i for i, skill in enumerate(skills)}
+        self.location_index = {location: i for i, location in enumerate(locations)}
+        self.share = postings / np.maximum(location_jobs[:, None], 1)
+        # Demand level by rank among the skills that appear in the bucket at all
+        self.demand_rank = np.zeros_like(self.share)
+        for row in range(len(locations)):
+            present = postings[row] > 0
+            counts = postings[row, present]
+            if len(counts):
+                # Fraction of present skills with at most this many postings; ties share a rank
+                self.demand_rank[row, present] = np.searchsorted(np.sort(counts), counts, side="right") / len(counts)
+
+    @classmethod
+    def build(cls, jobs: list[dict[str, Any]], snapshot: TaxonomySnapshot,
+              previous: "MarketIntelTable | None" = None) -> "MarketIntelTable":
+        skills = list(snapshot.vocabulary)
+        skill_index = {normalize_skill(skill): i for i, skill in enumerate(skills)}
+        for job in jobs:
+            for skill in job["skills"]:
+                if normalize_skill(skill) not in skill_index:
+                    skill_index[normalize_skill(skill)] = len(skills)
+                    skills.append(skill)
+
+        job_skills, job_buckets = [], []
+        bucket_jobs: Counter = Counter()
+        for job in jobs:
+            found = job["skills"] + snapshot.extract_skills(f"{job['title']} {job['description']}")
+            job_skills.append({skill_index[key] for key in map(normalize_skill, found) if key in skill_index})
+            buckets = location_buckets(job.get("location", ""))
+            job_buckets.append(buckets)
+            bucket_jobs.update(buckets)
+        locations = [GLOBAL_LOCATION] + sorted(
+            bucket for bucket, count in bucket_jobs.items()
+            if bucket != GLOBAL_LOCATION and count >= MARKET_MIN_LOCATION_JOBS
+        )
+        location_index = {location: i for i, location in enumerate(locations)}
+
+        postings = np.zeros((len(locations), len(skills)), dtype=np.int32)
+        salaries: dict[tuple[int, int], list[tuple[float, float]]] = defaultdict(list)
+        for ids, buckets, job in zip(job_skills, job_buckets, jobs, strict=True):
+            rows = [location_index[bucket] for bucket in buckets if bucket in location_index]
+            salary = parse_salary_range(job.get("salary_range", ""))
+            for row in rows:
+                for skill_id in ids:
+                    postings[row, skill_id] += 1
+                    if salary:
+                        salaries[row, skill_id].append(salary)
+        location_jobs = np.asarray([bucket_jobs[location] for location in locations], dtype=np.int32)
+
+        # Salary: the bucket's own postings, else the skill's global figures, else the baseline
+        salary = np.tile(np.asarray(BASELINE_SALARY, dtype=np.float32), (len(locations), len(skills), 1))
+        salary_source = np.zeros((len(locations), len(skills)), dtype=np.int8)
+        for (row, skill_id), samples in salaries.items():
+            if len(samples) >= MARKET_MIN_SALARY_POSTINGS:
+                lows, highs = np.asarray(samples, dtype=np.float32).T
+                salary[row, skill_id] = (np.median(lows), np.median((lows + highs) / 2), np.median(highs))
+                salary_source[row, skill_id] = SALARY_SOURCES.index("location" if row else "global")
+        for row in range(1, len(locations)):
+            inherit = (salary_source[row] == 0) & (salary_source[0] > 0)
+            salary[row, inherit] = salary[0, inherit]
+            salary_source[row, inherit] = SALARY_SOURCES.index("global")
+
+        # Trend: share of postings now against a baseline build. The previous build becomes the baseline only
+        # once the current one is MARKET_TREND_WINDOW_DAYS old, so back-to-back rebuilds keep measuring growth
+        prev_share = np.full((len(locations), len(skills)), np.nan, dtype=np.float32)
+        baseline_at = None
+        if previous is not None:
+            window = timedelta(days=MARKET_TREND_WINDOW_DAYS)
+            if previous.baseline_at is None or datetime.now() - datetime.fromisoformat(previous.baseline_at) >= window:
+                baseline, baseline_at = previous.share, previous.built_at
+            else:
+                baseline, baseline_at = previous.prev_share, previous.baseline_at
+            prev_ids = np.asarray([previous.skill_index.get(normalize_skill(skill), -1) for skill in skills])
+            known = prev_ids >= 0
+            for row, location in enumerate(locations):
+                prev_row = previous.location_index.get(location)
+                if prev_row is not None:
+                    prev_share[row, known] = baseline[prev_row, prev_ids[known]]
+
+        related = [snapshot.skill_graph.related_skills(skill) for skill in skills]
+        return cls(skills, locations, postings, location_jobs, prev_share, salary, salary_source,
+                   related, datetime.now().isoformat(), snapshot.version, baseline_at)
+
+    def save(self, path: str = MARKET_INTEL_PATH) -> None:
+        directory = os.path.dirname(path) or "."
+        os.makedirs(directory, exist_ok=True)
+        # A temp file of our own, so a concurrent save elsewhere cannot interleave with this one
+        fd, tmp_path = tempfile.mkstemp(prefix=f"{os.path.basename(path)}.", suffix=".tmp.npz", dir=directory)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez_compressed(
+                    f,
+                    skills=np.asarray(self.skills, dtype=str),
+                    locations=np.asarray(self.locations, dtype=str),
+                    postings=self.postings,
+                    location_jobs=self.location_jobs,
+                    prev_share=self.prev_share,
+                    salary=self.salary,
+                    salary_source=self.salary_source,
+                    related=np.asarray(["\t".join(skills) for skills in self.related], dtype=str),
+                    built_at=np.asarray(self.built_at, dtype=str),
+                    taxonomy_version=np.asarray(self.taxonomy_version, dtype=np.int64),
+                    baseline_at=np.asarray(self.baseline_at or "", dtype=str),
+                )
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+
+    @classmethod
+    def load(cls, path: str = MARKET_INTEL_PATH) -> "MarketIntelTable":
+        """Read a table written by save(); the data dir is shared and writable, so nothing in it is unpickled"""
+        with np.load(path) as data:
+            return cls(
+                data["skills"].tolist(), data["locations"].tolist(), data["postings"], data["location_jobs"],
+                data["prev_share"], data["salary"], data["salary_source"],
+                [value.split("\t") if value else [] for value in data["related"].tolist()],
+                str(data["built_at"]), int(data["taxonomy_version"]), str(data["baseline_at"]) or None
+            )
+
+    def age_hours(self) -> float:
+        return (datetime.now() - datetime.fromisoformat(self.built_at)).total_seconds() / 3600
+
+    def freshness(self) -> dict[str, Any]:
+        """Staleness metadata attached to every response served from the table"""
+        age = self.age_hours()
+        return {
+            "source": "market_intel",
+            "data_as_of": self.built_at,
+            "age_hours": round(age, 1),
+            "stale": age > MARKET_INTEL_MAX_AGE_HOURS,
+            "trend_baseline": self.baseline_at,
+        }
+
+    def _location_row(self, location: str | None) -> int:
+        # Most specific known bucket: "Bangalore, India" tries bangalore, then india, then global
+        for bucket in location_buckets(location or "")[1:]:
+            if bucket in self.location_index:
+                return self.location_index[bucket]
+        return 0
+
+    def record(self, skill: str, location: str = GLOBAL_LOCATION) -> dict[str, Any] | None:
+        """Demand, salary and trend for one skill; unknown locations fall back to the global bucket"""
+        skill_id = self.skill_index.get(normalize_skill(skill))
+        if skill_id is None:
+            return None
+        row = self._location_row(location)
+        postings = int(self.postings[row, skill_id])
+        share = float(self.share[row, skill_id])
+        prev = float(self.prev_share[row, skill_id])
+        growth = None if np.isnan(prev) else (share - prev) / prev if prev else (1.0 if share else 0.0)
+        rank = float(self.demand_rank[row, skill_id])
+        low, median, high = (float(value) for value in self.salary[row, skill_id])
+        return {
+            "skill": self.skills[skill_id],
+            "location": self.locations[row],
+            "demand_level": "High" if rank > 2 / 3 else "Medium" if rank > 1 / 3 else "Low",
+            "postings": postings,
+            "demand_share": round(share, 4),
+            "salary_range": format_salary(low, high),
+            "median_salary": round(median),
+            "salary_source": SALARY_SOURCES[self.salary_source[row, skill_id]],
+            "job_opportunities": f"{postings} of {int(self.location_jobs[row])} postings",
+            "growth_trend": growth_trend(growth),
+            "growth_pct": None if growth is None else round(growth * 100, 1),
+            "related_skills": self.related[skill_id],
+        }
+
+    def trends(self, skills: list[str], location: str = GLOBAL_LOCATION) -> dict[str, Any] | None:
+        """Aggregate view over several skills, in the shape of the market-trends analysis"""
+        records = [record for record in (self.record(skill, location) for skill in skills) if record]
+        if not records:
+            return None
+        trend_counts = Counter(record["growth_trend"] for record in records)
+        medians = sorted(record["median_salary"] for record in records)
+        declining = [record["skill"] for record in records if record["growth_trend"] == "Declining"]
+        low_demand = [record["skill"] for record in records if record["demand_level"] == "Low"]
+        return {
+            "demand_trends": trend_counts.most_common(1)[0][0],
+            "salary_trends": f"Median ${medians[len(medians) // 2] / 1000:.0f}k across these skills",
+            "opportunities": f"{sum(record['postings'] for record in records)} matching postings",
+            "risks": f"Low or declining demand: {', '.join(dict.fromkeys(declining + low_demand))}"
+                     if declining or low_demand else "Low",
+            "outlook": "Positive" if trend_counts["Declining"] <= trend_counts["Growing"] else "Cautious",
+            "skills": {record["skill"]: record for record in records},
+        }
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "skills": len(self.skills),
+            "locations": len(self.locations),
+            "taxonomy_version": self.taxonomy_version,
+            **self.freshness(),
+        }
+
+@contextmanager
+def _build_lock(path: str) -> Iterator[None]:
+    """Exclusive across workers (and threads) for a check-then-build of the table at `path`"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(f"{path}.lock", "w") as lock_file:
+        if fcntl:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        yield
+
+class MarketIntelStore:
+    """This worker's table; a newer file written by another worker is picked up within MARKET_INTEL_POLL_SECONDS"""
+
+    def __init__(self, path: str = MARKET_INTEL_PATH):
+        self.path = path
+        self._table: MarketIntelTable | None = None
+        self._mtime: int | None = None
+        self._next_poll = 0.0
+        self._lock = threading.Lock()
+        self._reloading = False
+
+    def current(self) -> MarketIntelTable | None:
+        """The loaded table, read from disk on first use; None until one has been built"""
+        table = self._table
+        if table is None:
+            with self._lock:
+                return self._load()
+        now = time.monotonic()
+        if now >= self._next_poll:
+            self._next_poll = now + MARKET_INTEL_POLL_SECONDS
+            self._check_published()
+        return table
+
+    def _published_stat(self) -> int | None:
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except OSError:
+            return None
+
+    def _load(self) -> MarketIntelTable | None:
+        """Load the file if it changed since the last load; the current table otherwise (or on error)"""
+        mtime = self._published_stat()
+        if mtime is None or mtime == self._mtime:
+            return self._table
+        try:
+            self._table = MarketIntelTable.load(self.path)
+            self._mtime = mtime
+        except Exception as e:
+            logger.error("Error loading market intel %s: %s", self.path, e)
+        return self._table
+
+    def _check_published(self) -> None:
+        mtime = self._published_stat()
+        if mtime is None or mtime == self._mtime or self._reloading:
+            return
+        self._reloading = True
+
+        def reload():
+            try:
+                with self._lock:
+                    self._load()
+            finally:
+                self._reloading = False
+
+        threading.Thread(target=reload, name="market-intel-reload", daemon=True).start()
+
+    def refresh(self, rebuild: bool = False) -> MarketIntelTable:
+        """Build the table if forced, missing or stale, keeping the last build as the trend baseline
+
+        Workers starting together all ask for a refresh; under the build lock the later ones find the
+        table the first one wrote and keep it.
+        """
+        with _build_lock(self.path):
+            with self._lock:
+                table = self._load()
+            if not rebuild and table is not None and table.age_hours() <= MARKET_INTEL_MAX_AGE_HOURS:
+                return table
+            table = MarketIntelTable.build(load_catalog_jobs(), current_taxonomy(), table)
+            table.save(self.path)
+            with self._lock:
+                self._table, self._mtime = table, self._published_stat()
+        logger.info("Built market intel table: %d skills x %d locations", len(table.skills), len(table.locations))
+        return table
+
+# Global instance
+market_intel_store = MarketIntelStore()
+
+def build_market_intel() -> MarketIntelTable:
+    """Offline job: recompute the table from the job catalog, keeping the trend baseline"""
+    return market_intel_store.refresh(rebuild=True)
+
+def get_market_intel() -> MarketIntelTable | None:
+    return market_intel_store.current()
+
+async def refresh_market_intel(rebuild: bool = False) -> None:
+    """Convenience function for startup (build only if missing or stale) and the skills update job (always rebuild)"""
+    try:
+        await asyncio.to_thread(market_intel_store.refresh, rebuild)
+    except Exception as e:
+        logger.error("Error refreshing market intel: %s", e)
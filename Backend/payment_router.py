@@ -19,6 +19,7 @@ from payment_gateways import (
     get_supported_payment_methods,
     verify_payment,
 )
+from ws_hub import hub
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
@@ -140,6 +141,16 @@ async def razorpay_webhook(request: Request, background_tasks: BackgroundTasks):
         logger.error("Error handling Razorpay webhook: %s", e)
         raise HTTPException(status_code=500, detail="Webhook processing failed")
 
+def notify_payer(payment_data: dict, status: str):
+    """Push a payment update to the payer's open sockets, on whichever worker they are connected"""
+    user_id = (payment_data.get("notes") or {}).get("user_id")
+    if user_id:
+        hub.publish(user_id, {"type": "payment_update", "data": {
+            "status": status,
+            "payment_id": payment_data.get("id"),
+            "amount": payment_data.get("amount", 0) / 100
+        }})
+
 async def process_successful_payment(payment_data: dict):
     """Process successful payment"""
     try:
@@ -147,6 +158,7 @@ async def process_successful_payment(payment_data: dict):
         amount = payment_data.get("amount", 0) / 100  # Convert from paise
         
         logger.info("Processing successful payment: %s, Amount: %s", payment_id, amount)
+        notify_payer(payment_data, "captured")
         
         # Update user subscription
         # Add your subscription update logic here
@@ -161,6 +173,7 @@ async def process_failed_payment(payment_data: dict):
         error_description = payment_data.get("error_description")
         
         logger.info("Processing failed payment: %s, Error: %s", payment_id, error_description)
+        notify_payer(payment_data, "failed")
         
         # Handle failed payment
         # Add your failure handling logic here
@@ -174,6 +187,7 @@ async def process_order_paid(payment_data: dict):
         order_id = payment_data.get("id")
         
         logger.info("Processing order paid: %s", order_id)
+        notify_payer(payment_data, "paid")
         
         # Handle order completion
         # Add your order completion logic here
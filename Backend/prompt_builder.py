@@ -0,0 +1,156 @@
+"""
+Prompt Builder
+Compact, field-filtered prompt inputs with job descriptions fitted to a token budget, and per-prompt token accounting
+"""
+
+import json
+import logging
+import os
+import re
+import textwrap
+from functools import lru_cache
+from typing import Any
+
+from llm_gateway import LLM_MODEL
+from taxonomy import current_taxonomy
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+PROMPT_JD_TOKEN_BUDGET = int(os.getenv("PROMPT_JD_TOKEN_BUDGET", "600"))
+PROMPT_RESUME_TOKEN_BUDGET = int(os.getenv("PROMPT_RESUME_TOKEN_BUDGET", "700"))
+PROMPT_FIELD_TOKEN_BUDGET = int(os.getenv("PROMPT_FIELD_TOKEN_BUDGET", "150"))
+
+# Resume fields each task actually uses; contact details and parser internals never reach the model
+RESUME_FIELDS = {
+    "ats": ("title", "headline", "summary", "skills", "experience", "education", "certifications", "total_experience"),
+    "linkedin": ("name", "title", "headline", "summary", "skills", "experience", "education", "certifications",
+                 "projects", "volunteer"),
+    "cover_letter": ("name", "full_name", "title", "headline", "summary", "skills", "experience", "total_experience"),
+}
+
+# Sentences with these words are kept first when a job description has to be shortened
+_REQUIREMENT_WORDS = re.compile(
+    r"\b(require|must|experience|skill|responsib|qualif|proficien|knowledge|degree|years)", re.IGNORECASE
+)
+
+@lru_cache(maxsize=1)
+def _encoding() -> Any:
+    if tiktoken is None:
+        return None
+    try:
+        try:
+            return tiktoken.encoding_for_model(LLM_MODEL)
+        except KeyError:
+            return tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        # The BPE file is downloaded on first use; offline boxes fall back to the estimate
+        logger.warning("tiktoken unavailable, estimating tokens from length: %s", e)
+        return None
+
+def count_tokens(text: str) -> int:
+    """Tokens for the configured model (tiktoken), or ~4 characters per token without it"""
+    encoding = _encoding()
+    if encoding is not None:
+        return len(encoding.encode(text))
+    return (len(text) + 3) // 4
+
+def truncate_tokens(text: str, budget: int) -> str:
+    """Hard cut to at most `budget` tokens"""
+    encoding = _encoding()
+    if encoding is not None:
+        tokens = encoding.encode(text)
+        return text if len(tokens) <= budget else encoding.decode(tokens[:budget])
+    return text[:budget * 4]
+
+def compact_json(data: Any) -> str:
+    """No indentation or spaces after separators, no empty values"""
+    return json.dumps(_drop_empty(data), separators=(",", ":"), ensure_ascii=False, default=str)
+
+def _drop_empty(data: Any) -> Any:
+    if isinstance(data, dict):
+        return {key: _drop_empty(value) for key, value in data.items() if value not in (None, "", [], {})}
+    if isinstance(data, list):
+        return [_drop_empty(value) for value in data if value not in (None, "", [], {})]
+    return data
+
+def _clip(value: Any, budget: int) -> Any:
+    if isinstance(value, str):
+        return truncate_tokens(" ".join(value.split()), budget)
+    if isinstance(value, dict):
+        return {key: _clip(item, budget) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_clip(item, budget) for item in value]
+    return value
+
+def resume_context(resume_data: dict[str, Any], task: str, budget: int = PROMPT_RESUME_TOKEN_BUDGET) -> str:
+    """Compact JSON of the fields `task` needs, long text fields clipped and lists shortened to fit `budget`"""
+    fields = RESUME_FIELDS.get(task)
+    selected = {key: value for key, value in resume_data.items() if fields is None or key in fields}
+    selected = _drop_empty(_clip(selected, PROMPT_FIELD_TOKEN_BUDGET))
+    text = compact_json(selected)
+    while count_tokens(text) > budget:
+        # Drop the last entry of the longest list (oldest experience, least relevant skill) until it fits
+        lists = [key for key, value in selected.items() if isinstance(value, list) and value]
+        if not lists:
+            return truncate_tokens(text, budget)
+        longest = max(lists, key=lambda key: len(compact_json(selected[key])))
+        selected[longest].pop()
+        text = compact_json(selected)
+    return text
+
+def job_description_context(job_description: str, budget: int = PROMPT_JD_TOKEN_BUDGET) -> str:
+    """Whitespace-collapsed JD; over budget, keep the sentences naming the most skills and requirements, in order"""
+    text = " ".join(job_description.split())
+    if count_tokens(text) <= budget:
+        return text
+    sentences = [s for s in re.split(r"(?<=[.!?;])\s+|\s+(?=[•\-*] )", text) if s]
+    taxonomy = current_taxonomy()
+    ranked = sorted(
+        range(len(sentences)),
+        key=lambda i: (-(2 * len(taxonomy.extract_skills(sentences[i])) + len(_REQUIREMENT_WORDS.findall(sentences[i]))), i)
+    )
+    kept, used = set(), 0
+    for index in ranked:
+        cost = count_tokens(sentences[index]) + 1
+        if used + cost <= budget:
+            kept.add(index)
+            used += cost
+    if not kept:
+        return truncate_tokens(text, budget)
+    return " ".join(sentences[i] for i in sorted(kept))
+
+class PromptStats:
+    """Input-token counters per prompt name"""
+
+    def __init__(self):
+        self.prompts: dict[str, dict[str, int]] = {}
+
+    def record(self, name: str, tokens: int) -> None:
+        entry = self.prompts.setdefault(name, {"calls": 0, "total_tokens": 0, "max_tokens": 0})
+        entry["calls"] += 1
+        entry["total_tokens"] += tokens
+        entry["max_tokens"] = max(entry["max_tokens"], tokens)
+
+    def to_dict(self) -> dict[str, dict[str, int]]:
+        return {
+            name: {**entry, "avg_tokens": round(entry["total_tokens"] / entry["calls"])}
+            for name, entry in self.prompts.items()
+        }
+
+# Global instance
+prompt_stats = PromptStats()
+
+def prompt_messages(name: str, prompt: str, system: str | None = None) -> list[dict[str, str]]:
+    """Chat messages for a prompt template: indentation removed, input tokens logged and counted under `name`"""
+    messages = [{"role": "system", "content": system}] if system else []
+    messages.append({"role": "user", "content": textwrap.dedent(prompt).strip()})
+    tokens = sum(count_tokens(message["content"]) for message in messages)
+    prompt_stats.record(name, tokens)
+    logger.info("Prompt %s: %d input tokens", name, tokens)
+    return messages
@@ -0,0 +1,300 @@
+"""
+Realtime Pub/Sub Backplane
+Routes WebSocket frames by user_id to whichever worker holds the user's socket: in-process, or through a TCP broker
+"""
+
+import asyncio
+import json
+import logging
+import os
+from abc import ABC, abstractmethod
+from collections import defaultdict
+from collections.abc import AsyncIterator, Callable
+from typing import Any
+from urllib.parse import urlparse
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+# "" keeps delivery inside this process (one worker); "tcp://host:port" goes through a PubSubBroker
+PUBSUB_URL = os.getenv("PUBSUB_URL", "")
+PUBSUB_RECONNECT_SECONDS = float(os.getenv("PUBSUB_RECONNECT_SECONDS", "1"))
+PUBSUB_MAX_FRAME_BYTES = int(os.getenv("PUBSUB_MAX_FRAME_BYTES", str(1 << 20)))
+# A peer that lets this much pile up unsent is not reading; further frames to it are dropped, not buffered
+PUBSUB_MAX_BUFFER_BYTES = int(os.getenv("PUBSUB_MAX_BUFFER_BYTES", str(8 << 20)))
+
+# Pseudo user id addressing every socket on every worker
+BROADCAST = "*"
+
+# (user_id, serialized frame) -> number of local sockets it was queued on
+Deliver = Callable[[str, str], int]
+
+def _line(message: dict[str, Any]) -> bytes:
+    return (json.dumps(message, separators=(",", ":")) + "\n").encode()
+
+def _writable(writer: asyncio.StreamWriter) -> bool:
+    return not writer.is_closing() and writer.transport.get_write_buffer_size() < PUBSUB_MAX_BUFFER_BYTES
+
+async def _lines(reader: asyncio.StreamReader) -> AsyncIterator[bytes | None]:
+    """Lines from a peer until EOF. One longer than PUBSUB_MAX_FRAME_BYTES is discarded and yields None instead of
+    raising, which would end the connection (and with it every subscription on it)"""
+    while True:
+        try:
+            line = await reader.readuntil(b"\n")
+        except asyncio.IncompleteReadError as e:
+            if e.partial:
+                yield e.partial
+            return
+        except asyncio.LimitOverrunError as e:
+            if not await _discard_line(reader, e.consumed):
+                return
+            line = None
+        yield line
+
+async def _discard_line(reader: asyncio.StreamReader, buffered: int) -> bool:
+    """Drop the rest of an over-long line; False if the peer hung up before finishing it"""
+    while True:
+        await reader.readexactly(buffered)
+        try:
+            await reader.readuntil(b"\n")
+            return True
+        except asyncio.IncompleteReadError:
+            return False
+        except asyncio.LimitOverrunError as e:
+            buffered = e.consumed
+
+class Backplane(ABC):
+    """Interface: a worker subscribes the users it holds sockets for and publishes frames to any user (or BROADCAST)"""
+
+    name = "base"
+
+    def __init__(self):
+        self.deliver: Deliver | None = None
+        self.subscriptions: set[str] = set()
+        self.published = 0
+        self.received = 0
+        self.dropped = 0
+
+    async def start(self, deliver: Deliver) -> None:
+        self.deliver = deliver
+
+    def subscribe(self, user_id: str) -> None:
+        self.subscriptions.add(user_id)
+
+    def unsubscribe(self, user_id: str) -> None:
+        self.subscriptions.discard(user_id)
+
+    @abstractmethod
+    def publish(self, user_id: str, frame: str) -> None:
+        """Deliver `frame` to every socket of `user_id` (or every socket, for BROADCAST) on any worker"""
+
+    def _deliver(self, user_id: str, frame: str) -> None:
+        self.received += 1
+        if self.deliver is not None:
+            self.deliver(user_id, frame)
+
+    async def close(self) -> None:
+        """Stop delivering to this worker; subclasses also release their connection"""
+        self.deliver = None
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "backend": self.name,
+            "subscriptions": len(self.subscriptions),
+            "published": self.published,
+            "received": self.received,
+            "dropped": self.dropped,
+        }
+
+class InProcessBackplane(Backplane):
+    """Single worker: publishing is local delivery"""
+
+    name = "in_process"
+
+    def publish(self, user_id: str, frame: str) -> None:
+        self.published += 1
+        self._deliver(user_id, frame)
+
+class BrokerBackplane(Backplane):
+    """Client of a PubSubBroker; reconnects with its subscriptions, and drops frames published while disconnected"""
+
+    name = "broker"
+
+    def __init__(self, host: str, port: int):
+        super().__init__()
+        self.host = host
+        self.port = port
+        self.connected = asyncio.Event()
+        self.reconnects = 0
+        self._writer: asyncio.StreamWriter | None = None
+        self._task: asyncio.Task | None = None
+
+    async def start(self, deliver: Deliver) -> None:
+        await super().start(deliver)
+        self._task = asyncio.create_task(self._run())
+
+    def _send(self, message: dict[str, Any]) -> bool:
+        writer = self._writer
+        if writer is None or not _writable(writer):
+            return False
+        line = _line(message)
+        if len(line) > PUBSUB_MAX_FRAME_BYTES:
+            # The broker could not read it; sending it would only cost the broker a discard
+            logger.warning("Pub/sub %s for %s is %d bytes, over PUBSUB_MAX_FRAME_BYTES; dropped",
+                           message["op"], message["user"], len(line))
+            return False
+        writer.write(line)
+        return True
+
+    def subscribe(self, user_id: str) -> None:
+        super().subscribe(user_id)
+        self._send({"op": "sub", "user": user_id})
+
+    def unsubscribe(self, user_id: str) -> None:
+        super().unsubscribe(user_id)
+        self._send({"op": "unsub", "user": user_id})
+
+    def publish(self, user_id: str, frame: str) -> None:
+        self.published += 1
+        if not self._send({"op": "pub", "user": user_id, "frame": frame}):
+            self.dropped += 1
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                reader, writer = await asyncio.open_connection(self.host, self.port, limit=PUBSUB_MAX_FRAME_BYTES)
+            except OSError as e:
+                logger.warning("Pub/sub broker %s:%d unreachable: %s", self.host, self.port, e)
+                await asyncio.sleep(PUBSUB_RECONNECT_SECONDS)
+                continue
+            self._writer = writer
+            for user_id in self.subscriptions:
+                writer.write(_line({"op": "sub", "user": user_id}))
+            self.connected.set()
+            try:
+                async for line in _lines(reader):
+                    if line is None:
+                        self.dropped += 1
+                        logger.warning("Pub/sub frame from broker over PUBSUB_MAX_FRAME_BYTES dropped")
+                        continue
+                    # One bad frame (or a failing delivery) must not end the relay for everything after it
+                    try:
+                        message = json.loads(line)
+                        self._deliver(message["user"], message["frame"])
+                    except Exception:
+                        self.dropped += 1
+                        logger.exception("Pub/sub frame from broker could not be delivered: %r", line[:200])
+            except ConnectionError as e:
+                logger.warning("Pub/sub broker connection failed: %s", e)
+            finally:
+                self._writer = None
+                self.connected.clear()
+                writer.close()
+            self.reconnects += 1
+            await asyncio.sleep(PUBSUB_RECONNECT_SECONDS)
+
+    async def close(self) -> None:
+        await super().close()
+        if self._task is not None:
+            self._task.cancel()
+        if self._writer is not None:
+            self._writer.close()
+
+    def stats(self) -> dict[str, Any]:
+        return {**super().stats(), "broker": f"{self.host}:{self.port}", "connected": self.connected.is_set(),
+                "reconnects": self.reconnects}
+
+class PubSubBroker:
+    """Newline-delimited JSON over TCP: `sub`/`unsub` a user id, `pub` a frame to a user's subscribers or to everyone"""
+
+    def __init__(self):
+        self.subscribers: dict[str, set[asyncio.StreamWriter]] = defaultdict(set)
+        self.clients: set[asyncio.StreamWriter] = set()
+        self.published = 0
+        self.forwarded = 0
+        self.dropped = 0
+        self.server: asyncio.Server | None = None
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> int:
+        """Listen and return the bound port (port 0 picks a free one)"""
+        self.server = await asyncio.start_server(self._client, host, port, limit=PUBSUB_MAX_FRAME_BYTES)
+        return self.server.sockets[0].getsockname()[1]
+
+    async def _client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.clients.add(writer)
+        users: set[str] = set()
+        try:
+            async for line in _lines(reader):
+                if line is None:
+                    self.dropped += 1
+                    logger.warning("Pub/sub broker dropped a line over PUBSUB_MAX_FRAME_BYTES")
+                    continue
+                try:
+                    message = json.loads(line)
+                    op, user_id = message.get("op"), message.get("user")
+                except (ValueError, AttributeError):
+                    logger.warning("Pub/sub broker ignored a malformed line: %r", line[:200])
+                    continue
+                if op == "sub":
+                    users.add(user_id)
+                    self.subscribers[user_id].add(writer)
+                elif op == "unsub":
+                    users.discard(user_id)
+                    self._drop(user_id, writer)
+                elif op == "pub":
+                    self._forward(user_id, line)
+        except ConnectionError as e:
+            logger.warning("Pub/sub client dropped: %s", e)
+        finally:
+            self.clients.discard(writer)
+            for user_id in users:
+                self._drop(user_id, writer)
+            writer.close()
+
+    def _drop(self, user_id: str, writer: asyncio.StreamWriter) -> None:
+        writers = self.subscribers.get(user_id)
+        if writers is not None:
+            writers.discard(writer)
+            if not writers:
+                del self.subscribers[user_id]
+
+    def _forward(self, user_id: str, line: bytes) -> None:
+        # The pub line already carries user and frame, so it is relayed byte for byte without re-encoding
+        self.published += 1
+        targets = self.clients if user_id == BROADCAST else self.subscribers.get(user_id, ())
+        for writer in list(targets):
+            if _writable(writer):
+                writer.write(line)
+                self.forwarded += 1
+            else:
+                self.dropped += 1
+
+    async def close(self) -> None:
+        if self.server is not None:
+            self.server.close()
+            for writer in list(self.clients):
+                writer.close()
+            # Let the client handlers see EOF and unregister instead of being cancelled mid-read
+            for _ in range(100):
+                if not self.clients:
+                    break
+                await asyncio.sleep(0.01)
+            await self.server.wait_closed()
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "clients": len(self.clients),
+            "users": len(self.subscribers),
+            "published": self.published,
+            "forwarded": self.forwarded,
+            "dropped": self.dropped,
+        }
+
+def create_backplane(url: str = PUBSUB_URL) -> Backplane:
+    """Backplane for a PUBSUB_URL: empty for in-process, tcp://host:port for a broker"""
+    if not url:
+        return InProcessBackplane()
+    parsed = urlparse(url)
+    if parsed.scheme != "tcp" or not parsed.hostname or not parsed.port:
+        raise ValueError(f"Unsupported PUBSUB_URL {url!r}; expected tcp://host:port")
+    return BrokerBackplane(parsed.hostname, parsed.port)
@@ -0,0 +1,99 @@
+"""
+Embedding Quantization
+float32 / float16 / per-vector scaled int8 storage for embedding matrices, scored without a full float32 copy
+"""
+
+import logging
+import os
+from typing import Any
+
+import numpy as np
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+STORAGE_DTYPES = ("float32", "float16", "int8")
+EMBEDDING_STORAGE_DTYPE = os.getenv("EMBEDDING_STORAGE_DTYPE", "float32")
+if EMBEDDING_STORAGE_DTYPE not in STORAGE_DTYPES:
+    logger.warning("Unknown EMBEDDING_STORAGE_DTYPE %s, using float32", EMBEDDING_STORAGE_DTYPE)
+    EMBEDDING_STORAGE_DTYPE = "float32"
+
+# Rows are upcast in small chunks while scoring so the temporary float32 block stays in cache
+_SCORE_CHUNK = 1024
+
+def row_dtype(dim: int, storage: str = EMBEDDING_STORAGE_DTYPE) -> np.dtype:
+    """On-disk/in-memory record for one vector; int8 rows carry their own float32 scale"""
+    if storage == "int8":
+        return np.dtype([("codes", "i1", (dim,)), ("scale", "<f4")])
+    return np.dtype([("codes", "<f2" if storage == "float16" else "<f4", (dim,))])
+
+def storage_of(records: np.ndarray) -> str:
+    return {"i1": "int8", "f2": "float16"}.get(records.dtype["codes"].base.str[1:], "float32")
+
+def encode_rows(vectors: np.ndarray, storage: str = EMBEDDING_STORAGE_DTYPE) -> np.ndarray:
+    """Quantize a (n, dim) float matrix into records"""
+    vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+    records = np.zeros(len(vectors), dtype=row_dtype(vectors.shape[1], storage))
+    if storage == "int8":
+        scales = np.abs(vectors).max(axis=1) / 127
+        records["scale"] = scales
+        records["codes"] = np.rint(vectors / np.maximum(scales, 1e-12)[:, None]).clip(-127, 127)
+    else:
+        records["codes"] = vectors
+    return records
+
+def decode_rows(records: np.ndarray) -> np.ndarray:
+    """Dequantize records back to float32"""
+    vectors = records["codes"].astype(np.float32)
+    if "scale" in records.dtype.names:
+        vectors *= records["scale"][..., None]
+    return vectors
+
+class QuantizedMatrix:
+    """Row-major embedding matrix in float32, float16 or scaled int8 supporting `matrix @ query`"""
+
+    def __init__(self, records: np.ndarray):
+        if records.dtype.names is None:
+            # Plain (n, dim) float32 matrix written before quantized storage existed
+            records = np.ascontiguousarray(records, dtype=np.float32)
+            records = records.view(row_dtype(records.shape[1], "float32")).reshape(-1)
+        self.records = records
+        self.storage = storage_of(records)
+        self.dim = records.dtype["codes"].shape[0]
+
+    @classmethod
+    def from_float(cls, vectors: np.ndarray, storage: str = EMBEDDING_STORAGE_DTYPE) -> "QuantizedMatrix":
+        return cls(encode_rows(vectors, storage))
+
+    @property
+    def shape(self) -> tuple[int, int]:
+        return (len(self.records), self.dim)
+
+    @property
+    def nbytes(self) -> int:
+        return len(self.records) * self.records.dtype.itemsize
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def __getitem__(self, index: Any) -> np.ndarray:
+        """Dequantized float32 row(s)"""
+        return decode_rows(self.records[index])
+
+    def __matmul__(self, query: np.ndarray) -> np.ndarray:
+        """Inner products with a float32 query, computed chunk by chunk on the stored codes"""
+        query = np.asarray(query, dtype=np.float32)
+        codes = self.records["codes"]
+        if self.storage == "float32":
+            return codes @ query
+        scores = np.empty(len(self.records), dtype=np.float32)
+        for start in range(0, len(self.records), _SCORE_CHUNK):
+            end = start + _SCORE_CHUNK
+            scores[start:end] = codes[start:end].astype(np.float32, copy=False) @ query
+        if self.storage == "int8":
+            scores *= self.records["scale"]
+        return scores
+
+    def subset(self, index: Any) -> "QuantizedMatrix":
+        """Rows selected without dequantizing"""
+        return QuantizedMatrix(self.records[index])
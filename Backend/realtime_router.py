@@ -3,18 +3,27 @@ Real-time API Router for CareerForge AI
 Handles skills analysis, job matching, resume optimization, and real-time processing
 """
 
-import json
 import logging
-import os
 import re
+from collections.abc import AsyncIterator
 from datetime import datetime
 from typing import Any
 
-import openai
 from dotenv import load_dotenv
 from fastapi import APIRouter, HTTPException, WebSocket, WebSocketDisconnect
 from pydantic import BaseModel, Field
 
+import llm_gateway
+from embeddings import embedding_batcher, embedding_cache
+from job_matcher import (
+    ANALYSIS_LLM_DEADLINE_SECONDS,
+    fallback_job_analysis,
+    fallback_market_trends,
+    job_analysis_result,
+    job_matcher,
+    local_skill_recommendations,
+    market_trends_result,
+)
 from job_matcher import (
     analyze_job_description as analyze_job_description_logic,
 )
@@ -27,13 +36,20 @@ from job_matcher import (
 from job_matcher import (
     match_resume_to_job as match_resume_to_job_logic,
 )
+from live_session import LiveSession
+from llm_streaming import send_token_frames, sse_response, stream_with_fallback
+from prompt_builder import job_description_context, prompt_messages, prompt_stats, resume_context
+from single_flight import single_flight_stats
+from task_graph import TaskGraph
+from taxonomy import current_taxonomy
+from ws_hub import hub
+from ws_protocol import FrameCodec, decode_message
+from ws_sessions import SessionLimitError, session_store
+from ws_tasks import WSRequest, scheduler_stats
 
 # Load environment variables
 load_dotenv()
 
-# Configure OpenAI
-openai.api_key = os.getenv("OPENAI_API_KEY")
-
 # Setup logging
 logger = logging.getLogger(__name__)
 
@@ -122,15 +138,23 @@ async def optimize_resume_realtime(resume_data: dict[str, Any], job_description:
         logger.error("Error in resume optimization: %s", e)
         raise HTTPException(status_code=500, detail=f"Resume optimization failed: {str(e)}")
 
+def fallback_ats_optimization(resume_data: dict[str, Any], job_description: str) -> dict[str, Any]:
+    return {
+        "optimized_resume": resume_data,
+        "ats_score": 75,
+        "keywords": extract_keywords_from_job(job_description),
+        "recommendations": ["Add more keywords", "Improve formatting"]
+    }
+
 async def optimize_for_ats(resume_data: dict[str, Any], job_description: str) -> dict[str, Any]:
     """Optimize resume for ATS systems"""
     try:
-        if openai.api_key:
+        if llm_gateway.is_enabled():
             prompt = f"""
             Optimize this resume for ATS (Applicant Tracking System):
             
-            Resume: {json.dumps(resume_data, indent=2)}
-            Job Description: {job_description}
+            Resume: {resume_context(resume_data, "ats")}
+            Job Description: {job_description_context(job_description)}
             
             Provide:
             1. Optimized resume sections
@@ -141,25 +165,17 @@ async def optimize_for_ats(resume_data: dict[str, Any], job_description: str) ->
             Format as JSON.
             """
             
-            response = await openai.ChatCompletion.acreate(
-                model="gpt-3.5-turbo",
-                messages=[{"role": "user", "content": prompt}],
-                max_tokens=800,
-                temperature=0.3
+            optimization, degraded = await llm_gateway.with_fallback(
+                lambda: llm_gateway.chat_json(prompt_messages("ats_optimization", prompt), max_tokens=800, temperature=0.3),
+                lambda: fallback_ats_optimization(resume_data, job_description)
             )
-            
-            optimization = json.loads(response.choices[0].message.content)
         else:
-            optimization = {
-                "optimized_resume": resume_data,
-                "ats_score": 75,
-                "keywords": extract_keywords_from_job(job_description),
-                "recommendations": ["Add more keywords", "Improve formatting"]
-            }
+            optimization, degraded = fallback_ats_optimization(resume_data, job_description), False
         
         return {
             "optimization_type": "ats",
             "optimized_resume": optimization,
+            "degraded": degraded,
             "timestamp": datetime.now().isoformat()
         }
         
@@ -167,14 +183,23 @@ async def optimize_for_ats(resume_data: dict[str, Any], job_description: str) ->
         logger.error("Error in ATS optimization: %s", e)
         raise HTTPException(status_code=500, detail=f"ATS optimization failed: {str(e)}")
 
+def fallback_linkedin_profile(resume_data: dict[str, Any]) -> dict[str, Any]:
+    return {
+        "headline": f"{resume_data.get('title', 'Professional')} | {', '.join(resume_data.get('skills', [])[:3])}",
+        "summary": f"Experienced professional with expertise in {', '.join(resume_data.get('skills', [])[:5])}",
+        "experience": resume_data.get('experience', []),
+        "skills": resume_data.get('skills', []),
+        "completeness_score": 85
+    }
+
 async def optimize_for_linkedin_realtime(resume_data: dict[str, Any]) -> dict[str, Any]:
     """Optimize resume for LinkedIn profile"""
     try:
-        if openai.api_key:
+        if llm_gateway.is_enabled():
             prompt = f"""
             Create an optimized LinkedIn profile from this resume:
             
-            Resume: {json.dumps(resume_data, indent=2)}
+            Resume: {resume_context(resume_data, "linkedin")}
             
             Provide:
             1. Professional headline
@@ -186,26 +211,17 @@ async def optimize_for_linkedin_realtime(resume_data: dict[str, Any]) -> dict[st
             Format as JSON.
             """
             
-            response = await openai.ChatCompletion.acreate(
-                model="gpt-3.5-turbo",
-                messages=[{"role": "user", "content": prompt}],
-                max_tokens=600,
-                temperature=0.4
+            linkedin_profile, degraded = await llm_gateway.with_fallback(
+                lambda: llm_gateway.chat_json(prompt_messages("linkedin_profile", prompt), max_tokens=600, temperature=0.4),
+                lambda: fallback_linkedin_profile(resume_data)
             )
-            
-            linkedin_profile = json.loads(response.choices[0].message.content)
         else:
-            linkedin_profile = {
-                "headline": f"{resume_data.get('title', 'Professional')} | {', '.join(resume_data.get('skills', [])[:3])}",
-                "summary": f"Experienced professional with expertise in {', '.join(resume_data.get('skills', [])[:5])}",
-                "experience": resume_data.get('experience', []),
-                "skills": resume_data.get('skills', []),
-                "completeness_score": 85
-            }
+            linkedin_profile, degraded = fallback_linkedin_profile(resume_data), False
         
         return {
             "optimization_type": "linkedin",
             "linkedin_profile": linkedin_profile,
+            "degraded": degraded,
             "timestamp": datetime.now().isoformat()
         }
         
@@ -213,15 +229,41 @@ async def optimize_for_linkedin_realtime(resume_data: dict[str, Any]) -> dict[st
         logger.error("Error in LinkedIn optimization: %s", e)
         raise HTTPException(status_code=500, detail=f"LinkedIn optimization failed: {str(e)}")
 
+def fallback_cover_letter(resume_data: dict[str, Any]) -> str:
+    return f"Dear Hiring Manager,\n\nI am excited to apply for this position. My background in {', '.join(resume_data.get('skills', [])[:3])} makes me a strong candidate.\n\nSincerely,\n{resume_data.get('name', 'Your Name')}"
+
+def cover_letter_stream(resume_data: dict[str, Any], job_description: str) -> AsyncIterator[str]:
+    """Plain-text cover letter tokens (the JSON variant cannot be shown until it is complete)"""
+    prompt = f"""
+    Create a personalized cover letter:
+    
+    Resume: {resume_context(resume_data, "cover_letter")}
+    Job Description: {job_description_context(job_description)}
+    
+    Write a compelling cover letter that:
+    1. Highlights relevant experience
+    2. Addresses job requirements
+    3. Shows enthusiasm
+    4. Includes specific achievements
+    
+    Reply with the cover letter text only.
+    """
+    return stream_with_fallback(
+        prompt_messages("cover_letter_stream", prompt),
+        lambda: fallback_cover_letter(resume_data),
+        max_tokens=500,
+        temperature=0.6
+    )
+
 async def generate_cover_letter_realtime(resume_data: dict[str, Any], job_description: str) -> dict[str, Any]:
     """Generate personalized cover letter"""
     try:
-        if openai.api_key:
+        if llm_gateway.is_enabled():
             prompt = f"""
             Create a personalized cover letter:
             
-            Resume: {json.dumps(resume_data, indent=2)}
-            Job Description: {job_description}
+            Resume: {resume_context(resume_data, "cover_letter")}
+            Job Description: {job_description_context(job_description)}
             
             Write a compelling cover letter that:
             1. Highlights relevant experience
@@ -232,22 +274,17 @@ async def generate_cover_letter_realtime(resume_data: dict[str, Any], job_descri
             Format as JSON with 'cover_letter' field.
             """
             
-            response = await openai.ChatCompletion.acreate(
-                model="gpt-3.5-turbo",
-                messages=[{"role": "user", "content": prompt}],
-                max_tokens=500,
-                temperature=0.6
+            cover_letter, degraded = await llm_gateway.with_fallback(
+                lambda: llm_gateway.chat_json(prompt_messages("cover_letter", prompt), max_tokens=500, temperature=0.6),
+                lambda: {"cover_letter": fallback_cover_letter(resume_data)}
             )
-            
-            cover_letter = json.loads(response.choices[0].message.content)
         else:
-            cover_letter = {
-                "cover_letter": f"Dear Hiring Manager,\n\nI am excited to apply for this position. My background in {', '.join(resume_data.get('skills', [])[:3])} makes me a strong candidate.\n\nSincerely,\n{resume_data.get('name', 'Your Name')}"
-            }
+            cover_letter, degraded = {"cover_letter": fallback_cover_letter(resume_data)}, False
         
         return {
             "optimization_type": "cover_letter",
             "cover_letter": cover_letter,
+            "degraded": degraded,
             "timestamp": datetime.now().isoformat()
         }
         
@@ -255,22 +292,46 @@ async def generate_cover_letter_realtime(resume_data: dict[str, Any], job_descri
         logger.error("Error in cover letter generation: %s", e)
         raise HTTPException(status_code=500, detail=f"Cover letter generation failed: {str(e)}")
 
+@router.post("/cover-letter/stream")
+async def stream_cover_letter(request: ResumeOptimizationRequest):
+    """Cover letter streamed as Server-Sent Events: `token` events, then `done` with the full text"""
+    return sse_response(cover_letter_stream(request.resume_data, request.job_description))
+
 # REAL-TIME ANALYSIS ENDPOINTS
 
 @router.post("/comprehensive-analysis")
 async def comprehensive_analysis(request: RealTimeAnalysisRequest):
     """Comprehensive real-time analysis (skills, job match, recommendations, market trends)"""
     try:
-        # Analyze job description
-        job_analysis = await analyze_job_description_logic(request.content)
-        # Skill recommendations (if user_id or target role is provided)
-        skill_recs = await get_skill_recommendations_logic(job_analysis["skills"], request.analysis_type)
-        # Market trends
-        market_trends = await analyze_market_trends_logic(job_analysis["skills"])
+        # Recommendations and market trends only need the extracted skills, not the AI job analysis,
+        # so all three branches start together once skills are known
+        snapshot = current_taxonomy()
+        graph = TaskGraph("comprehensive_analysis")
+        graph.add("skills", lambda: job_matcher.extract_skills_from_text(request.content, snapshot))
+        graph.add(
+            "job_ai", lambda skills: job_matcher.job_ai_analysis(request.content, skills),
+            after=("skills",), deadline=ANALYSIS_LLM_DEADLINE_SECONDS, fallback=fallback_job_analysis
+        )
+        graph.add(
+            "skill_recommendations", lambda skills: get_skill_recommendations_logic(skills, request.analysis_type),
+            after=("skills",), deadline=ANALYSIS_LLM_DEADLINE_SECONDS,
+            fallback=lambda skills: local_skill_recommendations(skills, request.analysis_type)
+        )
+        graph.add(
+            "market_trends", lambda skills: analyze_market_trends_logic(skills),
+            after=("skills",), deadline=ANALYSIS_LLM_DEADLINE_SECONDS,
+            fallback=lambda skills: market_trends_result(skills, fallback_market_trends())
+        )
+        results = await graph.run()
+        job_analysis = job_analysis_result(results["skills"], results["job_ai"], snapshot)
         return {
             "job_analysis": job_analysis,
-            "skill_recommendations": skill_recs,
-            "market_trends": market_trends,
+            "skill_recommendations": results["skill_recommendations"],
+            "market_trends": results["market_trends"],
+            "pipeline": graph.report,
+            "degraded": graph.degraded or any(
+                results[name].get("degraded", False) for name in ("skill_recommendations", "market_trends")
+            ),
             "timestamp": job_analysis["timestamp"]
         }
     except Exception as e:
@@ -279,70 +340,128 @@ async def comprehensive_analysis(request: RealTimeAnalysisRequest):
 
 # WEBSOCKET REAL-TIME COMMUNICATION
 
-class ConnectionManager:
-    def __init__(self):
-        self.active_connections: list[WebSocket] = []
-
-    async def connect(self, websocket: WebSocket):
-        await websocket.accept()
-        self.active_connections.append(websocket)
-
-    def disconnect(self, websocket: WebSocket):
-        self.active_connections.remove(websocket)
-
-    @staticmethod
-    async def send_personal_message(message: str, websocket: WebSocket):
-        await websocket.send_text(message)
-
-    async def broadcast(self, message: str):
-        for connection in self.active_connections:
-            try:
-                await connection.send_text(message)
-            except Exception:
-                self.active_connections.remove(connection)
-
-manager = ConnectionManager()
+async def ws_job_match(request: WSRequest) -> dict[str, Any]:
+    request.progress("Analyzing resume and job description...")
+    resume_skills_result = await analyze_job_description_logic(request.payload.get("resume_text", ""))
+    return await match_resume_to_job_logic(resume_skills_result["skills"], request.payload.get("job_description", ""))
+
+async def ws_skills_analysis(request: WSRequest) -> dict[str, Any]:
+    request.progress("Analyzing skills...")
+    return await analyze_job_description_logic(request.payload.get("text", ""))
+
+async def ws_skill_recommendations(request: WSRequest) -> dict[str, Any]:
+    request.progress("Generating skill recommendations...")
+    return await get_skill_recommendations_logic(request.payload.get("skills", []), request.payload.get("target_role", ""))
+
+async def ws_market_trends(request: WSRequest) -> dict[str, Any]:
+    request.progress("Analyzing market trends...")
+    return await analyze_market_trends_logic(request.payload.get("skills", []))
+
+async def ws_cover_letter(request: WSRequest) -> dict[str, Any]:
+    # Streamed as token frames; cancellation or a disconnect mid-stream closes the upstream LLM request
+    text = await send_token_frames(request, cover_letter_stream(
+        request.payload.get("resume_data", {}), request.payload.get("job_description", "")
+    ))
+    return {"cover_letter": text}
+
+async def ws_chat(request: WSRequest) -> dict[str, Any]:
+    text = await send_token_frames(request, stream_with_fallback(
+        request.payload.get("messages", []),
+        lambda: "Sorry, the AI chat is currently unavailable.",
+        max_tokens=300,
+        temperature=0.7
+    ))
+    return {"reply": text}
+
+def ws_live_start(request: WSRequest) -> dict[str, Any]:
+    """Open a live-editing session on this socket; later `live_update` edits only re-read the lines they touch"""
+    session = LiveSession(request.payload.get("text", ""), request.payload.get("job_description", ""))
+    request.state["live"] = session
+    return session.result(lines_extracted=len(session.lines))
+
+def ws_live_update(request: WSRequest) -> dict[str, Any]:
+    session = request.state.get("live")
+    if session is None:
+        raise ValueError("No live session; send live_start first.")
+    return session.apply(request.payload)
+
+def ws_hello(request: WSRequest) -> dict[str, Any]:
+    """Switch encoding or delta frames after connecting, for clients that cannot offer a subprotocol"""
+    codec = request.connection.codec
+    request.connection.codec = FrameCodec(
+        request.payload.get("encoding", codec.encoding), bool(request.payload.get("deltas", codec.deltas))
+    )
+    return request.connection.codec.describe()
+
+WS_HANDLERS = {
+    "job_match": ws_job_match,
+    "skills_analysis": ws_skills_analysis,
+    "skill_recommendations": ws_skill_recommendations,
+    "market_trends": ws_market_trends,
+    "cover_letter": ws_cover_letter,
+    "chat": ws_chat,
+    "live_start": ws_live_start,
+    "live_update": ws_live_update,
+    "hello": ws_hello,
+}
 
 @router.websocket("/ws/{user_id}")
 async def websocket_endpoint(websocket: WebSocket, user_id: str):
-    await websocket.accept()
+    """Messages are handled concurrently; every frame carries the `request_id` of the message it answers
+
+    Reconnect with `?session=<token>&last_seq=<n>` to resume: requests still running keep going and
+    results the client missed are replayed.
+    """
+    connection = await hub.connect(websocket, user_id)
     try:
-        await websocket.send_json({"type": "info", "data": {"message": "Connected. Send your resume/job description for real-time analysis."}})
+        last_seq = int(websocket.query_params.get("last_seq", 0))
+    except ValueError:
+        last_seq = 0
+    try:
+        session, resume, replay = session_store.attach(
+            connection, WS_HANDLERS, websocket.query_params.get("session"), last_seq
+        )
+    except SessionLimitError as e:
+        logger.warning("Refusing WebSocket of %s: %s", user_id, e)
+        await hub.disconnect(connection)
+        # 1013 "try again later", as for a slow consumer
+        await connection.close(1013, "session limit reached")
+        return
+    try:
+        # The session token and the requests still running come first, then the results the client missed
+        connection.send({"type": "info", "data": {
+            "message": "Connected. Send your resume/job description for real-time analysis.",
+            "protocol": connection.codec.describe(),
+            **resume
+        }})
+        for message in replay:
+            connection.send(message)
         while True:
-            data = await websocket.receive_json()
-            msg_type = data.get("type")
-            payload = data.get("data", {})
-            if msg_type == "job_match":
-                resume_text = payload.get("resume_text", "")
-                job_description = payload.get("job_description", "")
-                await websocket.send_json({"type": "progress", "data": {"message": "Analyzing resume and job description..."}})
-                resume_skills_result = await analyze_job_description_logic(resume_text)
-                resume_skills = resume_skills_result["skills"]
-                result = await match_resume_to_job_logic(resume_skills, job_description)
-                await websocket.send_json({"type": "job_match_result", "data": result})
-            elif msg_type == "skills_analysis":
-                text = payload.get("text", "")
-                await websocket.send_json({"type": "progress", "data": {"message": "Analyzing skills..."}})
-                result = await analyze_job_description_logic(text)
-                await websocket.send_json({"type": "skills_analysis_result", "data": result})
-            elif msg_type == "skill_recommendations":
-                skills = payload.get("skills", [])
-                target_role = payload.get("target_role", "")
-                await websocket.send_json({"type": "progress", "data": {"message": "Generating skill recommendations..."}})
-                recs = await get_skill_recommendations_logic(skills, target_role)
-                await websocket.send_json({"type": "skill_recommendations_result", "data": recs})
-            elif msg_type == "market_trends":
-                skills = payload.get("skills", [])
-                await websocket.send_json({"type": "progress", "data": {"message": "Analyzing market trends..."}})
-                trends = await analyze_market_trends_logic(skills)
-                await websocket.send_json({"type": "market_trends_result", "data": trends})
-            else:
-                await websocket.send_json({"type": "error", "data": {"message": "Unknown message type."}})
+            # receive(), not receive_text(): a MessagePack client sends binary frames
+            event = await websocket.receive()
+            if event["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(event.get("code", 1000))
+            frame = event.get("text")
+            try:
+                message = decode_message(frame if frame is not None else event.get("bytes") or b"")
+            except ValueError:
+                connection.send({"type": "error", "data": {
+                    "message": "Messages must be JSON text frames or MessagePack binary frames."
+                }})
+                continue
+            if not isinstance(message, dict) or not isinstance(message.get("type"), str):
+                connection.send({"type": "error", "data": {"message": "Messages must be objects with a string `type`."}})
+                continue
+            session.scheduler.submit(message)
     except WebSocketDisconnect:
         logger.info("WebSocket disconnected: %s", user_id)
     except Exception as e:
-        await websocket.send_json({"type": "error", "data": {"message": str(e)}})
+        connection.send({"type": "error", "data": {"message": str(e)}})
         logger.error("WebSocket error: %s", e)
+    finally:
+        # The session keeps its requests running for WS_SESSION_TTL_SECONDS in case the client comes back
+        session_store.detach(session, connection)
+        await hub.disconnect(connection)
 
 # UTILITY FUNCTIONS
 
@@ -393,8 +512,17 @@ async def realtime_health_check():
 async def realtime_status():
     """Get real-time service status"""
     return {
-        "active_connections": len(manager.active_connections),
-        "ai_available": bool(openai.api_key),
+        "active_connections": len(hub.connections),
+        "websocket": hub.stats(),
+        "websocket_requests": scheduler_stats.to_dict(),
+        "websocket_sessions": session_store.stats(),
+        "ai_available": llm_gateway.is_enabled(),
+        "ai_degraded": llm_gateway.is_degraded(),
+        "llm": llm_gateway.gateway.stats(),
         "services": ["skills", "jobs", "matching", "optimization"],
+        "inference": {"embedder": embedding_batcher.stats()},
+        "embedding_cache": embedding_cache.stats(),
+        "single_flight": single_flight_stats(),
+        "prompts": prompt_stats.to_dict(),
         "timestamp": datetime.now().isoformat()
     } 
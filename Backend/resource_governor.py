@@ -0,0 +1,181 @@
+"""
+CPU Resource Governor
+Divides the machine's cores between uvicorn workers, torch and BLAS threads and the document parse pool
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import os
+import threading
+from collections.abc import Callable
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+# Thread-count variables read by OpenMP / BLAS libraries when they are first loaded
+_THREAD_ENV_VARS = (
+    "OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS",
+    "NUMEXPR_NUM_THREADS", "VECLIB_MAXIMUM_THREADS",
+)
+
+def available_cores() -> int:
+    """Cores this container may use: CPU affinity capped by any cgroup v2 quota"""
+    try:
+        cores = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cores = os.cpu_count() or 1
+    try:
+        with open("/sys/fs/cgroup/cpu.max", encoding="utf-8") as f:
+            quota, period = f.read().split()
+        if quota != "max":
+            cores = min(cores, max(1, int(int(quota) / int(period))))
+    except (OSError, ValueError):
+        pass
+    return cores
+
+class ResourcePlan:
+    """Per-worker share of the cores; every field can be pinned with its environment variable"""
+
+    def __init__(self, cores: int | None = None):
+        self.cores = int(os.getenv("CPU_CORES", "0")) or cores or available_cores()
+        self.workers = max(1, int(os.getenv("WEB_CONCURRENCY", "1")))
+        per_worker = max(1, self.cores // self.workers)
+        # A quarter of each worker's share goes to parse processes once there are enough cores to split
+        self.parse_processes = int(os.getenv("PARSE_POOL_PROCESSES", str(per_worker // 4 if per_worker >= 4 else 0)))
+        compute = max(1, per_worker - self.parse_processes)
+        self.torch_threads = int(os.getenv("TORCH_NUM_THREADS", str(compute)))
+        self.torch_interop_threads = int(os.getenv("TORCH_NUM_INTEROP_THREADS", "1"))
+        self.blas_threads = int(os.getenv("BLAS_NUM_THREADS", str(compute)))
+
+    def to_dict(self) -> dict[str, int]:
+        return {
+            "cores": self.cores,
+            "workers": self.workers,
+            "cores_per_worker": max(1, self.cores // self.workers),
+            "torch_threads": self.torch_threads,
+            "torch_interop_threads": self.torch_interop_threads,
+            "blas_threads": self.blas_threads,
+            "parse_processes": self.parse_processes,
+            "total_threads": self.workers * (self.torch_threads + self.parse_processes),
+        }
+
+def apply_environment(plan: ResourcePlan) -> None:
+    """Set BLAS/OpenMP thread limits; only effective before numpy/torch are imported"""
+    for name in _THREAD_ENV_VARS:
+        os.environ.setdefault(name, str(plan.blas_threads))
+    # The embedder is already fed batches by the micro-batcher; tokenizer threads would only compete
+    os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+
+class ResourceGovernor:
+    """Applies the plan in this worker and owns its parse process pool"""
+
+    def __init__(self, plan: ResourcePlan):
+        self.plan = plan
+        self.applied: dict[str, Any] = {}
+        self._parse_pool: ProcessPoolExecutor | None = None
+        self._lock = threading.Lock()
+
+    def apply(self) -> dict[str, Any]:
+        """Limit torch and already-loaded BLAS pools to this worker's share (call once at startup)"""
+        applied: dict[str, Any] = {"env": {name: os.environ.get(name) for name in _THREAD_ENV_VARS}}
+        try:
+            import torch
+            torch.set_num_threads(self.plan.torch_threads)
+            try:
+                torch.set_num_interop_threads(self.plan.torch_interop_threads)
+            except RuntimeError:
+                # Can only be set before torch runs its first parallel op
+                logger.warning("torch inter-op threads already fixed at %d", torch.get_num_interop_threads())
+            applied["torch"] = {"threads": torch.get_num_threads(), "interop_threads": torch.get_num_interop_threads()}
+        except ImportError:
+            applied["torch"] = None
+        try:
+            from threadpoolctl import threadpool_info, threadpool_limits
+            threadpool_limits(self.plan.blas_threads)
+            applied["threadpools"] = [
+                {"library": pool["internal_api"], "threads": pool["num_threads"]} for pool in threadpool_info()
+            ]
+        except ImportError:
+            applied["threadpools"] = None
+        self.applied = applied
+        logger.info("Resource plan applied: %s", self.plan.to_dict())
+        return applied
+
+    def parse_pool(self) -> ProcessPoolExecutor | None:
+        """Process pool for CPU-bound document parsing, or None to use the default thread pool"""
+        if self.plan.parse_processes <= 0:
+            return None
+        if self._parse_pool is None:
+            with self._lock:
+                if self._parse_pool is None:
+                    # Spawned, not forked: the worker already runs torch and event-loop threads
+                    self._parse_pool = ProcessPoolExecutor(
+                        max_workers=self.plan.parse_processes,
+                        mp_context=multiprocessing.get_context("spawn")
+                    )
+        return self._parse_pool
+
+    async def run_parse(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """Run a picklable, module-level function in the parse pool"""
+        return await asyncio.get_running_loop().run_in_executor(self.parse_pool(), fn, *args)
+
+    def shutdown(self) -> None:
+        if self._parse_pool is not None:
+            self._parse_pool.shutdown(wait=False, cancel_futures=True)
+            self._parse_pool = None
+
+    def status(self) -> dict[str, Any]:
+        return {
+            "plan": self.plan.to_dict(),
+            "applied": self.applied,
+            "pressure": cpu_pressure(),
+            "process": process_threads(),
+        }
+
+def cpu_pressure() -> dict[str, Any]:
+    """Load average, run-queue length and (where the kernel exposes it) CPU pressure stall information"""
+    pressure: dict[str, Any] = {"cores": available_cores()}
+    try:
+        load1, load5, load15 = os.getloadavg()
+        pressure["loadavg"] = [round(load1, 2), round(load5, 2), round(load15, 2)]
+        pressure["load_per_core"] = round(load1 / pressure["cores"], 2)
+    except OSError:
+        pass
+    try:
+        with open("/proc/stat", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith(("procs_running", "procs_blocked")):
+                    name, value = line.split()
+                    pressure[name] = int(value)
+        if "procs_running" in pressure:
+            pressure["run_queue_per_core"] = round(pressure["procs_running"] / pressure["cores"], 2)
+    except OSError:
+        pass
+    try:
+        with open("/proc/pressure/cpu", encoding="utf-8") as f:
+            some = f.readline().split()
+        pressure["psi_some"] = {key: float(value) for key, value in (field.split("=") for field in some[1:4])}
+    except (OSError, ValueError):
+        pass
+    return pressure
+
+def process_threads() -> dict[str, Any]:
+    """Thread count and context switches of this worker; a climbing involuntary count means oversubscription"""
+    info: dict[str, Any] = {"pid": os.getpid(), "python_threads": threading.active_count()}
+    try:
+        with open("/proc/self/status", encoding="utf-8") as f:
+            for line in f:
+                name, _, value = line.partition(":")
+                if name in ("Threads", "voluntary_ctxt_switches", "nonvoluntary_ctxt_switches"):
+                    info[name.lower()] = int(value)
+    except OSError:
+        pass
+    return info
+
+# Global instance; thread limits go into the environment as soon as this module is imported
+resource_plan = ResourcePlan()
+apply_environment(resource_plan)
+resource_governor = ResourceGovernor(resource_plan)
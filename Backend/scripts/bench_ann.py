@@ -0,0 +1,58 @@
+"""
+ANN Index Benchmark
+Builds an IVF index over synthetic clustered embeddings and reports recall@k and latency against the exact scan
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ann_index import IVFIndex  # noqa: E402
+
+
+def synthetic_embeddings(n: int, dim: int, clusters: int, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim)).astype(np.float32)
+    vectors = centers[rng.integers(clusters, size=n)] + 0.5 * rng.normal(size=(n, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size", type=int, default=200000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--clusters", type=int, default=500)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 4, 8, 16, 32, 64])
+    args = parser.parse_args()
+
+    vectors = synthetic_embeddings(args.size, args.dim, args.clusters)
+    keys = [f"job:{i}" for i in range(args.size)]
+    queries = synthetic_embeddings(args.queries, args.dim, args.clusters, seed=1)
+
+    started = time.perf_counter()
+    index = IVFIndex.train(vectors, keys)
+    print(f"trained {index.n_lists} lists over {args.size} vectors in {time.perf_counter() - started:.1f}s")
+
+    with tempfile.TemporaryDirectory() as directory:
+        started = time.perf_counter()
+        index.save(directory)
+        saved = time.perf_counter() - started
+        started = time.perf_counter()
+        index = IVFIndex.load(directory)
+        print(f"save {saved:.2f}s, mmap load {(time.perf_counter() - started) * 1000:.1f}ms")
+
+        print(f"{'nprobe':>6} {'recall@k':>9} {'ann p50':>9} {'ann p95':>9} {'exact p50':>10}")
+        for nprobe in args.nprobe:
+            report = index.recall_at_k(queries, vectors, keys, args.k, nprobe)
+            print(f"{report['nprobe']:>6} {report['recall_at_k']:>9.4f} {report['ann_ms_p50']:>7.2f}ms "
+                  f"{report['ann_ms_p95']:>7.2f}ms {report['exact_ms_p50']:>8.2f}ms")
+
+if __name__ == "__main__":
+    main()
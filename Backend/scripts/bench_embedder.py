@@ -0,0 +1,73 @@
+"""
+Embedder Backend Benchmark
+Validates each inference backend against the reference float32 torch model and measures throughput and latency
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from embeddings import load_model  # noqa: E402
+
+
+def corpus(limit: int) -> list[str]:
+    """Job descriptions and titles from jobs.json, padded with skill phrases"""
+    path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "jobs.json")
+    texts = []
+    with open(path, encoding="utf-8") as f:
+        for job in json.load(f):
+            texts.append(job.get("description") or job.get("title", ""))
+            texts.append(f"{job.get('title', '')}. Skills: {', '.join(job.get('skills_required', []))}")
+    texts = [text for text in texts if text]
+    if not texts:
+        raise SystemExit(f"No job texts in {path} to benchmark with")
+    while len(texts) < limit:
+        texts.extend(texts)
+    return texts[:limit]
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--backends", nargs="+", default=["torch", "torch-int8", "onnx"])
+    parser.add_argument("--max-seq-length", type=int, nargs="+", default=[0])
+    parser.add_argument("--sentences", type=int, default=512)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--latency-runs", type=int, default=200)
+    args = parser.parse_args()
+
+    texts = corpus(args.sentences)
+    reference = load_model("torch", 0).encode(texts, batch_size=args.batch_size, normalize_embeddings=True)
+
+    print(f"{len(texts)} sentences, batch {args.batch_size}, {os.cpu_count()} CPUs")
+    print(f"{'backend':>12} {'seq':>5} {'cos mean':>9} {'cos min':>8} {'sent/s':>8} {'p50 ms':>7} {'p99 ms':>7}")
+    for backend in args.backends:
+        for max_seq_length in args.max_seq_length:
+            try:
+                model = load_model(backend, max_seq_length)
+            except Exception as e:
+                print(f"{backend:>12} {max_seq_length or '-':>5} unavailable: {e}")
+                continue
+            model.encode(texts[:args.batch_size], batch_size=args.batch_size)  # warm up
+
+            started = time.perf_counter()
+            vectors = model.encode(texts, batch_size=args.batch_size, normalize_embeddings=True)
+            throughput = len(texts) / (time.perf_counter() - started)
+            agreement = np.sum(vectors * reference, axis=1)
+
+            latencies = []
+            for text in texts[:args.latency_runs]:
+                started = time.perf_counter()
+                model.encode([text])
+                latencies.append((time.perf_counter() - started) * 1000)
+            p99 = statistics.quantiles(latencies, n=100)[98]
+            print(f"{backend:>12} {max_seq_length or model.max_seq_length:>5} {agreement.mean():>9.5f} "
+                  f"{agreement.min():>8.5f} {throughput:>8.1f} {statistics.median(latencies):>7.2f} {p99:>7.2f}")
+
+if __name__ == "__main__":
+    main()
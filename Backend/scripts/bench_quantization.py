@@ -0,0 +1,70 @@
+"""
+Quantized Embedding Benchmark
+Compares float16 and int8 embedding storage against float32: memory, scoring speed and ranking agreement
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from quantization import STORAGE_DTYPES, QuantizedMatrix  # noqa: E402
+
+
+def load_vectors(size: int, dim: int, path: str | None) -> np.ndarray:
+    """Real embeddings from a saved job matrix when given, otherwise clustered synthetic ones"""
+    if path:
+        vectors = QuantizedMatrix(np.load(path, mmap_mode="r"))[:size]
+    else:
+        rng = np.random.default_rng(0)
+        centers = rng.normal(size=(max(size // 200, 1), dim)).astype(np.float32)
+        vectors = centers[rng.integers(len(centers), size=size)] + 0.5 * rng.normal(size=(size, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+def kendall_tau(a: np.ndarray, b: np.ndarray) -> float:
+    """Kendall tau-a between two score vectors (O(n^2), use on a sample)"""
+    sign_a = np.sign(a[:, None] - a[None, :])
+    sign_b = np.sign(b[:, None] - b[None, :])
+    n = len(a)
+    return float((sign_a * sign_b).sum() / (n * (n - 1)))
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size", type=int, default=200000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--tau-sample", type=int, default=1000)
+    parser.add_argument("--matrix", help="optional job_embeddings.npy to benchmark real embeddings")
+    args = parser.parse_args()
+
+    vectors = load_vectors(args.size, args.dim, args.matrix)
+    rng = np.random.default_rng(1)
+    queries = vectors[rng.choice(len(vectors), args.queries, replace=False)]
+    queries = queries + 0.3 * rng.normal(size=queries.shape).astype(np.float32)
+    tau_rows = rng.choice(len(vectors), min(args.tau_sample, len(vectors)), replace=False)
+
+    baseline = QuantizedMatrix.from_float(vectors, "float32")
+    reference = [baseline @ query for query in queries]
+    reference_top = [set(np.argpartition(-scores, args.k)[:args.k].tolist()) for scores in reference]
+
+    print(f"{args.size} x {vectors.shape[1]} vectors, {args.queries} queries, k={args.k}")
+    print(f"{'storage':>8} {'MB':>8} {'saved':>6} {'score p50':>10} {'recall@k':>9} {'kendall':>8}")
+    for storage in STORAGE_DTYPES:
+        matrix = QuantizedMatrix.from_float(vectors, storage)
+        timings, recalls, taus = [], [], []
+        for query, expected, top in zip(queries, reference, reference_top, strict=True):
+            started = time.perf_counter()
+            scores = matrix @ query
+            timings.append((time.perf_counter() - started) * 1000)
+            recalls.append(len(set(np.argpartition(-scores, args.k)[:args.k].tolist()) & top) / args.k)
+            taus.append(kendall_tau(expected[tau_rows], scores[tau_rows]))
+        print(f"{storage:>8} {matrix.nbytes / 2**20:>8.1f} {1 - matrix.nbytes / baseline.nbytes:>6.0%} "
+              f"{np.percentile(timings, 50):>8.2f}ms {np.mean(recalls):>9.4f} {np.mean(taus):>8.4f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+LLM Endpoint Load Test
+Closed-loop load against the LLM-bound endpoints, reporting throughput, errors and latency percentiles per endpoint
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from collections import Counter, defaultdict
+from typing import Any
+
+import httpx
+
+JOB_DESCRIPTION = (
+    "We are hiring a backend engineer to build Python and FastAPI services on AWS. You will run Docker and "
+    "Kubernetes deployments, design PostgreSQL schemas and work with the ML team on TensorFlow models."
+)
+RESUME_TEXT = "Backend developer, 5 years of Python, Django, Docker, PostgreSQL, Redis and AWS."
+SKILLS = ["Python", "Docker", "AWS", "PostgreSQL"]
+
+# The skills-jobs router carries its own /skills-jobs prefix and is mounted under /api/skills-jobs
+SKILLS_JOBS = "/api/skills-jobs/skills-jobs"
+# Likewise the realtime router's own /realtime prefix under /api/realtime
+REALTIME = "/api/realtime/realtime"
+
+def presets(variant: str) -> dict[str, tuple[str, Any, bool]]:
+    """name -> (path, JSON body, is SSE stream); `variant` makes bodies unique to defeat caching and coalescing"""
+    job_description = f"{JOB_DESCRIPTION} {variant}".strip()
+    return {
+        "comprehensive": (f"{REALTIME}/comprehensive-analysis",
+                          {"content": job_description, "analysis_type": "Backend Engineer", "user_id": "load-test"}, False),
+        "job-matching": (f"{REALTIME}/job-matching",
+                         {"resume_text": RESUME_TEXT, "job_description": job_description}, False),
+        "skill-analysis": (f"{SKILLS_JOBS}/skill-analysis", {"skill_name": f"Python {variant}".strip()}, False),
+        "market-analysis": (f"{SKILLS_JOBS}/market-analysis", {"skills": SKILLS + ([variant] if variant else [])}, False),
+        "job-match": (f"{SKILLS_JOBS}/job-match", {"resume_skills": SKILLS, "job_description": job_description}, False),
+        "gpt-chat": ("/gpt-chat", [{"role": "user", "content": f"How do I prepare for a backend interview? {variant}"}], False),
+        "gpt-chat-stream": ("/gpt-chat/stream",
+                            [{"role": "user", "content": f"How do I prepare for a backend interview? {variant}"}], True),
+    }
+
+class Results:
+    def __init__(self):
+        self.latencies: dict[str, list[float]] = defaultdict(list)
+        self.first_token: dict[str, list[float]] = defaultdict(list)
+        self.statuses: dict[str, Counter] = defaultdict(Counter)
+
+    def report(self, elapsed: float) -> None:
+        print(f"{'endpoint':>16} {'ok':>6} {'err':>5} {'rps':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8} {'ttft p50':>9}")
+        for name, latencies in sorted(self.latencies.items()):
+            statuses = self.statuses[name]
+            ok = sum(count for status, count in statuses.items() if status == 200)
+            cuts = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+            ttft = f"{statistics.median(self.first_token[name]):>9.1f}" if self.first_token[name] else f"{'-':>9}"
+            print(f"{name:>16} {ok:>6} {sum(statuses.values()) - ok:>5} {len(latencies) / elapsed:>7.1f} "
+                  f"{statistics.median(latencies):>8.1f} {cuts[94]:>8.1f} {cuts[98]:>8.1f} {max(latencies):>8.1f} {ttft}")
+            errors = {status: count for status, count in statuses.items() if status != 200}
+            if errors:
+                print(f"{'':>16} errors: {errors}")
+
+async def request(client: httpx.AsyncClient, name: str, preset: tuple[str, Any, bool], results: Results) -> None:
+    path, body, stream = preset
+    started = time.perf_counter()
+    try:
+        if stream:
+            first_token = None
+            async with client.stream("POST", path, json=body) as response:
+                async for line in response.aiter_lines():
+                    if first_token is None and line.startswith("event: token"):
+                        first_token = (time.perf_counter() - started) * 1000
+                status = response.status_code
+            if first_token is not None:
+                results.first_token[name].append(first_token)
+        else:
+            response = await client.post(path, json=body)
+            status = response.status_code
+    except httpx.TimeoutException:
+        status = "timeout"
+    except httpx.TransportError as e:
+        status = type(e).__name__
+    results.latencies[name].append((time.perf_counter() - started) * 1000)
+    results.statuses[name][status] += 1
+
+async def worker(client: httpx.AsyncClient, names: list[str], args: argparse.Namespace, deadline: float,
+                 counter: list[int], results: Results) -> None:
+    while time.monotonic() < deadline and (not args.requests or counter[0] < args.requests):
+        counter[0] += 1
+        name = names[counter[0] % len(names)]
+        variant = "" if args.identical else f"(request {counter[0]})"
+        await request(client, name, presets(variant)[name], results)
+
+async def run(args: argparse.Namespace) -> None:
+    names = args.endpoints
+    unknown = set(names) - set(presets(""))
+    if unknown:
+        raise SystemExit(f"Unknown endpoints {sorted(unknown)}; choose from {sorted(presets(''))}")
+    results = Results()
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout, limits=limits) as client:
+        started = time.monotonic()
+        counter = [0]
+        await asyncio.gather(*(
+            worker(client, names, args, started + args.duration, counter, results) for _ in range(args.concurrency)
+        ))
+        elapsed = time.monotonic() - started
+    print(f"{args.concurrency} concurrent clients, {counter[0]} requests in {elapsed:.1f}s "
+          f"({'identical' if args.identical else 'unique'} bodies)")
+    results.report(elapsed)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"latencies_ms": results.latencies, "statuses": {k: {str(s): c for s, c in v.items()}
+                                                                         for k, v in results.statuses.items()}}, f)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--endpoints", nargs="+", default=["comprehensive", "job-matching", "market-analysis", "gpt-chat"])
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=30, help="seconds to run")
+    parser.add_argument("--requests", type=int, default=0, help="stop after this many requests (0 = duration only)")
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--identical", action="store_true", help="send identical bodies (exercises cache and coalescing)")
+    parser.add_argument("--json", help="also write raw latencies to this file")
+    asyncio.run(run(parser.parse_args()))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,262 @@
+"""
+OpenAI Stand-in Server
+Local chat-completions endpoint with configurable latency, token rate, error and timeout injection, for offline load tests
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+from http import HTTPStatus
+from typing import Any
+
+# Canned replies for the app's JSON prompts, matched on a phrase of the prompt (first match wins)
+CANNED_PAYLOADS: list[tuple[str, dict[str, Any]]] = [
+    ("analyze this job description", {
+        "required_skills": [{"skill": "Python", "importance": "High"}, {"skill": "Docker", "importance": "Medium"}],
+        "experience_level": "mid",
+        "industry": "Technology",
+        "responsibilities": ["Build and maintain services", "Review code"],
+        "salary_range": "$90k-$130k",
+        "qualifications": ["Bachelor's degree in Computer Science"],
+        "nice_to_have": ["Kubernetes"],
+    }),
+    ("match between candidate and job", {
+        "match_analysis": "Strong overlap on core skills",
+        "strengths": ["Python"],
+        "improvements": ["Kubernetes"],
+        "interview_tips": ["Prepare a system design example"],
+        "salary_insights": "Within market range",
+        "career_suggestions": ["Get a cloud certification"],
+    }),
+    ("job-candidate match", {
+        "match_percentage": 72,
+        "strengths": ["Python"],
+        "improvements": ["Kubernetes"],
+        "interview_tips": ["Prepare a system design example"],
+        "salary_insights": "Within market range",
+    }),
+    ("skill recommendations", {
+        "missing_skills": ["Kubernetes", "Terraform"],
+        "priority": "High",
+        "learning_path": "Hands-on projects",
+        "time_to_acquire": "3 months",
+        "resources": ["Official documentation"],
+    }),
+    ("recommend skills", {
+        "missing_skills": ["Kubernetes", "Terraform"],
+        "priority": "High",
+        "learning_path": "Hands-on projects",
+        "time_to_acquire": "3 months",
+        "resources": ["Official documentation"],
+    }),
+    ("market trends", {
+        "demand_trends": "Growing",
+        "salary_trends": "Increasing",
+        "opportunities": "Cloud and AI roles",
+        "risks": "Automation of routine work",
+        "outlook": "Positive",
+        "hotspots": ["Bangalore", "Berlin"],
+    }),
+    ("market demand", {
+        "demand_level": "High",
+        "salary_range": "$80k-$140k",
+        "job_opportunities": "Many",
+        "growth_trend": "Positive",
+        "related_skills": ["Docker"],
+    }),
+    ("resume for ats", {
+        "optimized_resume": {"summary": "Backend engineer"},
+        "keywords": ["Python", "REST"],
+        "ats_score": 82,
+        "recommendations": ["Use standard section headings"],
+    }),
+    ("linkedin profile", {
+        "headline": "Backend Engineer | Python | Cloud",
+        "summary": "Engineer building reliable services",
+        "experience": [],
+        "skills": ["Python"],
+        "completeness_score": 90,
+    }),
+    ("'cover_letter' field", {"cover_letter": "Dear Hiring Manager,\n\nI am excited to apply.\n\nSincerely,\nCandidate"}),
+]
+
+FILLER = ("Thank you for the opportunity to apply. My experience building reliable backend services, "
+          "working closely with product teams and mentoring engineers matches what you are looking for. ").split(" ")
+
+class StandinConfig:
+    """Behaviour knobs; every request samples its own latency and fault"""
+
+    def __init__(self, args: argparse.Namespace):
+        self.latency = args.latency
+        self.latency_ms = args.latency_ms
+        self.latency_sigma = args.latency_sigma
+        self.token_rate = args.token_rate
+        self.error_rate = args.error_rate
+        self.error_codes = args.error_codes
+        self.timeout_rate = args.timeout_rate
+        self.hang_seconds = args.hang_seconds
+        self.payloads = list(CANNED_PAYLOADS)
+        if args.payloads:
+            with open(args.payloads, encoding="utf-8") as f:
+                self.payloads = list(json.load(f).items()) + self.payloads
+
+    def first_token_delay(self) -> float:
+        """Seconds before the first token: fixed, uniform(0, 2x) or lognormal around latency_ms"""
+        median = self.latency_ms / 1000
+        if self.latency == "uniform":
+            return random.uniform(0, 2 * median)
+        if self.latency == "lognormal":
+            return random.lognormvariate(0, self.latency_sigma) * median
+        return median
+
+    def reply(self, messages: list[dict[str, Any]], max_tokens: int) -> str:
+        prompt = " ".join(str(message.get("content", "")) for message in messages).lower()
+        for phrase, payload in self.payloads:
+            if phrase.lower() in prompt:
+                return json.dumps(payload)
+        if "json" in prompt:
+            return json.dumps({"result": "ok"})
+        words = (FILLER * (max_tokens // len(FILLER) + 1))[:max(1, min(max_tokens, 120))]
+        return " ".join(words).strip()
+
+class StandinServer:
+    """Minimal HTTP/1.1 keep-alive server for POST /v1/chat/completions (plain and stream=true)"""
+
+    def __init__(self, config: StandinConfig):
+        self.config = config
+        self.started = time.time()
+        self.requests = 0
+        self.errors = 0
+        self.hangs = 0
+        self.in_flight = 0
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, path, _ = request_line.decode("latin-1").split(" ", 2)
+                headers = {}
+                while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get("content-length", "0") or 0))
+                await self.route(method, path.split("?")[0], body, writer)
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def route(self, method: str, path: str, body: bytes, writer: asyncio.StreamWriter) -> None:
+        if method == "GET" and path in ("/health", "/stats"):
+            await self.respond(writer, 200, self.stats())
+        elif method == "POST" and path.endswith("/chat/completions"):
+            self.requests += 1
+            self.in_flight += 1
+            try:
+                await self.complete(json.loads(body or b"{}"), writer)
+            finally:
+                self.in_flight -= 1
+        else:
+            await self.respond(writer, 404, {"error": {"message": f"No route for {method} {path}"}})
+
+    async def complete(self, request: dict[str, Any], writer: asyncio.StreamWriter) -> None:
+        config = self.config
+        if random.random() < config.timeout_rate:
+            # Accept the request and never answer, like an overloaded upstream
+            self.hangs += 1
+            await asyncio.sleep(config.hang_seconds)
+            raise ConnectionError("injected timeout")
+        await asyncio.sleep(config.first_token_delay())
+        if random.random() < config.error_rate:
+            self.errors += 1
+            code = random.choice(config.error_codes)
+            headers = {"Retry-After": "1"} if code == 429 else {}
+            await self.respond(writer, code, {"error": {"message": "injected error", "code": code}}, headers)
+            return
+
+        model = request.get("model", "standin")
+        content = config.reply(request.get("messages", []), int(request.get("max_tokens") or 300))
+        tokens = [content[i:i + 4] for i in range(0, len(content), 4)]  # ~4 characters per token
+        interval = 1 / config.token_rate if config.token_rate > 0 else 0
+        created = int(time.time())
+        if not request.get("stream"):
+            await asyncio.sleep(interval * len(tokens))
+            await self.respond(writer, 200, {
+                "id": f"chatcmpl-standin-{self.requests}",
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": 0, "completion_tokens": len(tokens), "total_tokens": len(tokens)},
+            })
+            return
+
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\nTransfer-Encoding: chunked\r\n\r\n")
+        for token in tokens:
+            chunk = {"id": f"chatcmpl-standin-{self.requests}", "object": "chat.completion.chunk", "created": created,
+                     "model": model, "choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}]}
+            await self.write_chunk(writer, f"data: {json.dumps(chunk)}\n\n".encode())
+            if interval:
+                await asyncio.sleep(interval)
+        await self.write_chunk(writer, b"data: [DONE]\n\n")
+        await self.write_chunk(writer, b"")
+
+    @staticmethod
+    async def write_chunk(writer: asyncio.StreamWriter, data: bytes) -> None:
+        writer.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        await writer.drain()
+
+    @staticmethod
+    async def respond(writer: asyncio.StreamWriter, status: int, payload: dict[str, Any], headers: dict[str, str] | None = None) -> None:
+        body = json.dumps(payload).encode()
+        head = [f"HTTP/1.1 {status} {HTTPStatus(status).phrase}", "Content-Type: application/json", f"Content-Length: {len(body)}"]
+        head += [f"{name}: {value}" for name, value in (headers or {}).items()]
+        writer.write(("\r\n".join(head) + "\r\n\r\n").encode() + body)
+        await writer.drain()
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "uptime_seconds": round(time.time() - self.started, 1),
+            "requests": self.requests,
+            "errors": self.errors,
+            "hangs": self.hangs,
+            "in_flight": self.in_flight,
+        }
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8600)
+    parser.add_argument("--latency", choices=["fixed", "uniform", "lognormal"], default="lognormal")
+    parser.add_argument("--latency-ms", type=float, default=400, help="median time to first token")
+    parser.add_argument("--latency-sigma", type=float, default=0.5, help="lognormal spread (tail heaviness)")
+    parser.add_argument("--token-rate", type=float, default=50, help="generated tokens per second (0 = instant)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with an error")
+    parser.add_argument("--error-codes", type=int, nargs="+", default=[429, 500, 503])
+    parser.add_argument("--timeout-rate", type=float, default=0.0, help="fraction of requests that never answer")
+    parser.add_argument("--hang-seconds", type=float, default=60)
+    parser.add_argument("--payloads", help="JSON file of {prompt phrase: payload} checked before the built-in ones")
+    return parser.parse_args(argv)
+
+async def serve(args: argparse.Namespace) -> None:
+    server = StandinServer(StandinConfig(args))
+    listener = await asyncio.start_server(server.handle, args.host, args.port, backlog=1024)
+    print(f"OpenAI stand-in on http://{args.host}:{args.port}/v1 "
+          f"(set OPENAI_BASE_URL to this and OPENAI_API_KEY to any value)")
+    async with listener:
+        await listener.serve_forever()
+
+def main() -> None:
+    try:
+        asyncio.run(serve(parse_args()))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
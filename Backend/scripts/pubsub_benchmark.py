@@ -0,0 +1,124 @@
+"""
+Pub/Sub Backplane Benchmark
+Simulated workers subscribe users on a broker; reports per-user delivery latency and broadcast fan-out throughput
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pubsub import BROADCAST, BrokerBackplane, InProcessBackplane, PubSubBroker  # noqa: E402
+
+
+class Worker:
+    """Stands in for one uvicorn worker: records when each frame arrives instead of writing it to sockets"""
+
+    def __init__(self, backplane, users: int):
+        self.backplane = backplane
+        self.users = users
+        self.latencies: list[float] = []
+        self.frames = 0
+
+    def deliver(self, user_id: str, frame: str) -> int:
+        self.frames += 1
+        self.latencies.append(time.perf_counter() - json.loads(frame)["sent"])
+        return 1 if user_id != BROADCAST else self.users
+
+def report(name: str, latencies: list[float], frames: int, elapsed: float) -> None:
+    cuts = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+    print(f"{name:>10} {frames:>8} {frames / elapsed:>10.0f} {statistics.median(latencies) * 1000:>8.3f} "
+          f"{cuts[94] * 1000:>8.3f} {cuts[98] * 1000:>8.3f} {max(latencies) * 1000:>8.3f}")
+
+async def drain(workers: list[Worker], expected: int, timeout: float) -> None:
+    deadline = time.monotonic() + timeout
+    while sum(worker.frames for worker in workers) < expected and time.monotonic() < deadline:
+        await asyncio.sleep(0.005)
+
+async def run(args: argparse.Namespace) -> None:
+    broker = None
+    if args.in_process:
+        backplane = InProcessBackplane()
+        workers = [Worker(backplane, args.users)]
+        publisher = backplane
+        await backplane.start(workers[0].deliver)
+    else:
+        if args.broker:
+            host, port = args.broker.rsplit(":", 1)
+            port = int(port)
+        else:
+            broker = PubSubBroker()
+            host, port = "127.0.0.1", await broker.start()
+        workers = [Worker(BrokerBackplane(host, port), args.users) for _ in range(args.workers)]
+        publisher = BrokerBackplane(host, port)
+        await publisher.start(lambda user_id, frame: 0)
+        for worker in workers:
+            await worker.backplane.start(worker.deliver)
+        await asyncio.gather(publisher.connected.wait(), *(worker.backplane.connected.wait() for worker in workers))
+
+    # Each user lives on exactly one worker, as with sticky WebSocket connections
+    users = [f"user-{w}-{u}" for w in range(len(workers)) for u in range(args.users)]
+    for w, worker in enumerate(workers):
+        for u in range(args.users):
+            worker.backplane.subscribe(f"user-{w}-{u}")
+    await asyncio.sleep(0.2)
+    payload = "x" * args.payload
+    rng = random.Random(0)
+
+    print(f"{'backplane' if args.in_process else f'broker, {len(workers)} workers'}, {len(users)} users, "
+          f"{args.payload}-byte frames")
+    print(f"{'phase':>10} {'frames':>8} {'frames/s':>10} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+
+    started = time.perf_counter()
+    for i in range(args.messages):
+        publisher.publish(rng.choice(users), json.dumps({"sent": time.perf_counter(), "payload": payload}))
+        if i % args.batch == args.batch - 1:
+            await asyncio.sleep(0)  # let the event loop flush, like a server interleaving requests
+    await drain(workers, args.messages, args.timeout)
+    report("per-user", [latency for worker in workers for latency in worker.latencies],
+           sum(worker.frames for worker in workers), time.perf_counter() - started)
+
+    for worker in workers:
+        worker.latencies.clear()
+        worker.frames = 0
+    started = time.perf_counter()
+    for _ in range(args.broadcasts):
+        publisher.publish(BROADCAST, json.dumps({"sent": time.perf_counter(), "payload": payload}))
+        await asyncio.sleep(0)
+    await drain(workers, args.broadcasts * len(workers), args.timeout)
+    elapsed = time.perf_counter() - started
+    report("broadcast", [latency for worker in workers for latency in worker.latencies],
+           sum(worker.frames for worker in workers), elapsed)
+    print(f"{'':>10} broadcast fan-out: {args.broadcasts * len(users) / elapsed:,.0f} socket deliveries/s")
+
+    dropped = publisher.dropped + sum(worker.backplane.dropped for worker in workers)
+    if broker is not None:
+        dropped += broker.dropped
+    print(f"dropped frames: {dropped}")
+    for worker in workers:
+        await worker.backplane.close()
+    await publisher.close()
+    if broker is not None:
+        await broker.close()
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--users", type=int, default=1000, help="users per worker")
+    parser.add_argument("--messages", type=int, default=50000)
+    parser.add_argument("--broadcasts", type=int, default=200)
+    parser.add_argument("--payload", type=int, default=256, help="bytes of filler per frame")
+    parser.add_argument("--batch", type=int, default=100, help="publishes between event-loop yields")
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--broker", help="host:port of a running broker (default: start one in-process)")
+    parser.add_argument("--in-process", action="store_true", help="measure the single-worker backplane instead")
+    asyncio.run(run(parser.parse_args()))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+"""
+Pub/Sub Broker
+Standalone broker for multi-worker deployments; point every worker at it with PUBSUB_URL=tcp://host:port
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pubsub import PubSubBroker  # noqa: E402
+
+
+async def serve(args: argparse.Namespace) -> None:
+    broker = PubSubBroker()
+    port = await broker.start(args.host, args.port)
+    logging.info("Pub/sub broker listening on %s:%d", args.host, port)
+    while True:
+        await asyncio.sleep(args.stats_interval)
+        logging.info("Pub/sub broker: %s", broker.stats())
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=7400)
+    parser.add_argument("--stats-interval", type=float, default=60, help="seconds between stats log lines")
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    asyncio.run(serve(parser.parse_args()))
+
+if __name__ == "__main__":
+    main()
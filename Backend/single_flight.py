@@ -0,0 +1,102 @@
+"""
+Single-Flight Request Coalescing
+Concurrent callers asking for the same key share one in-flight computation instead of repeating it
+"""
+
+import asyncio
+import logging
+from collections.abc import Awaitable, Callable, Hashable
+from typing import Any
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+class SingleFlight:
+    """Per-key in-flight task table for one stage (LLM, embedding, parse).
+
+    The work runs in its own task, so a caller that disconnects does not cancel it for the others.
+    Every caller receives the same result object and must treat it as read-only.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._in_flight: dict[Hashable, asyncio.Future] = {}
+        self.calls = 0
+        self.executions = 0
+        self.coalesced = 0
+        self.failures = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Await fn() once per key; callers arriving while it runs get the same result or exception"""
+        self.calls += 1
+        future = self._in_flight.get(key)
+        if future is None:
+            self.executions += 1
+            future = asyncio.ensure_future(fn())
+            self._in_flight[key] = future
+            future.add_done_callback(lambda done: self._finish(key, done))
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(future)
+
+    async def do_many(self, keys: list[Hashable], fn: Callable[[list[Hashable]], Awaitable[list[Any]]]) -> list[Any]:
+        """Like do() per key: fn(new_keys) runs once for the keys nobody is computing yet, in that order"""
+        self.calls += len(keys)
+        loop = asyncio.get_running_loop()
+        new_keys = [key for key in dict.fromkeys(keys) if key not in self._in_flight]
+        if new_keys:
+            self.executions += 1
+            futures = {key: loop.create_future() for key in new_keys}
+            for key, future in futures.items():
+                self._in_flight[key] = future
+                future.add_done_callback(lambda done, key=key: self._finish(key, done))
+            task = asyncio.ensure_future(fn(new_keys))
+            task.add_done_callback(lambda done: _resolve_many(done, futures))
+        self.coalesced += len(keys) - len(new_keys)
+        pending = [self._in_flight[key] for key in keys]
+        return list(await asyncio.shield(asyncio.gather(*pending)))
+
+    def _finish(self, key: Hashable, future: asyncio.Future) -> None:
+        if self._in_flight.get(key) is future:
+            del self._in_flight[key]
+        if not future.cancelled() and future.exception() is not None:
+            self.failures += 1
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "executions": self.executions,
+            "coalesced": self.coalesced,
+            "failures": self.failures,
+            "in_flight": len(self._in_flight),
+        }
+
+def _resolve_many(task: asyncio.Future, futures: dict[Hashable, asyncio.Future]) -> None:
+    """Fan one batch result (or its exception) out to the per-key futures"""
+    if task.cancelled():
+        for future in futures.values():
+            future.cancel()
+        return
+    error = task.exception()
+    if error is None and len(task.result()) != len(futures):
+        error = RuntimeError(f"Expected {len(futures)} results, got {len(task.result())}")
+    for index, future in enumerate(futures.values()):
+        if future.done():
+            continue
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(task.result()[index])
+
+# Global instance per stage, created on first use
+_flights: dict[str, SingleFlight] = {}
+
+def single_flight(name: str) -> SingleFlight:
+    """Convenience function returning the shared coalescing group for a stage"""
+    if name not in _flights:
+        _flights[name] = SingleFlight(name)
+    return _flights[name]
+
+def single_flight_stats() -> dict[str, dict[str, Any]]:
+    """Convenience function: counters of every stage for the status endpoints"""
+    return {name: flight.stats() for name, flight in _flights.items()}
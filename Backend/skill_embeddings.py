@@ -0,0 +1,110 @@
+"""
+Skill Embedding Table
+Every taxonomy skill embedded once into a matrix indexed by skill id, for model-free semantic skill matching
+"""
+
+import asyncio
+import logging
+from datetime import datetime
+from typing import Any
+
+import numpy as np
+
+from embeddings import embed_texts
+from skill_graph import normalize_skill
+from taxonomy import TaxonomySnapshot, current_taxonomy
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+class SkillEmbeddingTable:
+    """L2-normalized skill vectors for one taxonomy version"""
+
+    def __init__(self, version: int, skills: list[str], matrix: np.ndarray):
+        self.version = version
+        self.skills = skills
+        self.matrix = matrix
+        self.skill_ids = {normalize_skill(skill): skill_id for skill_id, skill in enumerate(skills)}
+        self.built_at = datetime.now().isoformat()
+
+    @classmethod
+    async def build(cls, snapshot: TaxonomySnapshot) -> "SkillEmbeddingTable":
+        # Catalog skills from the skill graph share the table so job-side skills are always covered
+        skills = list({normalize_skill(skill): skill for skill in snapshot.vocabulary + snapshot.skill_graph.skills}.values())
+        vectors = await embed_texts(skills)
+        vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        return cls(snapshot.version, skills, vectors)
+
+    def ids(self, skills: list[str]) -> np.ndarray:
+        found = {self.skill_ids.get(normalize_skill(skill)) for skill in skills}
+        found.discard(None)
+        return np.fromiter(found, dtype=np.int64)
+
+    def similarity(self, resume_skills: list[str], job_skills: list[str]) -> dict[str, Any]:
+        """For each job skill take its best-matching resume skill, then average over the job skills.
+
+        Independent of skill order and counts near-synonyms (e.g. PyTorch vs TensorFlow) as partial matches.
+        """
+        resume_ids = self.ids(resume_skills)
+        job_ids = self.ids(job_skills)
+        if not len(resume_ids) or not len(job_ids):
+            return {"score": 0.0, "best_matches": {}}
+        similarities = self.matrix[job_ids] @ self.matrix[resume_ids].T
+        best = similarities.argmax(axis=1)
+        best_scores = similarities[np.arange(len(job_ids)), best]
+        return {
+            "score": float(np.clip(best_scores, 0, 1).mean()),
+            "best_matches": {
+                self.skills[job_id]: {"skill": self.skills[resume_ids[match]], "similarity": round(float(score), 4)}
+                for job_id, match, score in zip(job_ids.tolist(), best.tolist(), best_scores.tolist(), strict=True)
+            },
+        }
+
+def _log_build_failure(task: asyncio.Task) -> None:
+    if not task.cancelled() and task.exception() is not None:
+        logger.error("Error building skill embedding table: %s", task.exception())
+
+class SkillEmbeddingStore:
+    """Keeps the table in step with the taxonomy; a stale table keeps serving while the new one builds"""
+
+    def __init__(self):
+        self.table: SkillEmbeddingTable | None = None
+        self._building: asyncio.Task | None = None
+
+    async def for_snapshot(self, snapshot: TaxonomySnapshot | None = None) -> SkillEmbeddingTable:
+        snapshot = snapshot or current_taxonomy()
+        table = self.table
+        if table is not None and table.version >= snapshot.version:
+            return table
+        if self._building is None or self._building.done():
+            self._building = asyncio.create_task(self._build(snapshot))
+            self._building.add_done_callback(_log_build_failure)
+        if table is None:
+            # Only the very first request waits for the table
+            return await asyncio.shield(self._building)
+        return table
+
+    async def _build(self, snapshot: TaxonomySnapshot) -> SkillEmbeddingTable:
+        table = await SkillEmbeddingTable.build(snapshot)
+        if self.table is None or table.version >= self.table.version:
+            self.table = table
+            logger.info("Skill embedding table built: %d skills for taxonomy version %d", len(table.skills), table.version)
+        return table
+
+    async def rebuild(self) -> SkillEmbeddingTable:
+        return await self._build(current_taxonomy())
+
+# Global instance
+skill_embeddings = SkillEmbeddingStore()
+
+async def skill_similarity(resume_skills: list[str], job_skills: list[str], snapshot: TaxonomySnapshot | None = None) -> dict[str, Any]:
+    """Convenience function: semantic skill match without a model call (once the table exists)"""
+    table = await skill_embeddings.for_snapshot(snapshot)
+    return table.similarity(resume_skills, job_skills)
+
+async def refresh_skill_embeddings() -> None:
+    """Convenience function for startup and the skills update job; failures are logged, not raised"""
+    try:
+        await skill_embeddings.rebuild()
+    except Exception as e:
+        logger.error("Error building skill embedding table: %s", e)
@@ -0,0 +1,258 @@
+"""
+Skill Co-occurrence Model
+Builds a sparse skill co-occurrence / PMI matrix from the job catalog and serves local skill recommendations
+"""
+
+import logging
+import math
+import os
+import re
+import time
+from collections import Counter, defaultdict
+from datetime import datetime
+from itertools import combinations
+from typing import Any
+
+import numpy as np
+
+from job_catalog import load_catalog_jobs
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+DATA_DIR = os.getenv("CAREERFORGE_DATA_DIR", "data")
+SKILL_GRAPH_PATH = os.getenv("SKILL_GRAPH_PATH", os.path.join(DATA_DIR, "skill_graph.npz"))
+
+# Words in job titles that say nothing about the role
+ROLE_STOPWORDS = {"a", "an", "and", "of", "the", "for", "in", "at", "to", "with", "i", "ii", "iii", "sr", "jr"}
+
+def normalize_skill(skill: str) -> str:
+    """Canonical lookup form of a skill name"""
+    return " ".join(skill.lower().split())
+
+def role_tokens(title: str) -> list[str]:
+    """Split a job title or target role into informative lowercase tokens"""
+    tokens = re.findall(r"[a-z0-9+#.]+", title.lower())
+    return [token for token in tokens if token not in ROLE_STOPWORDS and len(token) > 1]
+
+def _to_csr(rows: list[dict[int, float]]) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Pack a list of {column: weight} rows into CSR arrays"""
+    indptr = np.zeros(len(rows) + 1, dtype=np.int32)
+    indices = []
+    weights = []
+    for row_id, row in enumerate(rows):
+        columns = sorted(row)
+        indices.extend(columns)
+        weights.extend(row[column] for column in columns)
+        indptr[row_id + 1] = len(indices)
+    return indptr, np.asarray(indices, dtype=np.int32), np.asarray(weights, dtype=np.float32)
+
+class SkillGraph:
+    """Sparse skill co-occurrence (PPMI) and role-to-skill model"""
+
+    def __init__(
+        self,
+        skills: list[str],
+        skill_counts: np.ndarray,
+        pmi_indptr: np.ndarray,
+        pmi_indices: np.ndarray,
+        pmi_weights: np.ndarray,
+        roles: list[str],
+        role_indptr: np.ndarray,
+        role_indices: np.ndarray,
+        role_weights: np.ndarray,
+        num_jobs: int,
+        built_at: str,
+    ):
+        self.skills = skills
+        self.skill_counts = skill_counts
+        self.pmi_indptr = pmi_indptr
+        self.pmi_indices = pmi_indices
+        self.pmi_weights = pmi_weights
+        self.roles = roles
+        self.role_indptr = role_indptr
+        self.role_indices = role_indices
+        self.role_weights = role_weights
+        self.num_jobs = num_jobs
+        self.built_at = built_at
+        self.skill_index = {normalize_skill(skill): i for i, skill in enumerate(skills)}
+        self.role_index = {role: i for i, role in enumerate(roles)}
+
+    @classmethod
+    def build(cls, jobs: list[dict[str, Any]]) -> "SkillGraph":
+        """Build the model from catalog jobs (each with 'title' and 'skills')"""
+        skill_index: dict[str, int] = {}
+        skills: list[str] = []
+        job_skill_ids: list[list[int]] = []
+        for job in jobs:
+            ids = set()
+            for skill in job.get("skills", []):
+                key = normalize_skill(skill)
+                if not key:
+                    continue
+                if key not in skill_index:
+                    skill_index[key] = len(skills)
+                    skills.append(skill.strip())
+                ids.add(skill_index[key])
+            job_skill_ids.append(sorted(ids))
+
+        num_jobs = max(1, len(jobs))
+        counts = np.zeros(len(skills), dtype=np.float32)
+        pair_counts: Counter = Counter()
+        role_skill_counts: dict[str, Counter] = defaultdict(Counter)
+        for job, ids in zip(jobs, job_skill_ids, strict=True):
+            counts[ids] += 1
+            pair_counts.update(combinations(ids, 2))
+            for token in set(role_tokens(job.get("title", ""))):
+                role_skill_counts[token].update(ids)
+
+        # Positive pointwise mutual information, stored symmetrically
+        pmi_rows: list[dict[int, float]] = [{} for _ in skills]
+        for (i, j), count in pair_counts.items():
+            pmi = math.log(count * num_jobs / (counts[i] * counts[j]))
+            if pmi > 0:
+                pmi_rows[i][j] = pmi
+                pmi_rows[j][i] = pmi
+
+        # P(skill | role token)
+        roles = sorted(role_skill_counts)
+        role_rows: list[dict[int, float]] = []
+        for role in roles:
+            role_counts = role_skill_counts[role]
+            total = sum(role_counts.values())
+            role_rows.append({skill_id: count / total for skill_id, count in role_counts.items()})
+
+        pmi_indptr, pmi_indices, pmi_weights = _to_csr(pmi_rows)
+        role_indptr, role_indices, role_weights = _to_csr(role_rows)
+        return cls(
+            skills, counts, pmi_indptr, pmi_indices, pmi_weights,
+            roles, role_indptr, role_indices, role_weights,
+            len(jobs), datetime.now().isoformat()
+        )
+
+    def save(self, path: str = SKILL_GRAPH_PATH) -> None:
+        """Persist the model as a compressed npz archive"""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = f"{path}.tmp.npz"
+        np.savez_compressed(
+            tmp_path,
+            skills=np.asarray(self.skills, dtype=str),
+            skill_counts=self.skill_counts,
+            pmi_indptr=self.pmi_indptr,
+            pmi_indices=self.pmi_indices,
+            pmi_weights=self.pmi_weights,
+            roles=np.asarray(self.roles, dtype=str),
+            role_indptr=self.role_indptr,
+            role_indices=self.role_indices,
+            role_weights=self.role_weights,
+            num_jobs=np.asarray(self.num_jobs, dtype=np.int64),
+            built_at=np.asarray(self.built_at, dtype=str),
+        )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str = SKILL_GRAPH_PATH) -> "SkillGraph":
+        """Load a model written by save(); plain arrays only, so nothing in the file is unpickled"""
+        with np.load(path) as data:
+            return cls(
+                data["skills"].tolist(), data["skill_counts"],
+                data["pmi_indptr"], data["pmi_indices"], data["pmi_weights"],
+                data["roles"].tolist(), data["role_indptr"], data["role_indices"], data["role_weights"],
+                int(data["num_jobs"]), str(data["built_at"])
+            )
+
+    def related_skills(self, skill: str, top_n: int = 5) -> list[str]:
+        """Skills that co-occur with the given skill more often than chance"""
+        skill_id = self.skill_index.get(normalize_skill(skill))
+        if skill_id is None:
+            return []
+        start, end = self.pmi_indptr[skill_id], self.pmi_indptr[skill_id + 1]
+        order = np.argsort(-self.pmi_weights[start:end])[:top_n]
+        return [self.skills[i] for i in self.pmi_indices[start:end][order]]
+
+    def recommend(self, current_skills: list[str], target_role: str, top_n: int = 10) -> dict[str, Any]:
+        """Recommend skills to learn for a target role given the skills a candidate already has"""
+        started = time.perf_counter()
+        known_ids = {self.skill_index[key] for key in map(normalize_skill, current_skills) if key in self.skill_index}
+
+        # Role evidence: average P(skill | token) over the recognised role tokens
+        role_scores = np.zeros(len(self.skills), dtype=np.float32)
+        matched_roles = 0
+        for token in role_tokens(target_role):
+            role_id = self.role_index.get(token)
+            if role_id is None:
+                continue
+            start, end = self.role_indptr[role_id], self.role_indptr[role_id + 1]
+            role_scores[self.role_indices[start:end]] += self.role_weights[start:end]
+            matched_roles += 1
+        if matched_roles:
+            role_scores /= matched_roles
+
+        # Neighbourhood evidence: summed PPMI from the skills the candidate already has
+        pmi_scores = np.zeros(len(self.skills), dtype=np.float32)
+        for skill_id in known_ids:
+            start, end = self.pmi_indptr[skill_id], self.pmi_indptr[skill_id + 1]
+            pmi_scores[self.pmi_indices[start:end]] += self.pmi_weights[start:end]
+        if pmi_scores.any():
+            pmi_scores /= pmi_scores.max()
+
+        scores = role_scores * 2 + pmi_scores if matched_roles else pmi_scores
+        if known_ids:
+            scores[list(known_ids)] = 0
+        candidates = np.flatnonzero(scores > 0)
+        if len(candidates) > top_n:
+            candidates = candidates[np.argpartition(-scores[candidates], top_n - 1)[:top_n]]
+        ranked = candidates[np.argsort(-scores[candidates])]
+
+        top_score = float(scores[ranked[0]]) if len(ranked) else 0.0
+        skill_priority = {}
+        for skill_id in ranked:
+            ratio = float(scores[skill_id]) / top_score
+            skill_priority[self.skills[skill_id]] = "High" if ratio >= 0.66 else "Medium" if ratio >= 0.33 else "Low"
+
+        if matched_roles:
+            missing_skills = [self.skills[i] for i in ranked if role_scores[i] > 0]
+            related = [self.skills[i] for i in ranked if role_scores[i] == 0]
+        else:
+            missing_skills = [self.skills[i] for i in ranked]
+            related = []
+        return {
+            "missing_skills": missing_skills,
+            "related_skills": related,
+            "skill_priority": skill_priority,
+            "source": "skill_graph",
+            "model_built_at": self.built_at,
+            "latency_ms": round((time.perf_counter() - started) * 1000, 3),
+        }
+
+_skill_graph: SkillGraph | None = None
+
+def build_skill_graph(path: str = SKILL_GRAPH_PATH) -> SkillGraph:
+    """Offline job: rebuild the model from the job catalog and write it to disk"""
+    jobs = load_catalog_jobs()
+    graph = SkillGraph.build(jobs)
+    graph.save(path)
+    logger.info(
+        "Built skill graph from %d jobs: %d skills, %d PMI edges, %d role tokens",
+        len(jobs), len(graph.skills), len(graph.pmi_indices), len(graph.roles)
+    )
+    return graph
+
+def get_skill_graph() -> SkillGraph:
+    """Return the loaded model, reading it from disk (or building it in memory) on first use"""
+    global _skill_graph
+    if _skill_graph is None:
+        if os.path.exists(SKILL_GRAPH_PATH):
+            try:
+                _skill_graph = SkillGraph.load(SKILL_GRAPH_PATH)
+            except Exception as e:
+                logger.error("Error loading skill graph %s: %s", SKILL_GRAPH_PATH, e)
+        if _skill_graph is None:
+            _skill_graph = SkillGraph.build(load_catalog_jobs())
+    return _skill_graph
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    print("Building skill co-occurrence model...")
+    build_skill_graph()
+    print(f"Skill graph written to {SKILL_GRAPH_PATH}")
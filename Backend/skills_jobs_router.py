@@ -4,66 +4,36 @@ Handles skills database, job matching, market analysis, and real-time recommenda
 """
 
 import asyncio
-import json
 import logging
-import os
 from datetime import datetime
 from typing import Any
 
-import openai
 from dotenv import load_dotenv
 from fastapi import APIRouter, BackgroundTasks, HTTPException
 from pydantic import BaseModel, Field
 
+import llm_gateway
+from job_index import refresh_job_index
+from llm_cache import canonical_list
+from market_intel import get_market_intel, refresh_market_intel
+from prompt_builder import job_description_context, prompt_messages
+from skill_embeddings import refresh_skill_embeddings
+from taxonomy import current_taxonomy, rebuild_taxonomy
+
 # Load environment variables
 load_dotenv()
 
-# Configure OpenAI
-openai.api_key = os.getenv("OPENAI_API_KEY")
-
 # Setup logging
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/skills-jobs", tags=["skills-jobs"])
 
-# SKILLS DATABASE
-
-SKILLS_DATABASE = {
-    "programming_languages": [
-        "Python", "Java", "JavaScript", "TypeScript", "C++", "C#", "Go", "Rust",
-        "PHP", "Ruby", "Swift", "Kotlin", "Scala", "R", "MATLAB", "Perl"
-    ],
-    "frameworks": [
-        "React", "Angular", "Vue.js", "Node.js", "Express", "Django", "Flask",
-        "Spring", "Laravel", "Ruby on Rails", "ASP.NET", "FastAPI", "Gin"
-    ],
-    "databases": [
-        "MySQL", "PostgreSQL", "MongoDB", "Redis", "Cassandra", "Oracle",
-        "SQL Server", "SQLite", "Neo4j", "Elasticsearch", "DynamoDB"
-    ],
-    "cloud_platforms": [
-        "AWS", "Azure", "Google Cloud", "IBM Cloud", "Oracle Cloud",
-        "DigitalOcean", "Heroku", "Vercel", "Netlify"
-    ],
-    "devops_tools": [
-        "Docker", "Kubernetes", "Jenkins", "GitLab CI", "GitHub Actions",
-        "Terraform", "Ansible", "Chef", "Puppet", "Prometheus", "Grafana"
-    ],
-    "ai_ml": [
-        "TensorFlow", "PyTorch", "Scikit-learn", "Keras", "OpenCV",
-        "NLTK", "spaCy", "Hugging Face", "Pandas", "NumPy", "Matplotlib"
-    ],
-    "soft_skills": [
-        "Leadership", "Communication", "Problem Solving", "Teamwork",
-        "Time Management", "Adaptability", "Creativity", "Critical Thinking"
-    ]
-}
-
 # PYDANTIC MODELS
 
 class SkillRequest(BaseModel):
     skill_name: str = Field(..., description="Name of the skill")
     category: str | None = Field(None, description="Skill category")
+    location: str | None = Field("global", description="Geographic location")
     proficiency_level: str | None = Field("beginner", description="Proficiency level")
 
 class JobMatchRequest(BaseModel):
@@ -80,13 +50,34 @@ class SkillRecommendationRequest(BaseModel):
     current_skills: list[str] = Field(..., description="Current skills")
     target_role: str = Field(..., description="Target job role")
     experience_level: str = Field("mid", description="Experience level")
+    enrich_with_ai: bool = Field(False, description="Enrich local recommendations with an AI analysis")
 
 # SKILLS ANALYSIS FUNCTIONS
 
+def fallback_skill_demand() -> dict[str, Any]:
+    return {
+        "demand_level": "Medium",
+        "salary_range": "$60k-$120k",
+        "job_opportunities": "Good",
+        "growth_trend": "Positive",
+        "related_skills": []
+    }
+
 async def analyze_skill_market_demand(skill: str, location: str = "global") -> dict[str, Any]:
-    """Analyze market demand for a specific skill"""
+    """Market demand for a skill: the precomputed table for known skills, the LLM (or a default) otherwise"""
     try:
-        if openai.api_key:
+        table = get_market_intel()
+        record = table.record(skill, location) if table else None
+        if record is not None:
+            return {
+                "skill": skill,
+                "location": location,
+                "analysis": record,
+                **table.freshness(),
+                "timestamp": datetime.now().isoformat()
+            }
+        
+        if llm_gateway.is_enabled():
             prompt = f"""
             Analyze market demand for the skill: {skill}
             Location: {location}
@@ -101,28 +92,20 @@ async def analyze_skill_market_demand(skill: str, location: str = "global") -> d
             Format as JSON.
             """
             
-            response = await openai.ChatCompletion.acreate(
-                model="gpt-3.5-turbo",
-                messages=[{"role": "user", "content": prompt}],
-                max_tokens=300,
-                temperature=0.3
+            analysis, degraded = await llm_gateway.with_fallback(
+                lambda: llm_gateway.cached_chat_json(
+                    prompt_messages("skill_market_demand", prompt), max_tokens=300, temperature=0.3
+                ),
+                fallback_skill_demand
             )
-            
-            analysis = json.loads(response.choices[0].message.content)
         else:
-            # Fallback analysis
-            analysis = {
-                "demand_level": "Medium",
-                "salary_range": "$60k-$120k",
-                "job_opportunities": "Good",
-                "growth_trend": "Positive",
-                "related_skills": []
-            }
+            analysis, degraded = fallback_skill_demand(), False
         
         return {
             "skill": skill,
             "location": location,
             "analysis": analysis,
+            "degraded": degraded,
             "timestamp": datetime.now().isoformat()
         }
         
@@ -130,15 +113,25 @@ async def analyze_skill_market_demand(skill: str, location: str = "global") -> d
         logger.error("Error analyzing skill demand: %s", e)
         raise HTTPException(status_code=500, detail=f"Skill analysis failed: {str(e)}")
 
-async def get_skill_recommendations(current_skills: list[str], target_role: str) -> dict[str, Any]:
-    """Get skill recommendations based on current skills and target role"""
+async def get_skill_recommendations(current_skills: list[str], target_role: str, enrich: bool = False) -> dict[str, Any]:
+    """Get skill recommendations from the local skill model, optionally enriched by AI"""
     try:
-        if openai.api_key:
+        recommendations = {
+            "priority": "Medium",
+            "learning_path": "Online courses",
+            "time_to_acquire": "3-6 months",
+            "resources": ["Coursera", "Udemy", "YouTube"],
+            **current_taxonomy().skill_graph.recommend(current_skills, target_role)
+        }
+        
+        degraded = False
+        if enrich and llm_gateway.is_enabled():
             prompt = f"""
             Recommend skills for career advancement:
             
-            Current Skills: {', '.join(current_skills)}
+            Current Skills: {', '.join(canonical_list(current_skills))}
             Target Role: {target_role}
+            Suggested Skills: {', '.join(recommendations["missing_skills"])}
             
             Provide:
             1. Missing skills for target role
@@ -150,28 +143,20 @@ async def get_skill_recommendations(current_skills: list[str], target_role: str)
             Format as JSON.
             """
             
-            response = await openai.ChatCompletion.acreate(
-                model="gpt-3.5-turbo",
-                messages=[{"role": "user", "content": prompt}],
-                max_tokens=400,
-                temperature=0.4
+            enrichment, degraded = await llm_gateway.with_fallback(
+                lambda: llm_gateway.cached_chat_json(
+                    prompt_messages("skill_recommendations", prompt), max_tokens=400, temperature=0.4
+                ),
+                lambda: None
             )
-            
-            recommendations = json.loads(response.choices[0].message.content)
-        else:
-            # Fallback recommendations
-            recommendations = {
-                "missing_skills": [],
-                "priority": "Medium",
-                "learning_path": "Online courses",
-                "time_to_acquire": "3-6 months",
-                "resources": ["Coursera", "Udemy", "YouTube"]
-            }
+            if enrichment is not None:
+                recommendations["ai_enrichment"] = enrichment
         
         return {
             "current_skills": current_skills,
             "target_role": target_role,
             "recommendations": recommendations,
+            "degraded": degraded,
             "timestamp": datetime.now().isoformat()
         }
         
@@ -194,12 +179,21 @@ async def match_job_realtime(resume_skills: list[str], job_description: str) ->
         
         match_score = len(matched_skills) / max(1, len(job_skills)) * 100
         
+        def fallback_analysis() -> dict[str, Any]:
+            return {
+                "match_percentage": match_score,
+                "strengths": matched_skills,
+                "improvements": missing_skills,
+                "interview_tips": ["Highlight relevant experience"],
+                "salary_insights": "Research market rates"
+            }
+        
         # AI-enhanced analysis
-        if openai.api_key:
+        if llm_gateway.is_enabled():
             prompt = f"""
             Analyze job-candidate match:
             
-            Job Description: {job_description}
+            Job Description: {job_description_context(job_description)}
             Candidate Skills: {', '.join(resume_skills)}
             Required Skills: {', '.join(job_skills)}
             
@@ -213,22 +207,12 @@ async def match_job_realtime(resume_skills: list[str], job_description: str) ->
             Format as JSON.
             """
             
-            response = await openai.ChatCompletion.acreate(
-                model="gpt-3.5-turbo",
-                messages=[{"role": "user", "content": prompt}],
-                max_tokens=500,
-                temperature=0.3
+            ai_analysis, degraded = await llm_gateway.with_fallback(
+                lambda: llm_gateway.chat_json(prompt_messages("job_match", prompt), max_tokens=500, temperature=0.3),
+                fallback_analysis
             )
-            
-            ai_analysis = json.loads(response.choices[0].message.content)
         else:
-            ai_analysis = {
-                "match_percentage": match_score,
-                "strengths": matched_skills,
-                "improvements": missing_skills,
-                "interview_tips": ["Highlight relevant experience"],
-                "salary_insights": "Research market rates"
-            }
+            ai_analysis, degraded = fallback_analysis(), False
         
         return {
             "match_score": match_score,
@@ -236,6 +220,7 @@ async def match_job_realtime(resume_skills: list[str], job_description: str) ->
             "missing_skills": missing_skills,
             "extra_skills": extra_skills,
             "ai_analysis": ai_analysis,
+            "degraded": degraded,
             "timestamp": datetime.now().isoformat()
         }
         
@@ -245,9 +230,7 @@ async def match_job_realtime(resume_skills: list[str], job_description: str) ->
 
 def extract_skills_from_job_description(job_description: str) -> list[str]:
     """Extract skills from job description using pattern matching"""
-    all_skills = []
-    for _, skills in SKILLS_DATABASE.items():
-        all_skills.extend(skills)
+    all_skills = current_taxonomy().all_skills
     
     found_skills = []
     job_desc_lower = job_description.lower()
@@ -260,12 +243,32 @@ def extract_skills_from_job_description(job_description: str) -> list[str]:
 
 # MARKET ANALYSIS FUNCTIONS
 
+def fallback_market_trends() -> dict[str, Any]:
+    return {
+        "demand_trends": "Stable",
+        "salary_trends": "Increasing",
+        "opportunities": "Good",
+        "risks": "Low",
+        "outlook": "Positive"
+    }
+
 async def analyze_market_trends(skills: list[str], location: str = "global") -> dict[str, Any]:
-    """Analyze market trends for multiple skills"""
+    """Market trends for several skills: from the precomputed table when it knows any of them, else the LLM"""
     try:
-        if openai.api_key:
+        table = get_market_intel()
+        trends = table.trends(skills, location) if table else None
+        if trends is not None:
+            return {
+                "skills": skills,
+                "location": location,
+                "trends": trends,
+                **table.freshness(),
+                "timestamp": datetime.now().isoformat()
+            }
+        
+        if llm_gateway.is_enabled():
             prompt = f"""
-            Analyze market trends for skills: {', '.join(skills)}
+            Analyze market trends for skills: {', '.join(canonical_list(skills))}
             Location: {location}
             
             Provide:
@@ -278,27 +281,20 @@ async def analyze_market_trends(skills: list[str], location: str = "global") ->
             Format as JSON.
             """
             
-            response = await openai.ChatCompletion.acreate(
-                model="gpt-3.5-turbo",
-                messages=[{"role": "user", "content": prompt}],
-                max_tokens=400,
-                temperature=0.3
+            trends, degraded = await llm_gateway.with_fallback(
+                lambda: llm_gateway.cached_chat_json(
+                    prompt_messages("market_trends", prompt), max_tokens=400, temperature=0.3
+                ),
+                fallback_market_trends
             )
-            
-            trends = json.loads(response.choices[0].message.content)
         else:
-            trends = {
-                "demand_trends": "Stable",
-                "salary_trends": "Increasing",
-                "opportunities": "Good",
-                "risks": "Low",
-                "outlook": "Positive"
-            }
+            trends, degraded = fallback_market_trends(), False
         
         return {
             "skills": skills,
             "location": location,
             "trends": trends,
+            "degraded": degraded,
             "timestamp": datetime.now().isoformat()
         }
         
@@ -311,28 +307,31 @@ async def analyze_market_trends(skills: list[str], location: str = "global") ->
 @router.get("/skills")
 async def get_all_skills():
     """Get all available skills from database"""
+    taxonomy = current_taxonomy()
     return {
-        "skills_database": SKILLS_DATABASE,
-        "total_categories": len(SKILLS_DATABASE),
-        "total_skills": sum(len(skills) for skills in SKILLS_DATABASE.values())
+        "skills_database": taxonomy.categories,
+        "total_categories": len(taxonomy.categories),
+        "total_skills": len(taxonomy.all_skills),
+        "taxonomy_version": taxonomy.version
     }
 
 @router.get("/skills/{category}")
 async def get_skills_by_category(category: str):
     """Get skills by category"""
-    if category not in SKILLS_DATABASE:
+    categories = current_taxonomy().categories
+    if category not in categories:
         raise HTTPException(status_code=404, detail="Category not found")
     
     return {
         "category": category,
-        "skills": SKILLS_DATABASE[category],
-        "count": len(SKILLS_DATABASE[category])
+        "skills": categories[category],
+        "count": len(categories[category])
     }
 
 @router.post("/skill-analysis")
 async def analyze_skill(request: SkillRequest):
     """Analyze a specific skill"""
-    return await analyze_skill_market_demand(request.skill_name, request.category)
+    return await analyze_skill_market_demand(request.skill_name, request.location or "global")
 
 @router.post("/job-match")
 async def match_job(request: JobMatchRequest):
@@ -342,12 +341,12 @@ async def match_job(request: JobMatchRequest):
 @router.post("/market-analysis")
 async def analyze_market(request: MarketAnalysisRequest):
     """Analyze market trends for skills"""
-    return await analyze_market_trends(request.skills, request.location)
+    return await analyze_market_trends(request.skills, request.location or "global")
 
 @router.post("/skill-recommendations")
 async def get_recommendations(request: SkillRecommendationRequest):
     """Get skill recommendations for career advancement"""
-    return await get_skill_recommendations(request.current_skills, request.target_role)
+    return await get_skill_recommendations(request.current_skills, request.target_role, request.enrich_with_ai)
 
 @router.get("/popular-skills")
 async def get_popular_skills():
@@ -369,7 +368,7 @@ async def get_popular_skills():
 async def get_skill_categories():
     """Get all skill categories"""
     return {
-        "categories": list(SKILLS_DATABASE.keys()),
+        "categories": list(current_taxonomy().categories.keys()),
         "description": {
             "programming_languages": "Programming and scripting languages",
             "frameworks": "Web and application frameworks",
@@ -384,23 +383,34 @@ async def get_skill_categories():
 # BACKGROUND TASKS
 
 async def update_skills_database():
-    """Background task to update skills database"""
-    # This would typically fetch from external APIs
+    """Background task to rebuild the taxonomy, skill graph and market intel table and hot swap them in"""
     logger.info("Updating skills database...")
-    await asyncio.sleep(1)  # Simulate API call
-    logger.info("Skills database updated")
+    try:
+        # Rebuild off the event loop; requests keep using the old snapshot until the swap
+        snapshot = await asyncio.to_thread(rebuild_taxonomy)
+        logger.info("Skills database updated to taxonomy version %d", snapshot.version)
+        await refresh_job_index()
+        await refresh_skill_embeddings()
+        await refresh_market_intel(rebuild=True)
+    except Exception as e:
+        logger.error("Error updating skills database: %s", e)
 
 @router.post("/update-skills")
 async def trigger_skills_update(background_tasks: BackgroundTasks):
     """Trigger skills database update"""
     background_tasks.add_task(update_skills_database)
-    return {"message": "Skills database update triggered"}
+    return {
+        "message": "Skills database update triggered",
+        "current_version": current_taxonomy().version
+    }
 
 # HEALTH CHECK
 
 @router.get("/health")
 async def skills_jobs_health():
     """Health check for skills and jobs services"""
+    taxonomy = current_taxonomy()
+    market_intel = get_market_intel()
     return {
         "status": "healthy",
         "services": {
@@ -410,8 +420,11 @@ async def skills_jobs_health():
             "recommendations": "active"
         },
         "database": {
-            "categories": len(SKILLS_DATABASE),
-            "total_skills": sum(len(skills) for skills in SKILLS_DATABASE.values())
+            "categories": len(taxonomy.categories),
+            "total_skills": len(taxonomy.all_skills),
+            "taxonomy_version": taxonomy.version,
+            "taxonomy_built_at": taxonomy.built_at
         },
+        "market_intel": market_intel.stats() if market_intel else None,
         "timestamp": datetime.now().isoformat()
     } 
\ No newline at end of file
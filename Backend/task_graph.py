@@ -0,0 +1,80 @@
+"""
+Task Graph Runner
+Runs a request pipeline as a dependency graph: independent branches concurrently, each with its own deadline and fallback
+"""
+
+import asyncio
+import inspect
+import logging
+import time
+from collections.abc import Callable
+from typing import Any
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+class TaskNode:
+    """One branch: fn(*dependency results), bounded by `deadline` seconds, replaced by fallback(*dependency results) on failure"""
+
+    def __init__(self, name: str, fn: Callable[..., Any], after: tuple[str, ...],
+                 deadline: float | None, fallback: Callable[..., Any] | None):
+        self.name = name
+        self.fn = fn
+        self.after = after
+        self.deadline = deadline
+        self.fallback = fallback
+
+class TaskGraph:
+    """Nodes start as soon as the nodes they depend on have finished; latency is the longest path, not the sum"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.nodes: dict[str, TaskNode] = {}
+        self.report: dict[str, dict[str, Any]] = {}
+
+    def add(self, name: str, fn: Callable[..., Any], after: tuple[str, ...] = (),
+            deadline: float | None = None, fallback: Callable[..., Any] | None = None) -> None:
+        """Add a node; dependencies must already be in the graph, so it cannot contain cycles"""
+        unknown = [dependency for dependency in after if dependency not in self.nodes]
+        if unknown:
+            raise ValueError(f"{self.name}: node {name!r} depends on unknown nodes {unknown}")
+        self.nodes[name] = TaskNode(name, fn, tuple(after), deadline, fallback)
+
+    async def run(self) -> dict[str, Any]:
+        """Run every node and return {name: result}; a failing node without a fallback fails the whole graph"""
+        tasks: dict[str, asyncio.Task] = {}
+        for node in self.nodes.values():
+            tasks[node.name] = asyncio.ensure_future(self._run_node(node, [tasks[dependency] for dependency in node.after]))
+        try:
+            results = await asyncio.gather(*tasks.values())
+        except BaseException:
+            for task in tasks.values():
+                task.cancel()
+            raise
+        return dict(zip(tasks, results, strict=True))
+
+    @property
+    def degraded(self) -> bool:
+        """Whether any branch was answered by its fallback"""
+        return any(entry["status"] != "ok" for entry in self.report.values())
+
+    async def _run_node(self, node: TaskNode, dependencies: list[asyncio.Task]) -> Any:
+        args = [await dependency for dependency in dependencies]
+        started = time.monotonic()
+        try:
+            result = node.fn(*args)
+            if inspect.isawaitable(result):
+                result = await asyncio.wait_for(result, node.deadline)
+            status = "ok"
+        except Exception as e:
+            if node.fallback is None:
+                self._record(node.name, "error", started)
+                raise
+            status = "timeout" if isinstance(e, TimeoutError) else "fallback"
+            logger.warning("%s: branch %s failed (%s), using fallback", self.name, node.name, e or type(e).__name__)
+            result = node.fallback(*args)
+        self._record(node.name, status, started)
+        return result
+
+    def _record(self, name: str, status: str, started: float) -> None:
+        self.report[name] = {"status": status, "ms": round((time.monotonic() - started) * 1000, 1)}
@@ -0,0 +1,315 @@
+"""
+Skills Taxonomy
+Compiled, versioned skills taxonomy with an atomic (RCU-style) hot swap shared across workers
+"""
+
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any
+
+from skill_graph import DATA_DIR, SkillGraph, build_skill_graph, get_skill_graph
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process use only
+    fcntl = None
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+TAXONOMY_PATH = os.getenv("TAXONOMY_PATH", os.path.join(DATA_DIR, "taxonomy.json"))
+TAXONOMY_SOURCE_PATH = os.getenv("TAXONOMY_SOURCE_PATH", "taxonomy_sources.json")
+TAXONOMY_POLL_SECONDS = float(os.getenv("TAXONOMY_POLL_SECONDS", "5"))
+
+# Comprehensive skills database (base taxonomy, extended by TAXONOMY_SOURCE_PATH)
+SKILLS_DATABASE = {
+    "programming_languages": [
+        "Python", "Java", "JavaScript", "TypeScript", "C++", "C#", "Go", "Rust",
+        "PHP", "Ruby", "Swift", "Kotlin", "Scala", "R", "MATLAB", "Perl", "Dart"
+    ],
+    "frameworks": [
+        "React", "Angular", "Vue.js", "Node.js", "Express", "Django", "Flask",
+        "Spring", "Laravel", "Ruby on Rails", "ASP.NET", "FastAPI", "Gin",
+        "Next.js", "Nuxt.js", "Svelte", "Ember.js"
+    ],
+    "databases": [
+        "MySQL", "PostgreSQL", "MongoDB", "Redis", "Cassandra", "Oracle",
+        "SQL Server", "SQLite", "Neo4j", "Elasticsearch", "DynamoDB",
+        "MariaDB", "CouchDB", "InfluxDB", "TimescaleDB"
+    ],
+    "cloud_platforms": [
+        "AWS", "Azure", "Google Cloud", "IBM Cloud", "Oracle Cloud",
+        "DigitalOcean", "Heroku", "Vercel", "Netlify", "Firebase",
+        "Alibaba Cloud", "Tencent Cloud"
+    ],
+    "devops_tools": [
+        "Docker", "Kubernetes", "Jenkins", "GitLab CI", "GitHub Actions",
+        "Terraform", "Ansible", "Chef", "Puppet", "Prometheus", "Grafana",
+        "ELK Stack", "Splunk", "Datadog", "New Relic"
+    ],
+    "ai_ml": [
+        "TensorFlow", "PyTorch", "Scikit-learn", "Keras", "OpenCV",
+        "NLTK", "spaCy", "Hugging Face", "Pandas", "NumPy", "Matplotlib",
+        "Seaborn", "Plotly", "Jupyter", "MLflow", "Kubeflow"
+    ],
+    "soft_skills": [
+        "Leadership", "Communication", "Problem Solving", "Teamwork",
+        "Time Management", "Adaptability", "Creativity", "Critical Thinking",
+        "Project Management", "Agile", "Scrum", "Kanban"
+    ]
+}
+
+# Additional pattern matching for common skill mentions
+SKILL_PATTERNS = [
+    r'\b(python|java|javascript|react|angular|vue|node\.js)\b',
+    r'\b(sql|mysql|postgresql|mongodb|redis)\b',
+    r'\b(aws|azure|gcp|docker|kubernetes|jenkins)\b',
+    r'\b(machine learning|ai|nlp|computer vision|deep learning)\b',
+    r'\b(html|css|bootstrap|tailwind|sass|less)\b',
+    r'\b(git|github|gitlab|bitbucket|svn)\b',
+    r'\b(agile|scrum|kanban|waterfall)\b',
+    r'\b(linux|unix|windows|macos)\b',
+    r'\b(excel|power bi|tableau|looker)\b',
+    r'\b(photoshop|illustrator|figma|sketch)\b'
+]
+
+def _compile_patterns(patterns: list[str]) -> re.Pattern:
+    """Fold the per-family patterns into a single alternation scanned in one pass"""
+    alternatives = []
+    for pattern in patterns:
+        match = re.fullmatch(r"\\b\((.*)\)\\b", pattern)
+        alternatives.append(match.group(1) if match else pattern)
+    return re.compile(r"\b(" + "|".join(alternatives) + r")\b")
+
+class TaxonomySnapshot:
+    """Immutable compiled taxonomy; requests hold a reference for their whole lifetime"""
+
+    def __init__(self, version: int, categories: dict[str, list[str]], skill_graph: SkillGraph, built_at: str):
+        self.version = version
+        self.categories = categories
+        self.skill_graph = skill_graph
+        self.built_at = built_at
+        self.all_skills = [skill for skills in categories.values() for skill in skills]
+        self.variations = [
+            (skill, tuple(dict.fromkeys([
+                skill.lower(),
+                skill.lower().replace(" ", ""),
+                skill.lower().replace(" ", "-"),
+                skill.lower().replace(" ", "_")
+            ])))
+            for skill in self.all_skills
+        ]
+        self.pattern = _compile_patterns(SKILL_PATTERNS)
+
+    def extract_skills(self, text: str) -> list[str]:
+        """Extract skills from text using the compiled variation table and pattern automaton"""
+        if not text:
+            return []
+        text_lower = text.lower()
+        found_skills = [
+            skill for skill, variations in self.variations
+            if any(variation in text_lower for variation in variations)
+        ]
+        found_skills.extend(match.title() for match in self.pattern.findall(text_lower))
+        return list(set(found_skills))
+
+    @property
+    def vocabulary(self) -> list[str]:
+        """Every skill name extract_skills() can return: taxonomy skills plus title-cased pattern terms"""
+        terms = re.fullmatch(r"\\b\((.*)\)\\b", self.pattern.pattern).group(1).split("|")
+        names = self.all_skills + [term.replace("\\", "").title() for term in terms]
+        return list(dict.fromkeys(names))
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "version": self.version,
+            "built_at": self.built_at,
+            "categories": self.categories,
+            "total_categories": len(self.categories),
+            "total_skills": len(self.all_skills),
+            "graph_skills": len(self.skill_graph.skills),
+        }
+
+def load_taxonomy_sources(path: str = TAXONOMY_SOURCE_PATH) -> dict[str, list[str]]:
+    """Merge the base taxonomy with the optional {category: [skills]} source file"""
+    categories = {category: list(skills) for category, skills in SKILLS_DATABASE.items()}
+    if not os.path.exists(path):
+        return categories
+    try:
+        with open(path, encoding="utf-8") as f:
+            extra = json.load(f)
+    except Exception as e:
+        logger.error("Error reading taxonomy sources %s: %s", path, e)
+        return categories
+    for category, skills in extra.items():
+        existing = categories.setdefault(category, [])
+        known = {skill.lower() for skill in existing}
+        existing.extend(skill for skill in skills if skill.lower() not in known)
+    return categories
+
+def _graph_path(version: int) -> str:
+    return os.path.join(DATA_DIR, f"skill_graph.v{version}.npz")
+
+class TaxonomyStore:
+    """Holds the live snapshot reference and swaps it atomically when a new version is published"""
+
+    def __init__(self, path: str = TAXONOMY_PATH):
+        self.path = path
+        self._snapshot: TaxonomySnapshot | None = None
+        self._published_mtime: int | None = None
+        self._next_poll = 0.0
+        self._lock = threading.Lock()
+        self._reloading = False
+
+    def current(self) -> TaxonomySnapshot:
+        """Return the live snapshot, picking up versions published by other workers in the background"""
+        snapshot = self._snapshot
+        if snapshot is None:
+            with self._lock:
+                if self._snapshot is None:
+                    self._snapshot = self._load_published() or self._build_local()
+                snapshot = self._snapshot
+        now = time.monotonic()
+        if now >= self._next_poll:
+            self._next_poll = now + TAXONOMY_POLL_SECONDS
+            self._check_published()
+        return snapshot
+
+    def swap(self, snapshot: TaxonomySnapshot) -> None:
+        """Publish a snapshot to this worker; readers holding the old reference are unaffected"""
+        self._snapshot = snapshot
+        logger.info("Taxonomy swapped to version %d", snapshot.version)
+
+    def _build_local(self) -> TaxonomySnapshot:
+        return TaxonomySnapshot(0, load_taxonomy_sources(), get_skill_graph(), datetime.now().isoformat())
+
+    def _published_stat(self) -> int | None:
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except OSError:
+            return None
+
+    def _load_published(self) -> TaxonomySnapshot | None:
+        mtime = self._published_stat()
+        if mtime is None:
+            return None
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                published = json.load(f)
+            snapshot = TaxonomySnapshot(
+                published["version"],
+                published["categories"],
+                SkillGraph.load(published["skill_graph_path"]),
+                published["built_at"]
+            )
+        except Exception as e:
+            logger.error("Error loading published taxonomy %s: %s", self.path, e)
+            return None
+        self._published_mtime = mtime
+        return snapshot
+
+    def _check_published(self) -> None:
+        mtime = self._published_stat()
+        if mtime is None or mtime == self._published_mtime or self._reloading:
+            return
+        self._reloading = True
+
+        def reload():
+            try:
+                snapshot = self._load_published()
+                if snapshot and snapshot.version > self._snapshot.version:
+                    self.swap(snapshot)
+            finally:
+                self._reloading = False
+
+        threading.Thread(target=reload, name="taxonomy-reload", daemon=True).start()
+
+    def _published_version(self) -> int:
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                return int(json.load(f)["version"])
+        except (OSError, ValueError, KeyError, TypeError):
+            return 0
+
+    def rebuild(self) -> TaxonomySnapshot:
+        """Rebuild taxonomy and skill graph, publish them for all workers and swap locally"""
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        # Workers rebuilding at once serialise on the manifest lock and each takes the next version on disk,
+        # rather than all publishing current + 1 over one another
+        with self._lock, open(f"{self.path}.lock", "w") as lock_file:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            current = self._snapshot
+            version = max(current.version if current else 0, self._published_version()) + 1
+            graph_path = _graph_path(version)
+            graph = build_skill_graph(graph_path)
+            snapshot = TaxonomySnapshot(version, load_taxonomy_sources(), graph, datetime.now().isoformat())
+
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({
+                    "version": snapshot.version,
+                    "built_at": snapshot.built_at,
+                    "categories": snapshot.categories,
+                    "skill_graph_path": graph_path,
+                }, f)
+            os.replace(tmp_path, self.path)
+            self._published_mtime = self._published_stat()
+            self.swap(snapshot)
+
+            # Older graph files stay around for one version so slower workers can still load them
+            stale_path = _graph_path(version - 2)
+            if os.path.exists(stale_path):
+                os.remove(stale_path)
+            return snapshot
+
+class VersionedCache:
+    """Bounded LRU cache that empties itself when the taxonomy version changes"""
+
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = maxsize
+        self.version: int | None = None
+        self._data: OrderedDict = OrderedDict()
+
+    def get(self, key: Any, version: int) -> Any:
+        if version != self.version:
+            if self.version is None or version > self.version:
+                self._data.clear()
+                self.version = version
+            return None
+        value = self._data.get(key)
+        if value is not None:
+            self._data.move_to_end(key)
+        return value
+
+    def set(self, key: Any, value: Any, version: int) -> None:
+        if self.version is not None and version < self.version:
+            # Late write from a request still running on an old snapshot
+            return
+        if version != self.version:
+            self._data.clear()
+            self.version = version
+        self._data[key] = value
+        self._data.move_to_end(key)
+        if len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+# Global instance
+taxonomy_store = TaxonomyStore()
+
+def current_taxonomy() -> TaxonomySnapshot:
+    """Convenience function returning the live taxonomy snapshot"""
+    return taxonomy_store.current()
+
+def rebuild_taxonomy() -> TaxonomySnapshot:
+    """Convenience function for the skills update job"""
+    return taxonomy_store.rebuild()
@@ -0,0 +1,53 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from ann_index import IVFIndex
+
+
+def clustered_vectors(n=2000, dim=32, clusters=20, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim))
+    vectors = centers[rng.integers(clusters, size=n)] + 0.3 * rng.normal(size=(n, dim))
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors.astype(np.float32), [f"job:{i}" for i in range(n)]
+
+def test_full_probe_matches_exact_scan():
+    vectors, keys = clustered_vectors()
+    index = IVFIndex.train(vectors, keys, n_lists=16)
+    report = index.recall_at_k(vectors[:50], vectors, keys, k=10, nprobe=16)
+    assert report["recall_at_k"] == 1.0
+    assert index.recall_at_k(vectors[:50], vectors, keys, k=10, nprobe=4)["recall_at_k"] > 0.8
+
+def test_insert_and_delete_are_searchable_immediately():
+    vectors, keys = clustered_vectors()
+    index = IVFIndex.train(vectors, keys, n_lists=16)
+    index.remove(["job:0"])
+    assert "job:0" not in index.search(vectors[0], 5)[0]
+    index.add(["job:new"], vectors[:1])
+    assert index.search(vectors[0], 1)[0] == ["job:new"]
+    assert len(index) == len(keys)
+
+@pytest.mark.parametrize("storage", ["float32", "float16", "int8"])
+def test_save_compacts_and_load_memory_maps(tmp_path, storage):
+    vectors, keys = clustered_vectors()
+    index = IVFIndex.train(vectors, keys, n_lists=16)
+    index.storage = storage
+    index.remove(["job:1"])
+    index.add(["job:new"], vectors[1:2])
+    index.save(str(tmp_path))
+    loaded = IVFIndex.load(str(tmp_path))
+    assert isinstance(loaded.vectors.records, np.memmap)
+    assert loaded.storage == storage
+    assert loaded.stats()["tombstones"] == 0 and loaded.stats()["pending_inserts"] == 0
+    assert loaded.search(vectors[1], 1)[0] == ["job:new"]
+
+def test_concurrent_saves_publish_distinct_complete_generations(tmp_path):
+    vectors, keys = clustered_vectors(n=500)
+    index = IVFIndex.train(vectors, keys, n_lists=8)
+    with ThreadPoolExecutor(4) as pool:
+        list(pool.map(lambda _: index.save(str(tmp_path)), range(4)))
+    assert IVFIndex.load(str(tmp_path)).search(vectors[0], 1)[0] == ["job:0"]
+    assert sorted(os.listdir(tmp_path)) == ["current.json", "g3", "g4", "save.lock"]
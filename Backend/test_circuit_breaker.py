@@ -0,0 +1,37 @@
+import asyncio
+
+from circuit_breaker import CircuitBreaker
+
+
+def test_error_rate_opens_and_probe_closes():
+    probe_results = [RuntimeError("still down"), None]
+
+    async def probe():
+        result = probe_results.pop(0)
+        if result:
+            raise result
+
+    async def scenario():
+        breaker = CircuitBreaker("test", probe, min_calls=4, max_error_rate=0.5, probe_interval_seconds=0.01)
+        for ok in (True, False, True, False):
+            breaker.record(0.1, ok)
+        assert breaker.is_open and not breaker.allow()
+        await asyncio.sleep(0.1)
+        assert breaker.allow()
+        assert breaker.stats()["probes"] == 2 and breaker.stats()["short_circuits"] == 1
+
+    asyncio.run(scenario())
+
+def test_slow_p95_opens_only_after_min_calls():
+    async def probe():
+        raise RuntimeError("slow")
+
+    async def scenario():
+        breaker = CircuitBreaker("test", probe, min_calls=5, max_p95_seconds=1, probe_interval_seconds=10)
+        for _ in range(4):
+            breaker.record(2.0, True)
+        assert not breaker.is_open
+        breaker.record(2.0, True)
+        assert breaker.is_open and "p95" in breaker.reason
+
+    asyncio.run(scenario())
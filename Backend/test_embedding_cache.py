@@ -0,0 +1,36 @@
+import numpy as np
+
+import embedding_cache
+from embedding_cache import DiskEmbeddingStore, EmbeddingCache, text_digest
+
+
+def test_disk_store_appends_and_serves_after_reopen(tmp_path):
+    store = DiskEmbeddingStore(str(tmp_path))
+    first = [(text_digest(f"text {i}", "model"), np.full(4, i, dtype=np.float32)) for i in range(3)]
+    store.put_many(first)
+    store.put_many(first[:1] + [(text_digest("text 3", "model"), np.full(4, 3, dtype=np.float32))])
+    assert len(store.rows) == 4
+
+    reopened = DiskEmbeddingStore(str(tmp_path))
+    assert reopened.dim == 4
+    for i in range(4):
+        assert np.array_equal(reopened.get(text_digest(f"text {i}", "model")), np.full(4, i, dtype=np.float32))
+    assert reopened.get(text_digest("never stored", "model")) is None
+
+    # Rows appended by another worker are found on the next lookup
+    store.put_many([(text_digest("text 4", "model"), np.full(4, 4, dtype=np.float32))])
+    assert reopened.get(text_digest("text 4", "model"))[0] == 4
+
+def test_case_is_folded_only_for_uncased_models(tmp_path, monkeypatch):
+    monkeypatch.setattr(embedding_cache, "EMBEDDING_CACHE_DIR", str(tmp_path))
+    vector = np.ones((1, 4), dtype=np.float32)
+
+    uncased = EmbeddingCache("all-MiniLM-L6-v2@main/torch/default")
+    uncased.put_many(["Go  developer"], vector)
+    assert uncased.get("go developer") is not None
+
+    cased = EmbeddingCache("bert-base-cased@main/torch/default")
+    cased.put_many(["Go developer"], vector)
+    assert cased.get("Go  developer") is not None
+    assert cased.get("go developer") is None
+    assert cased.stats()["case_folded"] is False
@@ -0,0 +1,30 @@
+import asyncio
+
+import pytest
+
+from inference_batcher import MicroBatcher
+
+
+def test_concurrent_submits_share_a_batch():
+    sizes = []
+
+    def double(items):
+        sizes.append(len(items))
+        return [item * 2 for item in items]
+
+    async def scenario():
+        batcher = MicroBatcher(double, max_batch_size=8, max_wait_ms=20)
+        assert await batcher.submit_many([1, 2, 3]) == [2, 4, 6]
+        assert sizes == [3] and batcher.stats()["items"] == 3
+
+    asyncio.run(scenario())
+
+def test_wrong_output_count_fails_the_batch_instead_of_hanging():
+    async def scenario():
+        batcher = MicroBatcher(lambda items: items[:-1] if len(items) > 1 else items, max_batch_size=4, max_wait_ms=5)
+        with pytest.raises(ValueError, match="2 outputs for 3 inputs"):
+            await asyncio.wait_for(batcher.submit_many(["a", "b", "c"]), 1)
+        # The worker survives for the next batch
+        assert await asyncio.wait_for(batcher.submit("d"), 1) == "d"
+
+    asyncio.run(scenario())
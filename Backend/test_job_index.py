@@ -0,0 +1,60 @@
+import asyncio
+import json
+import os
+
+import numpy as np
+
+import job_index
+from job_index import JobEmbeddingIndex, job_text
+
+
+def job(job_id, title, skills):
+    return {"id": job_id, "title": title, "company": "Acme", "location": "Remote", "description": "", "skills": skills}
+
+def use_catalog(monkeypatch, jobs, embedded):
+    async def embed_texts(texts):
+        embedded.extend(texts)
+        return np.array([[len(text), 1.0, 0.0] for text in texts], dtype=np.float32)
+
+    monkeypatch.setattr(job_index, "load_catalog_jobs", lambda: list(jobs))
+    monkeypatch.setattr(job_index, "embed_texts", embed_texts)
+
+def test_refresh_reuses_unchanged_rows_and_drops_removed_jobs(tmp_path, monkeypatch):
+    path = str(tmp_path / "job_embeddings")
+    python, react, go = job("1", "Backend", ["Python"]), job("2", "Frontend", ["React"]), job("3", "Platform", ["Go"])
+    embedded = []
+    use_catalog(monkeypatch, [python, react], embedded)
+    index = JobEmbeddingIndex(path)
+    assert asyncio.run(index.refresh()) == {"jobs": 2, "embedded": 2, "removed": 0}
+    python_row = np.asarray(index.state.matrix[[0]])
+
+    edited = job("2", "Frontend", ["React", "TypeScript"])
+    embedded.clear()
+    use_catalog(monkeypatch, [python, edited, go], embedded)
+    assert asyncio.run(index.refresh()) == {"jobs": 3, "embedded": 2, "removed": 0}
+    assert embedded == [job_text(edited), job_text(go)]
+    assert np.array_equal(np.asarray(index.state.matrix[[0]]), python_row)
+
+    embedded.clear()
+    use_catalog(monkeypatch, [go], embedded)
+    assert asyncio.run(index.refresh()) == {"jobs": 1, "embedded": 0, "removed": 2}
+    assert [result["job_id"] for result in index.rank(np.array([1.0, 0.0, 0.0]), ["Go"])] == ["3"]
+
+    # A second worker loads the published generation as one unit and has nothing left to embed
+    other = JobEmbeddingIndex(path)
+    assert other.load() and other.generation == index.generation == 3
+    assert [job["id"] for job in other.state.jobs] == ["3"] and len(other.state.matrix) == 1
+    assert asyncio.run(other.refresh())["embedded"] == 0 and embedded == []
+    assert sorted(os.listdir(path)) == ["current.json", "g2", "g3"]
+
+def test_load_rejects_a_generation_whose_rows_do_not_match_its_jobs(tmp_path, monkeypatch):
+    path = str(tmp_path / "job_embeddings")
+    use_catalog(monkeypatch, [job("1", "Backend", ["Python"]), job("2", "Frontend", ["React"])], [])
+    asyncio.run(JobEmbeddingIndex(path).refresh())
+    meta_path = os.path.join(path, "g1", "meta.json")
+    with open(meta_path, encoding="utf-8") as f:
+        meta = json.load(f)
+    meta["jobs"].pop()
+    with open(meta_path, "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    assert not JobEmbeddingIndex(path).load()
@@ -0,0 +1,66 @@
+import random
+
+import pytest
+
+from live_session import LIVE_MAX_LINES, LiveSession, section_of
+from taxonomy import current_taxonomy
+
+RESUME = """Summary
+Backend engineer building Python services
+Skills:
+Docker, Kubernetes
+Work Experience
+Shipped a React dashboard"""
+
+JOB = "We need Python, Docker, AWS and React experience"
+
+def rescanned_matches(session):
+    snapshot = current_taxonomy()
+    resume_skills = {skill for line in session.lines for skill in snapshot.extract_skills(line)}
+    return sorted(skill for skill in snapshot.extract_skills(JOB) if skill in resume_skills)
+
+def test_edits_match_a_full_rescan():
+    session = LiveSession(RESUME, JOB)
+    assert [heading["section"] for heading in session.result()["sections"]] == ["summary", "skills", "experience"]
+    result = session.apply({"base_version": 1, "edits": [{"start": 3, "end": 4, "lines": ["Docker, AWS"]}]})
+    assert result["changes"]["lines_extracted"] == 1
+    assert result["changes"]["section"] == "skills"
+    assert "AWS" in result["changes"]["added_skills"] and "Kubernetes" in result["changes"]["removed_skills"]
+
+    rng = random.Random(7)
+    pool = ["Python and Go", "Education", "Used AWS daily", "", "Led a Scrum team", "React, Redux"]
+    for _ in range(200):
+        start = rng.randint(0, len(session.lines))
+        end = rng.randint(start, min(len(session.lines), start + 2))
+        session.apply({"edits": [{"start": start, "end": end, "lines": rng.sample(pool, rng.randint(0, 2))}]})
+        metrics = session.metrics()
+        assert sorted(metrics["matched_skills"]) == rescanned_matches(session)
+        assert metrics["match_score"] == len(metrics["matched_skills"]) / len(session.job_skills) * 100
+        assert session.headings == [(i, section_of(line)) for i, line in enumerate(session.lines) if section_of(line)]
+
+def test_full_text_update_rereads_only_the_changed_span():
+    session = LiveSession(RESUME, JOB)
+    result = session.apply({"text": RESUME.replace("React dashboard", "Vue.js dashboard")})
+    assert result["changes"]["lines_extracted"] == 1
+    assert result["line_count"] == len(RESUME.splitlines())
+    with pytest.raises(ValueError):
+        session.apply({"base_version": 1, "edits": []})
+
+def test_rejected_multi_edit_update_changes_nothing():
+    session = LiveSession(RESUME, JOB)
+    before = (list(session.lines), dict(session.skill_counts), session.version, session.metrics())
+    for edits in (
+        [{"start": 0, "end": 1, "lines": ["Go and Rust"]}, {"start": 40, "end": 41, "lines": []}],
+        [{"start": 0, "end": 0, "lines": ["Go"]}, {"start": 1}],
+        [{"start": 0, "end": 1, "lines": "not a list"}],
+    ):
+        with pytest.raises(ValueError):
+            session.apply({"edits": edits, "job_description": "Go developer"})
+    for update in (
+        {"text": "Go\n" * (LIVE_MAX_LINES + 1), "job_description": "Go developer"},
+        {"text": ["Go"], "job_description": "Go developer"},
+        {"text": "Go developer", "job_description": ["Go"]},
+    ):
+        with pytest.raises(ValueError):
+            session.apply(update)
+    assert (session.lines, dict(session.skill_counts), session.version, session.metrics()) == before
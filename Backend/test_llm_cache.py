@@ -0,0 +1,37 @@
+import time
+
+from llm_cache import LLMResponseCache, cache_key, canonical_list
+
+
+def test_key_ignores_skill_order_and_prompt_whitespace():
+    first = f"""
+        Analyze market trends for skills: {', '.join(canonical_list(["Python", "Docker", "AWS"]))}
+    """
+    second = f"Analyze market trends for skills: {', '.join(canonical_list(['AWS', 'Docker', 'Python', 'aws']))}"
+    params = {"max_tokens": 400, "temperature": 0.3}
+    assert cache_key("m", [{"role": "user", "content": first}], params) == \
+        cache_key("m", [{"role": "user", "content": second}], params)
+    assert cache_key("m", [{"role": "user", "content": first}], params) != \
+        cache_key("other", [{"role": "user", "content": first}], params)
+
+def test_entries_persist_expire_and_evict(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    cache = LLMResponseCache(path, max_entries=2, memory_entries=1)
+    cache.set("a", '{"x": 1}', ttl=60)
+    cache.set("short", "{}", ttl=0.01)
+    cache.close()
+
+    reopened = LLMResponseCache(path, max_entries=2, memory_entries=1)
+    assert reopened.get("a") == '{"x": 1}'
+    time.sleep(0.02)
+    assert reopened.get("short") is None
+
+    reopened.set("b", "{}", ttl=60)
+    reopened.set("c", "{}", ttl=60)
+    reopened.close()
+
+    # Eviction runs on an instance's first write (and periodically after): the least recently used go first
+    writer = LLMResponseCache(path, max_entries=2, memory_entries=1)
+    writer.set("d", "{}", ttl=60)
+    assert writer.stats()["entries"] == 2 and writer.stats()["evictions"] == 2
+    assert writer.get("a") is None and writer.get("d") == "{}"
@@ -0,0 +1,100 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+
+import llm_gateway
+from llm_gateway import LLMError, LLMGateway
+
+
+def completion(content: str) -> httpx.Response:
+    return httpx.Response(200, json={"choices": [{"message": {"content": content}}]})
+
+def make_gateway(handler, concurrency: int = 4) -> LLMGateway:
+    """Gateway whose pooled client answers through `handler` on the running loop"""
+    gateway = LLMGateway("https://llm.test/v1")
+    gateway._loop = asyncio.get_running_loop()
+    gateway._client = httpx.AsyncClient(base_url=gateway.base_url, transport=httpx.MockTransport(handler))
+    gateway._semaphore = asyncio.Semaphore(concurrency)
+    return gateway
+
+@pytest.fixture(autouse=True)
+def configured(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    monkeypatch.setattr(llm_gateway, "LLM_RETRY_BASE_SECONDS", 0.01)
+
+def test_retryable_status_backs_off_then_succeeds():
+    statuses = [503, 429]
+
+    def handler(request):
+        if statuses:
+            return httpx.Response(statuses.pop(0))
+        return completion(" hello ")
+
+    async def scenario():
+        gateway = make_gateway(handler)
+        assert await gateway.chat([{"role": "user", "content": "hi"}], timeout=5) == "hello"
+        assert gateway.retries == 2 and gateway.failures == 0
+
+    asyncio.run(scenario())
+
+def test_non_retryable_status_and_exhausted_retries_fail():
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(400 if len(calls) == 1 else 503, text="bad request")
+
+    async def scenario():
+        gateway = make_gateway(handler)
+        with pytest.raises(LLMError) as error:
+            await gateway.chat([{"role": "user", "content": "hi"}], timeout=5)
+        assert error.value.status_code == 400 and len(calls) == 1
+        with pytest.raises(LLMError) as error:
+            await gateway.chat([{"role": "user", "content": "hi"}], timeout=5)
+        assert error.value.status_code == 503
+        assert len(calls) == 2 + llm_gateway.LLM_MAX_RETRIES
+
+    asyncio.run(scenario())
+
+def test_deadline_covers_the_wait_for_a_concurrency_slot():
+    async def handler(request):
+        await asyncio.sleep(1)
+        return completion("slow")
+
+    async def scenario():
+        gateway = make_gateway(handler, concurrency=1)
+        holder = asyncio.create_task(gateway.chat([{"role": "user", "content": "first"}], timeout=5))
+        await asyncio.sleep(0.05)
+        started = time.monotonic()
+        with pytest.raises(LLMError) as error:
+            await gateway.chat([{"role": "user", "content": "second"}], timeout=0.2)
+        assert error.value.status_code == 504
+        assert time.monotonic() - started < 0.5
+        assert await holder == "slow"
+
+    asyncio.run(scenario())
+
+def test_malformed_completion_is_an_llm_error():
+    async def scenario():
+        gateway = make_gateway(lambda request: httpx.Response(200, json={"choices": []}))
+        with pytest.raises(LLMError) as error:
+            await gateway.chat([{"role": "user", "content": "hi"}], timeout=5)
+        assert error.value.status_code == 502 and gateway.failures == 1
+
+    asyncio.run(scenario())
+
+def test_call_abandoned_by_with_fallback_counts_against_the_breaker():
+    async def handler(request):
+        await asyncio.sleep(1)
+        return completion("late")
+
+    async def scenario():
+        gateway = make_gateway(handler)
+        result, degraded = await gateway.with_fallback(
+            lambda: gateway.chat([{"role": "user", "content": "hi"}], timeout=5), lambda: "heuristic", budget=0.05)
+        assert (result, degraded) == ("heuristic", True)
+        assert [ok for _, _, ok in gateway.breaker.samples] == [False]
+
+    asyncio.run(scenario())
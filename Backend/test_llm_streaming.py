@@ -0,0 +1,105 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+import llm_gateway
+from llm_gateway import LLMError, LLMGateway
+from llm_streaming import send_token_frames, sse_stream, stream_with_fallback
+
+MESSAGES = [{"role": "user", "content": "hi"}]
+
+def sse_body(*chunks: str) -> bytes:
+    return "".join(f"data: {chunk}\n\n" for chunk in chunks).encode()
+
+def delta(text: str) -> str:
+    return json.dumps({"choices": [{"delta": {"content": text}}]})
+
+def make_gateway(handler) -> LLMGateway:
+    gateway = LLMGateway("https://llm.test/v1")
+    gateway._loop = asyncio.get_running_loop()
+    gateway._client = httpx.AsyncClient(base_url=gateway.base_url, transport=httpx.MockTransport(handler))
+    gateway._semaphore = asyncio.Semaphore(4)
+    return gateway
+
+async def collect(tokens) -> list[str]:
+    return [token async for token in tokens]
+
+@pytest.fixture(autouse=True)
+def configured(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    monkeypatch.setattr(llm_gateway, "LLM_RETRY_BASE_SECONDS", 0.01)
+
+def test_stream_chat_yields_deltas_until_done():
+    body = sse_body(delta("Hel"), json.dumps({"choices": [{"delta": {}}]}), delta("lo"), "[DONE]", delta("ignored"))
+
+    async def scenario():
+        gateway = make_gateway(lambda request: httpx.Response(200, content=body))
+        assert await collect(gateway.stream_chat(MESSAGES, timeout=5)) == ["Hel", "lo"]
+        assert gateway.streams == 1 and gateway.failures == 0
+
+    asyncio.run(scenario())
+
+def test_malformed_chunk_is_an_llm_error():
+    async def scenario():
+        for body in (sse_body(delta("a"), "{not json"), sse_body('{"choices": "nope"}')):
+            gateway = make_gateway(lambda request, body=body: httpx.Response(200, content=body))
+            with pytest.raises(LLMError) as error:
+                await collect(gateway.stream_chat(MESSAGES, timeout=5))
+            assert error.value.status_code == 502
+
+    asyncio.run(scenario())
+
+def test_stream_with_fallback_only_falls_back_before_the_first_token(monkeypatch):
+    async def scenario():
+        monkeypatch.setattr(llm_gateway, "gateway", make_gateway(lambda request: httpx.Response(400)))
+        assert await collect(stream_with_fallback(MESSAGES, lambda: "heuristic")) == ["heuristic"]
+
+        body = sse_body(delta("partial"), "{broken")
+        monkeypatch.setattr(llm_gateway, "gateway", make_gateway(lambda request: httpx.Response(200, content=body)))
+        tokens = []
+        with pytest.raises(LLMError):
+            async for token in stream_with_fallback(MESSAGES, lambda: "heuristic"):
+                tokens.append(token)
+        assert tokens == ["partial"]
+
+        events = await collect(sse_stream(stream_with_fallback(MESSAGES, lambda: "heuristic")))
+        assert events[0].startswith("event: token") and events[-1].startswith("event: error")
+        assert json.loads(events[-1].split("data: ", 1)[1])["text"] == "partial"
+
+    asyncio.run(scenario())
+    monkeypatch.delenv("OPENAI_API_KEY")
+    assert asyncio.run(collect(stream_with_fallback(MESSAGES, lambda: "offline"))) == ["offline"]
+
+class FakeRequest:
+    type = "chat"
+
+    def __init__(self, accept: int):
+        self.accept = accept
+        self.frames = []
+
+    def send(self, frame_type, data):
+        if len(self.frames) >= self.accept:
+            return False
+        self.frames.append((frame_type, data))
+        return True
+
+def test_send_token_frames_stops_and_closes_upstream_when_the_socket_is_gone():
+    closed = []
+
+    async def tokens():
+        try:
+            for token in ("a", "b", "c", "d"):
+                yield token
+        finally:
+            closed.append(True)
+
+    async def scenario():
+        request = FakeRequest(accept=2)
+        assert await send_token_frames(request, tokens()) == "abc"
+        assert request.frames == [("token", {"request": "chat", "text": "a"}), ("token", {"request": "chat", "text": "b"})]
+        assert closed == [True]
+        assert await send_token_frames(FakeRequest(accept=10), tokens()) == "abcd"
+
+    asyncio.run(scenario())
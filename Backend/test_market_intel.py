@@ -0,0 +1,79 @@
+import os
+import time
+
+import numpy as np
+
+import market_intel
+from market_intel import MarketIntelStore, MarketIntelTable, parse_salary_range
+from taxonomy import current_taxonomy
+
+
+def job(skills, location, salary=""):
+    return {"title": "Engineer", "description": "", "skills": skills, "location": location, "salary_range": salary}
+
+def test_salary_parsing():
+    assert parse_salary_range("$80k-$120k") == (80000, 120000)
+    assert parse_salary_range("90-110K") == (90000, 110000)
+    assert parse_salary_range("80,000 - 120,000") == (80000, 120000)
+    assert parse_salary_range("Competitive") is None
+
+def test_records_by_location_with_trend_against_previous_build(tmp_path):
+    snapshot = current_taxonomy()
+    jobs = [job(["Python", "Docker"], "Berlin, Germany", "$80k-$120k")] * 6 + [job(["Java"], "Remote")] * 6
+    first = MarketIntelTable.build(jobs, snapshot)
+    first.save(str(tmp_path / "market_intel.npz"))
+    previous = MarketIntelTable.load(str(tmp_path / "market_intel.npz"))
+    table = MarketIntelTable.build(jobs + [job(["Java"], "Remote")] * 6, snapshot, previous)
+
+    python = table.record("python", "Berlin")
+    assert python["location"] == "berlin" and python["postings"] == 6
+    assert python["salary_range"] == "$80k-$120k" and python["salary_source"] == "location"
+    assert python["demand_level"] == "High"
+    assert table.record("Python", "Atlantis")["location"] == "global"
+    assert table.record("Java")["growth_trend"] == "Growing"
+    assert table.record("Python")["growth_trend"] == "Declining"
+    assert table.record("Not A Skill") is None
+    assert set(table.trends(["Python", "Java", "Not A Skill"])["skills"]) == {"Python", "Java"}
+
+def test_trend_baseline_survives_back_to_back_rebuilds(monkeypatch):
+    snapshot = current_taxonomy()
+    jobs = [job(["Java"], "Remote")] * 6 + [job(["Python"], "Remote")] * 6
+    first = MarketIntelTable.build(jobs, snapshot)
+    second = MarketIntelTable.build(jobs + [job(["Java"], "Remote")] * 6, snapshot, first)
+    third = MarketIntelTable.build(jobs + [job(["Java"], "Remote")] * 6, snapshot, second)
+    assert second.baseline_at == third.baseline_at == first.built_at
+    assert third.record("Java")["growth_pct"] == second.record("Java")["growth_pct"] > 0
+
+    monkeypatch.setattr(market_intel, "MARKET_TREND_WINDOW_DAYS", 0)
+    rolled = MarketIntelTable.build(jobs + [job(["Java"], "Remote")] * 6, snapshot, third)
+    assert rolled.baseline_at == third.built_at and rolled.record("Java")["growth_pct"] == 0
+
+def test_store_reloads_a_table_written_by_another_worker(tmp_path, monkeypatch):
+    monkeypatch.setattr(market_intel, "MARKET_INTEL_POLL_SECONDS", 0)
+    path = str(tmp_path / "market_intel.npz")
+    snapshot = current_taxonomy()
+    MarketIntelTable.build([job(["Java"], "Remote")] * 6, snapshot).save(path)
+    store = MarketIntelStore(path)
+    assert store.current().record("Java")["postings"] == 6
+
+    MarketIntelTable.build([job(["Java"], "Remote")] * 9, snapshot).save(path)
+    os.utime(path, ns=(time.time_ns(), time.time_ns() + 10**9))
+    for _ in range(200):
+        if store.current().record("Java")["postings"] == 9:
+            break
+        time.sleep(0.01)
+    assert store.current().record("Java")["postings"] == 9
+    assert not [name for name in os.listdir(tmp_path) if ".tmp" in name]
+
+def test_saved_table_loads_without_pickle(tmp_path):
+    path = str(tmp_path / "market_intel.npz")
+    snapshot = current_taxonomy()
+    first = MarketIntelTable.build([job(["Java"], "Remote")] * 6, snapshot)
+    table = MarketIntelTable.build([job(["Java"], "Remote")] * 9, snapshot, first)
+    table.save(path)
+    with np.load(path) as data:
+        assert all(data[name].dtype != object for name in data.files)
+    loaded = MarketIntelTable.load(path)
+    assert loaded.locations == table.locations and loaded.related == table.related
+    assert (loaded.built_at, loaded.taxonomy_version, loaded.baseline_at) == (table.built_at, snapshot.version, first.built_at)
+    assert loaded.record("Java", "Remote") == table.record("Java", "Remote")
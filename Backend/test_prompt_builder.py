@@ -0,0 +1,46 @@
+import json
+
+from prompt_builder import count_tokens, job_description_context, prompt_messages, prompt_stats, resume_context
+
+RESUME = {
+    "name": "Asha Rao",
+    "email": "asha@example.com",
+    "phone": "+91 90000 00000",
+    "title": "Backend Engineer",
+    "summary": "Builds   Python services.\n\n",
+    "skills": ["Python", "Docker", "AWS"],
+    "experience": [{"company": "Acme", "description": "Owned the billing API", "notes": ""}],
+    "projects": [],
+}
+
+def test_resume_context_keeps_task_fields_compactly():
+    context = resume_context(RESUME, "ats")
+    data = json.loads(context)
+    assert "email" not in data and "phone" not in data and "name" not in data
+    assert data["summary"] == "Builds Python services."
+    assert data["experience"] == [{"company": "Acme", "description": "Owned the billing API"}]
+    assert ": " not in context and "\n" not in context
+    assert count_tokens(context) < count_tokens(json.dumps(RESUME, indent=2))
+
+def test_resume_context_trims_longest_list_to_budget():
+    resume = {**RESUME, "skills": [f"Skill number {i}" for i in range(200)]}
+    context = resume_context(resume, "cover_letter", budget=120)
+    assert count_tokens(context) <= 120
+    assert json.loads(context)["skills"][0] == "Skill number 0"
+
+def test_long_job_description_keeps_requirement_sentences():
+    filler = " ".join(f"Our office {i} has a lovely view of the river." for i in range(80))
+    jd = f"{filler} Candidates must have 5 years of Python and Docker experience. {filler}"
+    assert count_tokens(jd) > 200
+    context = job_description_context(jd, budget=200)
+    assert count_tokens(context) <= 200
+    assert "Candidates must have 5 years of Python and Docker experience." in context
+    assert job_description_context("Short  JD\n with Python.") == "Short JD with Python."
+
+def test_prompt_messages_dedents_and_counts():
+    messages = prompt_messages("test_prompt", """
+        Analyze this:
+            nested
+        """)
+    assert messages == [{"role": "user", "content": "Analyze this:\n    nested"}]
+    assert prompt_stats.to_dict()["test_prompt"]["calls"] >= 1
@@ -0,0 +1,117 @@
+import asyncio
+
+import pubsub
+from pubsub import BROADCAST, BrokerBackplane, InProcessBackplane, PubSubBroker, create_backplane
+
+
+class Worker:
+    def __init__(self, backplane):
+        self.backplane = backplane
+        self.received = []
+
+    def deliver(self, user_id, frame):
+        self.received.append((user_id, frame))
+        return 1
+
+async def wait_for(predicate):
+    for _ in range(200):
+        if predicate():
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError("condition not reached")
+
+def test_broker_routes_by_user_to_the_subscribed_worker():
+    async def scenario():
+        broker = PubSubBroker()
+        port = await broker.start()
+        a, b = Worker(BrokerBackplane("127.0.0.1", port)), Worker(BrokerBackplane("127.0.0.1", port))
+        for worker in (a, b):
+            await worker.backplane.start(worker.deliver)
+            await worker.backplane.connected.wait()
+        b.backplane.subscribe("alice")
+        await wait_for(lambda: "alice" in broker.subscribers)
+
+        a.backplane.publish("alice", '{"type":"payment_update"}')
+        a.backplane.publish("bob", '{"type":"nobody"}')
+        a.backplane.publish(BROADCAST, '{"type":"notice"}')
+        await wait_for(lambda: len(b.received) == 2 and len(a.received) == 1)
+        assert b.received == [("alice", '{"type":"payment_update"}'), (BROADCAST, '{"type":"notice"}')]
+
+        b.backplane.unsubscribe("alice")
+        await wait_for(lambda: "alice" not in broker.subscribers)
+        for worker in (a, b):
+            await worker.backplane.close()
+        await broker.close()
+
+    asyncio.run(scenario())
+
+def test_relay_survives_malformed_frames_and_failing_delivery():
+    async def scenario():
+        broker = PubSubBroker()
+        port = await broker.start()
+        worker = Worker(BrokerBackplane("127.0.0.1", port))
+        deliver = worker.deliver
+
+        def flaky(user_id, frame):
+            if frame == "boom":
+                raise RuntimeError("socket gone")
+            return deliver(user_id, frame)
+
+        await worker.backplane.start(flaky)
+        await worker.backplane.connected.wait()
+        worker.backplane.subscribe("alice")
+        await wait_for(lambda: "alice" in broker.subscribers)
+
+        _, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(b'[1, 2]\n{"op":"pub","user":"alice"}\n')
+        await writer.drain()
+        worker.backplane.publish("alice", "boom")
+        worker.backplane.publish("alice", '{"type":"after"}')
+        await wait_for(lambda: worker.received == [("alice", '{"type":"after"}')])
+        assert worker.backplane.dropped == 2 and worker.backplane.reconnects == 0
+
+        writer.close()
+        await worker.backplane.close()
+        await broker.close()
+
+    asyncio.run(scenario())
+
+def test_oversized_frames_are_dropped_without_losing_the_connection(monkeypatch):
+    monkeypatch.setattr(pubsub, "PUBSUB_MAX_FRAME_BYTES", 1024)
+
+    async def scenario():
+        broker = PubSubBroker()
+        port = await broker.start()
+        worker = Worker(BrokerBackplane("127.0.0.1", port))
+        await worker.backplane.start(worker.deliver)
+        await worker.backplane.connected.wait()
+        worker.backplane.subscribe("alice")
+        await wait_for(lambda: "alice" in broker.subscribers)
+
+        worker.backplane.publish("alice", "x" * 2048)
+        assert worker.backplane.dropped == 1
+
+        # A peer that ignores the limit loses only its oversized line
+        _, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(b'{"op":"pub","user":"alice","frame":"' + b"y" * 5000 + b'"}\n')
+        writer.write(b'{"op":"pub","user":"alice","frame":"after"}\n')
+        await writer.drain()
+        await wait_for(lambda: worker.received == [("alice", "after")])
+        assert broker.dropped == 1 and worker.backplane.reconnects == 0
+        assert "alice" in broker.subscribers
+
+        writer.close()
+        await worker.backplane.close()
+        await broker.close()
+
+    asyncio.run(scenario())
+
+def test_in_process_backplane_delivers_locally():
+    async def scenario():
+        worker = Worker(create_backplane(""))
+        assert isinstance(worker.backplane, InProcessBackplane)
+        await worker.backplane.start(worker.deliver)
+        worker.backplane.publish("alice", "{}")
+        assert worker.received == [("alice", "{}")]
+
+    asyncio.run(scenario())
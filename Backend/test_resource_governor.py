@@ -0,0 +1,39 @@
+import os
+
+import pytest
+
+from resource_governor import _THREAD_ENV_VARS, ResourcePlan, apply_environment
+
+PLAN_ENV_VARS = ("CPU_CORES", "PARSE_POOL_PROCESSES", "TORCH_NUM_THREADS", "TORCH_NUM_INTEROP_THREADS", "BLAS_NUM_THREADS")
+
+@pytest.fixture(autouse=True)
+def clean_env(monkeypatch):
+    for name in PLAN_ENV_VARS + _THREAD_ENV_VARS:
+        monkeypatch.delenv(name, raising=False)
+
+@pytest.mark.parametrize("cores, workers, parse, compute", [
+    (16, 4, 1, 3),  # 4 cores each: one parse process, three compute threads
+    (32, 2, 4, 12),
+    (8, 4, 0, 2),  # too few cores per worker to split off a parse pool
+    (2, 4, 0, 1),  # more workers than cores still leaves each one thread
+])
+def test_cores_are_split_between_workers_and_pools(monkeypatch, cores, workers, parse, compute):
+    monkeypatch.setenv("WEB_CONCURRENCY", str(workers))
+    plan = ResourcePlan(cores)
+    assert (plan.parse_processes, plan.torch_threads, plan.blas_threads) == (parse, compute, compute)
+    assert plan.to_dict()["total_threads"] == workers * (compute + parse)
+
+def test_environment_overrides_pin_the_plan(monkeypatch):
+    monkeypatch.setenv("WEB_CONCURRENCY", "2")
+    monkeypatch.setenv("CPU_CORES", "8")
+    monkeypatch.setenv("TORCH_NUM_THREADS", "1")
+    plan = ResourcePlan(64)
+    assert plan.to_dict()["cores_per_worker"] == 4
+    assert (plan.parse_processes, plan.torch_threads, plan.blas_threads) == (1, 1, 3)
+
+def test_thread_limits_are_exported_without_overriding_explicit_ones(monkeypatch):
+    monkeypatch.setenv("WEB_CONCURRENCY", "4")
+    monkeypatch.setenv("MKL_NUM_THREADS", "7")
+    apply_environment(ResourcePlan(16))
+    assert os.environ["OMP_NUM_THREADS"] == os.environ["OPENBLAS_NUM_THREADS"] == "3"
+    assert os.environ["MKL_NUM_THREADS"] == "7"
@@ -0,0 +1,60 @@
+import asyncio
+
+from single_flight import SingleFlight
+
+
+def test_concurrent_callers_share_one_execution():
+    async def scenario():
+        flight = SingleFlight("test")
+        runs = []
+
+        async def work():
+            runs.append(1)
+            await asyncio.sleep(0.01)
+            return {"answer": 42}
+
+        leader = asyncio.ensure_future(flight.do("jd", work))
+        followers = [asyncio.ensure_future(flight.do("jd", work)) for _ in range(4)]
+        await asyncio.sleep(0)
+        leader.cancel()  # the client that started the work goes away
+        results = await asyncio.gather(*followers)
+        assert runs == [1]
+        assert all(result is results[0] for result in results)
+        assert flight.stats()["coalesced"] == 4
+        assert flight.stats()["in_flight"] == 0
+        assert await flight.do("jd", work) == {"answer": 42} and runs == [1, 1]
+
+    asyncio.run(scenario())
+
+def test_do_many_only_computes_keys_not_in_flight():
+    async def scenario():
+        flight = SingleFlight("test")
+        batches = []
+
+        async def encode(keys):
+            batches.append(keys)
+            await asyncio.sleep(0.01)
+            return [key.upper() for key in keys]
+
+        first = asyncio.ensure_future(flight.do_many(["a", "b"], encode))
+        await asyncio.sleep(0)
+        second = await flight.do_many(["b", "c", "c"], encode)
+        assert await first == ["A", "B"]
+        assert second == ["B", "C", "C"]
+        assert batches == [["a", "b"], ["c"]]
+
+    asyncio.run(scenario())
+
+def test_errors_reach_every_caller():
+    async def scenario():
+        flight = SingleFlight("test")
+
+        async def fail():
+            await asyncio.sleep(0.01)
+            raise ValueError("parse failed")
+
+        results = await asyncio.gather(flight.do("doc", fail), flight.do("doc", fail), return_exceptions=True)
+        assert all(isinstance(result, ValueError) for result in results)
+        assert flight.stats()["failures"] == 1
+
+    asyncio.run(scenario())
@@ -0,0 +1,53 @@
+import asyncio
+
+import numpy as np
+
+import skill_embeddings
+from skill_embeddings import SkillEmbeddingStore
+from skill_graph import SkillGraph, normalize_skill
+from taxonomy import TaxonomySnapshot
+
+DIRECTIONS = {"python": [1, 0, 0], "pytorch": [0, 1, 0], "tensorflow": [0, 1, 1]}
+
+def snapshot(version, skills):
+    graph = SkillGraph.build([{"title": "ML Engineer", "skills": ["TensorFlow", "Python"]}])
+    return TaxonomySnapshot(version, {"ai_ml": skills}, graph, "2024-01-01T00:00:00")
+
+def use_embedder(monkeypatch, calls):
+    async def embed_texts(texts):
+        calls.append(len(texts))
+        return np.array([DIRECTIONS.get(normalize_skill(text), [0, 0, 0.1]) for text in texts], dtype=np.float32)
+
+    monkeypatch.setattr(skill_embeddings, "embed_texts", embed_texts)
+
+def test_similarity_matches_each_job_skill_to_its_closest_resume_skill(monkeypatch):
+    use_embedder(monkeypatch, [])
+
+    async def scenario():
+        table = await SkillEmbeddingStore().for_snapshot(snapshot(1, ["Python", "PyTorch"]))
+        result = table.similarity(["python", "PyTorch", "COBOL"], ["TensorFlow", "Python"])
+        assert result["best_matches"]["Python"] == {"skill": "Python", "similarity": 1.0}
+        assert result["best_matches"]["TensorFlow"]["skill"] == "PyTorch"
+        assert result["best_matches"]["TensorFlow"]["similarity"] == round(1 / np.sqrt(2), 4)
+        assert abs(result["score"] - (1 + 1 / np.sqrt(2)) / 2) < 1e-6
+        assert table.similarity(["COBOL"], ["Python"]) == {"score": 0.0, "best_matches": {}}
+
+    asyncio.run(scenario())
+
+def test_store_serves_the_stale_table_while_a_newer_taxonomy_builds(monkeypatch):
+    calls = []
+    use_embedder(monkeypatch, calls)
+
+    async def scenario():
+        store = SkillEmbeddingStore()
+        first = await store.for_snapshot(snapshot(1, ["Python"]))
+        assert first.version == 1 and await store.for_snapshot(snapshot(1, ["Python"])) is first
+        assert len(calls) == 1
+
+        newer = snapshot(2, ["Python", "PyTorch"])
+        assert await store.for_snapshot(newer) is first
+        await store._building
+        assert store.table.version == 2 and "pytorch" in store.table.skill_ids
+        assert await store.for_snapshot(snapshot(1, ["Python"])) is store.table
+
+    asyncio.run(scenario())
@@ -0,0 +1,43 @@
+import numpy as np
+
+from skill_graph import SkillGraph
+
+JOBS = [
+    {"title": "AI Engineer", "skills": ["Python", "TensorFlow", "OpenCV", "Git"]},
+    {"title": "ML Engineer", "skills": ["Python", "PyTorch", "TensorFlow"]},
+    {"title": "Frontend Developer", "skills": ["JavaScript", "React", "Git"]},
+    {"title": "Full Stack Developer", "skills": ["JavaScript", "React", "Node.js", "MongoDB"]},
+]
+
+def test_recommend_for_role_excludes_known_skills():
+    graph = SkillGraph.build(JOBS)
+    result = graph.recommend(["python"], "AI Engineer")
+    assert "TensorFlow" in result["missing_skills"]
+    assert "Python" not in result["missing_skills"]
+    assert result["source"] == "skill_graph"
+
+def test_related_skills_use_cooccurrence():
+    graph = SkillGraph.build(JOBS)
+    assert "React" in graph.related_skills("JavaScript")
+    assert graph.related_skills("COBOL") == []
+
+def test_save_and_load_round_trip(tmp_path):
+    graph = SkillGraph.build(JOBS)
+    path = str(tmp_path / "skill_graph.npz")
+    graph.save(path)
+    loaded = SkillGraph.load(path)
+    assert loaded.skills == graph.skills
+    expected = graph.recommend(["React"], "Developer")
+    actual = loaded.recommend(["React"], "Developer")
+    assert actual["missing_skills"] == expected["missing_skills"]
+    assert actual["skill_priority"] == expected["skill_priority"]
+
+def test_saved_model_loads_without_pickle(tmp_path):
+    graph = SkillGraph.build(JOBS)
+    path = str(tmp_path / "skill_graph.npz")
+    graph.save(path)
+    with np.load(path) as data:
+        assert all(data[name].dtype != object for name in data.files)
+    loaded = SkillGraph.load(path)
+    assert loaded.roles == graph.roles
+    assert (loaded.num_jobs, loaded.built_at) == (len(JOBS), graph.built_at)
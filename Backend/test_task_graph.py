@@ -0,0 +1,47 @@
+import asyncio
+import time
+
+import pytest
+
+from task_graph import TaskGraph
+
+
+async def slow(value, seconds):
+    await asyncio.sleep(seconds)
+    return value
+
+def test_independent_branches_run_concurrently():
+    graph = TaskGraph("test")
+    graph.add("skills", lambda: ["Python", "Docker"])
+    graph.add("a", lambda skills: slow(len(skills), 0.1), after=("skills",))
+    graph.add("b", lambda skills: slow(skills[0], 0.1), after=("skills",))
+    graph.add("c", lambda a, b: f"{b}:{a}", after=("a", "b"))
+    started = time.monotonic()
+    results = asyncio.run(graph.run())
+    assert time.monotonic() - started < 0.18
+    assert results["c"] == "Python:2"
+    assert {entry["status"] for entry in graph.report.values()} == {"ok"}
+
+def test_deadline_and_errors_use_the_branch_fallback():
+    async def fail(skills):
+        raise RuntimeError("LLM unavailable")
+
+    graph = TaskGraph("test")
+    graph.add("skills", lambda: ["Go"])
+    graph.add("late", lambda skills: slow("ai", 1), after=("skills",), deadline=0.05, fallback=lambda skills: "heuristic")
+    graph.add("broken", fail, after=("skills",), fallback=lambda skills: skills)
+    results = asyncio.run(graph.run())
+    assert results["late"] == "heuristic" and results["broken"] == ["Go"]
+    assert graph.report["late"]["status"] == "timeout"
+    assert graph.report["broken"]["status"] == "fallback"
+
+def test_failure_without_fallback_fails_the_graph():
+    async def fail():
+        raise ValueError("no fallback")
+
+    graph = TaskGraph("test")
+    graph.add("broken", fail)
+    with pytest.raises(ValueError):
+        asyncio.run(graph.run())
+    with pytest.raises(ValueError):
+        graph.add("orphan", lambda missing: None, after=("missing",))
@@ -0,0 +1,47 @@
+import os
+import time
+
+import taxonomy
+from taxonomy import TaxonomyStore, VersionedCache
+
+
+def test_rebuild_swaps_while_held_snapshots_stay_intact(tmp_path, monkeypatch):
+    monkeypatch.setattr(taxonomy, "DATA_DIR", str(tmp_path))
+    store = TaxonomyStore(str(tmp_path / "taxonomy.json"))
+    held = store.current()
+    cache = VersionedCache()
+    cache.set("resume", ["Python"], held.version)
+
+    rebuilt = store.rebuild()
+    assert store.current() is rebuilt and rebuilt.version == held.version + 1
+    # A request that started on the old snapshot keeps a complete, consistent view of it
+    assert held.version == 0 and "Python" in held.extract_skills("Senior Python developer")
+    assert held.skill_graph is not rebuilt.skill_graph
+
+    assert cache.get("resume", rebuilt.version) is None and len(cache) == 0
+    cache.set("resume", ["Go"], held.version)
+    assert len(cache) == 0
+    cache.set("resume", ["Python"], rebuilt.version)
+    assert cache.get("resume", rebuilt.version) == ["Python"]
+
+def test_second_store_picks_up_the_published_manifest(tmp_path, monkeypatch):
+    monkeypatch.setattr(taxonomy, "DATA_DIR", str(tmp_path))
+    monkeypatch.setattr(taxonomy, "TAXONOMY_POLL_SECONDS", 0)
+    path = str(tmp_path / "taxonomy.json")
+    publisher = TaxonomyStore(path)
+    publisher.rebuild()
+    reader = TaxonomyStore(path)
+    assert reader.current().version == 1
+
+    publisher.rebuild()
+    os.utime(path, ns=(time.time_ns(), time.time_ns() + 10**9))
+    for _ in range(200):
+        if reader.current().version == 2:
+            break
+        time.sleep(0.01)
+    assert reader.current().version == 2
+
+    # A rebuild on the reader takes the next version on disk, not its own + 1 over the publisher's
+    publisher.rebuild()
+    assert reader.rebuild().version == 4
+    assert not os.path.exists(os.path.join(tmp_path, "skill_graph.v2.npz"))
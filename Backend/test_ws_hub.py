@@ -0,0 +1,65 @@
+import asyncio
+
+import ws_hub
+from ws_hub import SLOW_CONSUMER_CLOSE_CODE, ConnectionHub
+
+
+class FakeWebSocket:
+    def __init__(self, blocked=False):
+        self.scope = {"subprotocols": []}
+        self.query_params = {}
+        self.sent = []
+        self.closed_with = None
+        self.unblock = asyncio.Event()
+        if not blocked:
+            self.unblock.set()
+
+    async def accept(self, subprotocol=None):
+        pass
+
+    async def send_text(self, frame):
+        await self.unblock.wait()
+        self.sent.append(frame)
+
+    async def send_bytes(self, frame):
+        await self.send_text(frame)
+
+    async def close(self, code=1000, reason=""):
+        self.closed_with = (code, reason)
+
+def test_queue_overflow_evicts_only_the_slow_consumer(monkeypatch):
+    monkeypatch.setattr(ws_hub, "WS_SEND_QUEUE_SIZE", 2)
+
+    async def scenario():
+        hub = ConnectionHub()
+        fast_socket, slow_socket = FakeWebSocket(), FakeWebSocket(blocked=True)
+        fast = await hub.connect(fast_socket, "alice")
+        slow = await hub.connect(slow_socket, "bob")
+        await asyncio.sleep(0)
+        # The slow writer holds one frame in send_text; the queue takes two more, the next one overflows
+        for i in range(4):
+            hub.broadcast({"type": "notice", "n": i})
+            await asyncio.sleep(0)
+        await asyncio.sleep(0.01)
+        assert len(fast_socket.sent) == 4 and not fast.closed
+        assert slow.closed and slow.id not in hub.connections and "bob" not in hub.by_user
+        assert slow_socket.closed_with == (SLOW_CONSUMER_CLOSE_CODE, "slow consumer")
+        assert hub.evictions == 1 and not slow.send({"type": "notice"})
+        await hub.disconnect(fast)
+
+    asyncio.run(scenario())
+
+def test_blocked_send_is_evicted_after_the_send_timeout(monkeypatch):
+    monkeypatch.setattr(ws_hub, "WS_SEND_TIMEOUT_SECONDS", 0.05)
+
+    async def scenario():
+        hub = ConnectionHub()
+        socket = FakeWebSocket(blocked=True)
+        connection = await hub.connect(socket, "alice")
+        assert hub.send_to_user("alice", {"type": "notice"}) == 1
+        await asyncio.sleep(0.1)
+        assert connection.closed and hub.evictions == 1 and hub.connections == {}
+        assert socket.closed_with == (SLOW_CONSUMER_CLOSE_CODE, "slow consumer")
+        assert socket.sent == []
+
+    asyncio.run(scenario())
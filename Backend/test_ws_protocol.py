@@ -0,0 +1,57 @@
+import json
+
+import pytest
+
+from ws_protocol import ENCODINGS, FrameCodec, apply_delta, decode_message, diff, encode_message, negotiate
+
+RESULT = {
+    "match_score": 50.0,
+    "matched_skills": ["Python"],
+    "job_analysis": {"skills": ["Python", "AWS"], "ai_analysis": {"summary": "Backend role " * 20}},
+    "semantic_score": 61.5,
+    "timestamp": "2026-01-01T00:00:00",
+}
+
+def test_diff_round_trips_nested_changes():
+    new = json.loads(json.dumps(RESULT))
+    new["match_score"] = 100.0
+    new["job_analysis"]["skills"].append("Docker")
+    del new["semantic_score"]
+    new["degraded"] = False
+    changes = diff(RESULT, new)
+    assert [["job_analysis", "skills"], ["Python", "AWS", "Docker"]] in changes["set"]
+    assert changes["unset"] == [["semantic_score"]]
+    assert apply_delta(RESULT, changes) == new
+    assert diff(new, new) == {"set": [], "unset": []}
+
+def test_codec_sends_deltas_only_for_repeated_results():
+    codec = FrameCodec("json", deltas=True)
+    first = json.loads(codec.encode({"type": "job_match_result", "request_id": "a", "data": RESULT}))
+    assert first["data"] == RESULT
+    update = {**RESULT, "match_score": 75.0, "timestamp": "2026-01-01T00:00:05"}
+    frame = codec.encode({"type": "job_match_result", "request_id": "b", "data": update})
+    second = json.loads(frame)
+    assert "data" not in second and second["request_id"] == "b"
+    assert apply_delta(first["data"], second["delta"]) == update
+    assert len(frame) < len(json.dumps(update)) / 2
+    progress = json.loads(codec.encode({"type": "progress", "data": {"message": "working"}}))
+    assert progress["data"] == {"message": "working"}
+    assert "data" in json.loads(FrameCodec("json", deltas=False).encode({"type": "job_match_result", "data": update}))
+
+def test_negotiation_falls_back_to_json():
+    codec, subprotocol = negotiate(["careerforge.unknown", "careerforge.json"], {"deltas": "1"})
+    assert (codec.encoding, codec.deltas, subprotocol) == ("json", True, "careerforge.json")
+    codec, subprotocol = negotiate(["careerforge.msgpack"], {})
+    assert codec.encoding == ("msgpack" if "msgpack" in ENCODINGS else "json")
+    assert subprotocol == ("careerforge.msgpack" if "msgpack" in ENCODINGS else None)
+    codec, _ = negotiate([], {"encoding": "protobuf"})
+    assert codec.encoding == "json" and not codec.deltas
+
+def test_inbound_frames_decode_by_frame_kind():
+    message = {"type": "job_match", "request_id": "r1", "data": {"resume_text": "Python"}}
+    assert decode_message(encode_message(message, "json")) == message
+    if "msgpack" in ENCODINGS:
+        assert decode_message(encode_message(message, "msgpack")) == message
+    for frame in ("{not json", b"\xc1", b""):
+        with pytest.raises(ValueError):
+            decode_message(frame)
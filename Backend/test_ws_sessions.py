@@ -0,0 +1,123 @@
+import asyncio
+
+import pytest
+
+import ws_sessions
+from ws_protocol import FrameCodec
+from ws_sessions import SessionLimitError, SessionStore
+
+
+class FakeConnection:
+    def __init__(self, user_id="alice"):
+        self.user_id = user_id
+        self.codec = FrameCodec()
+        self.frames = []
+        self.closed_with = None
+
+    def send(self, message):
+        self.frames.append(message)
+        return True
+
+    async def close(self, code=1000, reason=""):
+        self.closed_with = (code, reason)
+
+async def wait(request):
+    await asyncio.sleep(10)
+    return {}
+
+HANDLERS = {"analyze": wait}
+
+def result(request_id):
+    return {"type": "analyze_result", "request_id": request_id, "data": {}}
+
+def test_resume_replays_results_after_last_seq():
+    async def scenario():
+        store = SessionStore()
+        first = FakeConnection()
+        session, info, frames = store.attach(first, HANDLERS)
+        assert info["resumed"] is False and frames == []
+        session.send(result("a"))
+        session.send({"type": "progress", "request_id": "b", "data": {}})
+        session.send(result("b"))
+        store.detach(session, first)
+        session.send(result("c"))  # finished while nobody was connected
+
+        second = FakeConnection()
+        resumed, info, frames = store.attach(second, HANDLERS, session.token, last_seq=1)
+        assert resumed is session and session.expiry is None and session.connection is second
+        assert info["resumed"] is True and info["last_seq"] == 3 and not info["replay_gap"]
+        assert [(frame["request_id"], frame["seq"]) for frame in frames] == [("b", 2), ("c", 3)]
+        assert store.stats()["replayed_frames"] == 2
+
+    asyncio.run(scenario())
+
+def test_replay_gap_when_missed_results_fell_out_of_the_buffer(monkeypatch):
+    monkeypatch.setattr(ws_sessions, "WS_REPLAY_BUFFER_SIZE", 2)
+
+    async def scenario():
+        store = SessionStore()
+        connection = FakeConnection()
+        session, _, _ = store.attach(connection, HANDLERS)
+        for request_id in "abcd":
+            session.send(result(request_id))
+        assert session.replay_after(1) == ([session.replay[0], session.replay[1]], True)
+        assert session.replay_after(2)[1] is False
+        store.detach(session, connection)
+        _, info, frames = store.attach(FakeConnection(), HANDLERS, session.token, last_seq=0)
+        assert info["replay_gap"] is True and [frame["seq"] for frame in frames] == [3, 4]
+
+    asyncio.run(scenario())
+
+def test_newer_socket_takes_over_and_foreign_tokens_start_fresh():
+    async def scenario():
+        store = SessionStore()
+        first, second = FakeConnection(), FakeConnection()
+        session, _, _ = store.attach(first, HANDLERS)
+        store.attach(second, HANDLERS, session.token)
+        await asyncio.sleep(0)
+        assert first.closed_with == (1000, "session resumed on another socket")
+        # The old socket's late disconnect must not detach the session from the new one
+        store.detach(session, first)
+        assert session.connection is second and session.expiry is None
+
+        other, info, _ = store.attach(FakeConnection("mallory"), HANDLERS, session.token)
+        assert other is not session and info["resumed"] is False
+        assert store.stats()["resume_misses"] == 1
+
+    asyncio.run(scenario())
+
+def test_detached_session_expires_after_the_ttl(monkeypatch):
+    monkeypatch.setattr(ws_sessions, "WS_SESSION_TTL_SECONDS", 0.01)
+
+    async def scenario():
+        store = SessionStore()
+        connection = FakeConnection()
+        session, _, _ = store.attach(connection, HANDLERS)
+        session.scheduler.submit({"type": "analyze", "request_id": "a"})
+        task = session.scheduler.tasks["analyze"][1]
+        store.detach(session, connection)
+        await asyncio.sleep(0.05)
+        assert session.token not in store.sessions and session.closed
+        assert task.cancelled() and not session.send(result("late"))
+        _, info, _ = store.attach(FakeConnection(), HANDLERS, session.token)
+        assert info["resumed"] is False
+
+    asyncio.run(scenario())
+
+def test_session_limit_drops_detached_sessions_before_refusing(monkeypatch):
+    monkeypatch.setattr(ws_sessions, "WS_MAX_SESSIONS", 1)
+
+    async def scenario():
+        store = SessionStore()
+        first = FakeConnection()
+        session, _, _ = store.attach(first, HANDLERS)
+        with pytest.raises(SessionLimitError):
+            store.attach(FakeConnection("bob"), HANDLERS)
+        # A resume needs no new slot
+        store.attach(first, HANDLERS, session.token)
+        store.detach(session, first)
+        newcomer, _, _ = store.attach(FakeConnection("bob"), HANDLERS)
+        assert list(store.sessions) == [newcomer.token] and session.closed
+        assert store.stats()["refused"] == 1
+
+    asyncio.run(scenario())
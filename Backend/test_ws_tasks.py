@@ -0,0 +1,70 @@
+import asyncio
+
+import ws_tasks
+from ws_protocol import FrameCodec
+from ws_tasks import RequestScheduler
+
+
+class Channel:
+    def __init__(self):
+        self.codec = FrameCodec()
+        self.frames = []
+
+    def send(self, message):
+        self.frames.append(message)
+        return True
+
+    def of_type(self, frame_type):
+        return [frame for frame in self.frames if frame["type"] == frame_type]
+
+async def slow(request):
+    await asyncio.sleep(request.payload.get("seconds", 0.05))
+    return {"echo": request.payload.get("value")}
+
+def test_newer_request_of_a_type_supersedes_the_running_one():
+    async def scenario():
+        channel = Channel()
+        scheduler = RequestScheduler(channel, {"analyze": slow})
+        scheduler.submit({"type": "analyze", "request_id": "a", "data": {"value": 1}})
+        scheduler.submit({"type": "analyze", "request_id": "b", "data": {"value": 2}})
+        scheduler.submit({"type": "analyze", "request_id": "c", "data": {"value": 3}, "supersede": False})
+        await asyncio.sleep(0.1)
+        assert channel.of_type("cancelled") == [
+            {"type": "cancelled", "request_id": "a", "data": {"request": "analyze", "superseded_by": "b"}}
+        ]
+        results = {frame["request_id"]: frame["data"] for frame in channel.of_type("analyze_result")}
+        assert results == {"b": {"echo": 2}, "c": {"echo": 3}}
+        assert scheduler.tasks == {}
+
+    asyncio.run(scenario())
+
+def test_requests_beyond_the_in_flight_limit_are_rejected(monkeypatch):
+    monkeypatch.setattr(ws_tasks, "WS_MAX_IN_FLIGHT", 2)
+
+    async def scenario():
+        channel = Channel()
+        scheduler = RequestScheduler(channel, {"analyze": slow})
+        rejected = ws_tasks.scheduler_stats.rejected
+        for request_id in ("a", "b", "c"):
+            scheduler.submit({"type": "analyze", "request_id": request_id, "supersede": False})
+        assert [frame["request_id"] for frame in channel.of_type("error")] == ["c"]
+        assert ws_tasks.scheduler_stats.rejected == rejected + 1
+        scheduler.cancel_all()
+        await asyncio.sleep(0)
+        assert scheduler.tasks == {}
+        assert not channel.of_type("analyze_result")
+
+    asyncio.run(scenario())
+
+def test_unknown_types_and_inline_handlers_answer_immediately():
+    async def scenario():
+        channel = Channel()
+        scheduler = RequestScheduler(channel, {"ping": lambda request: {"pong": True}})
+        scheduler.submit({"type": "ping", "request_id": "p"})
+        scheduler.submit({"type": "nope", "request_id": "n"})
+        assert channel.frames == [
+            {"type": "ping_result", "request_id": "p", "data": {"pong": True}},
+            {"type": "error", "request_id": "n", "data": {"request": "nope", "message": "Unknown message type."}},
+        ]
+
+    asyncio.run(scenario())
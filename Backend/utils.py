@@ -8,9 +8,19 @@ import pdfplumber
 import spacy
 from spacy.matcher import Matcher
 
+from inference_batcher import MicroBatcher
+
 # Load spaCy model once
 nlp = spacy.load("en_core_web_sm")
 
+# Concurrent parses share one nlp.pipe pass in a worker thread
+nlp_batcher = MicroBatcher(
+    lambda texts: list(nlp.pipe(texts, batch_size=len(texts))),
+    max_batch_size=int(os.getenv("SPACY_BATCH_SIZE", "16")),
+    max_wait_ms=float(os.getenv("SPACY_BATCH_WAIT_MS", "5")),
+    name="spacy"
+)
+
 # Master skill list (expand as needed)
 SKILLS = [
     'machine learning', 'deep learning', 'nlp', 'natural language processing',
@@ -163,8 +173,7 @@ def generate_learning_plan(missing_skills):
 
 # --- Main Parser + Matcher ---
 
-def parse_resume(text: str):
-    doc = nlp(text)
+def _parse_resume_doc(text: str, doc):
     return {
         'name': extract_name(doc),
         'email': extract_email(text),
@@ -173,8 +182,21 @@ def parse_resume(text: str):
         'total_experience': extract_total_experience(text)
     }
 
+def parse_resume(text: str):
+    return _parse_resume_doc(text, nlp(text))
+
+async def parse_resume_async(text: str):
+    """Parse a resume without blocking the event loop, batching the spaCy pass with other requests"""
+    doc = await nlp_batcher.submit(text)
+    return _parse_resume_doc(text, doc)
+
 def parse_resume_with_job_matching(text: str, job_description_text: str):
-    resume_data = parse_resume(text)
+    return _add_job_matching(parse_resume(text), job_description_text)
+
+async def parse_resume_with_job_matching_async(text: str, job_description_text: str):
+    return _add_job_matching(await parse_resume_async(text), job_description_text)
+
+def _add_job_matching(resume_data: dict, job_description_text: str):
     job_skills = extract_skills_from_job_description(job_description_text)
     matched, missing = match_skills(job_skills, resume_data['skills'])
     learning_plan = generate_learning_plan(missing)
@@ -1,5 +1,3 @@
-import os
-
 try:
     import speech_recognition as sr
 except ImportError:
@@ -10,19 +8,18 @@ except ImportError:
     detect = None
 from datetime import datetime
 
-import openai
 from Backend.models import PaymentHistory, SessionLocal, VoiceAssistantLicense
 from fastapi import APIRouter, HTTPException, Query
 from pydantic import BaseModel
 
+import llm_gateway
+from llm_streaming import sse_response, stream_with_fallback
+
 router = APIRouter()
 
 # Initialize components
 recognizer = sr.Recognizer()
 
-# Configure OpenAI
-openai.api_key = os.getenv("OPENAI_API_KEY")
-
 class VoiceMessage(BaseModel):
     text: str
     language: str = "en"
@@ -94,44 +91,39 @@ def detect_language(text: str) -> str:
     except Exception:
         return "en"
 
-def get_assistant_response(user_input: str, assistant_name: str, language: str) -> str:
-    """Get AI response using OpenAI or fallback to predefined responses"""
-    try:
-        # Try to use OpenAI for more intelligent responses
-        if openai.api_key:
-            personality = ASSISTANT_PERSONALITIES.get(
-                assistant_name, 
-                ASSISTANT_PERSONALITIES["Pandu"]
-            )
-            
-            prompt = (
-                f"You are {assistant_name}, an AI assistant with the following personality: "
-                f"{personality['personality']}\n\n"
-                f"User message: {user_input}\n\n"
-                f"Please respond in a helpful, natural way that matches your personality. "
-                f"Keep responses concise but friendly. "
-                f"If the user is greeting you, respond warmly. "
-                f"If they're asking for help, provide useful assistance."
-            )
-            
-            response = openai.ChatCompletion.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": prompt},
-                    {"role": "user", "content": user_input}
-                ],
-                max_tokens=150,
-                temperature=0.7
-            )
-            
-            ai_response = response.choices[0].message.content.strip()
-            return ai_response
-            
-    except Exception as e:
-        print(f"OpenAI error: {e}")
+def assistant_messages(user_input: str, assistant_name: str) -> list[dict[str, str]]:
+    """System prompt with the assistant's personality followed by the user's message"""
+    personality = ASSISTANT_PERSONALITIES.get(
+        assistant_name, 
+        ASSISTANT_PERSONALITIES["Pandu"]
+    )
     
-    # Fallback to predefined responses
-    return get_fallback_response(user_input, assistant_name, language)
+    prompt = (
+        f"You are {assistant_name}, an AI assistant with the following personality: "
+        f"{personality['personality']}\n\n"
+        f"User message: {user_input}\n\n"
+        f"Please respond in a helpful, natural way that matches your personality. "
+        f"Keep responses concise but friendly. "
+        f"If the user is greeting you, respond warmly. "
+        f"If they're asking for help, provide useful assistance."
+    )
+    return [
+        {"role": "system", "content": prompt},
+        {"role": "user", "content": user_input}
+    ]
+
+async def get_assistant_response(user_input: str, assistant_name: str, language: str) -> str:
+    """Get AI response using OpenAI or fallback to predefined responses"""
+    # Try to use OpenAI for more intelligent responses; predefined responses when it is off, slow or failing
+    response, _ = await llm_gateway.with_fallback(
+        lambda: llm_gateway.chat(
+            assistant_messages(user_input, assistant_name),
+            max_tokens=150,
+            temperature=0.7
+        ),
+        lambda: get_fallback_response(user_input, assistant_name, language)
+    )
+    return response
 
 def get_fallback_response(user_input: str, assistant_name: str, language: str) -> str:
     """Get fallback response when OpenAI is not available"""
@@ -175,7 +167,7 @@ async def process_voice_message(message: VoiceMessage):
             message.language = detect_language(message.text)
         
         # Get AI response
-        response_text = get_assistant_response(
+        response_text = await get_assistant_response(
             message.text, 
             message.assistant_name, 
             message.language
@@ -193,6 +185,18 @@ async def process_voice_message(message: VoiceMessage):
             detail=f"Error processing voice message: {str(e)}"
         ) from e
 
+@router.post("/process-voice/stream")
+async def process_voice_message_stream(message: VoiceMessage):
+    """Process voice message and stream the AI response as Server-Sent Events (`token` ... `done`)"""
+    if not message.language or message.language == "auto":
+        message.language = detect_language(message.text)
+    return sse_response(stream_with_fallback(
+        assistant_messages(message.text, message.assistant_name),
+        lambda: get_fallback_response(message.text, message.assistant_name, message.language),
+        max_tokens=150,
+        temperature=0.7
+    ))
+
 @router.post("/detect-language")
 async def detect_language_endpoint(text: str):
     """Detect the language of input text"""
@@ -0,0 +1,211 @@
+"""
+WebSocket Connection Hub
+Registry of open sockets, each drained by its own writer task from a bounded queue, with fan-out, slow-consumer
+eviction and cross-worker delivery through the pub/sub backplane
+"""
+
+import asyncio
+import itertools
+import json
+import logging
+import os
+import time
+from collections import defaultdict
+from typing import Any
+
+from fastapi import WebSocket
+
+from pubsub import BROADCAST, InProcessBackplane, create_backplane
+from ws_protocol import Frame, FrameCodec, encode_message, negotiate, protocol_stats
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+WS_SEND_QUEUE_SIZE = int(os.getenv("WS_SEND_QUEUE_SIZE", "256"))
+WS_SEND_TIMEOUT_SECONDS = float(os.getenv("WS_SEND_TIMEOUT_SECONDS", "10"))
+WS_CLOSE_TIMEOUT_SECONDS = float(os.getenv("WS_CLOSE_TIMEOUT_SECONDS", "2"))
+
+# 1013 "try again later": the client fell too far behind, not a protocol error
+SLOW_CONSUMER_CLOSE_CODE = 1013
+
+class Connection:
+    """One accepted socket; all outbound frames go through its queue so only the writer task touches the socket"""
+
+    def __init__(
+        self, hub: "ConnectionHub", websocket: WebSocket, user_id: str, connection_id: int, codec: FrameCodec
+    ):
+        self.hub = hub
+        self.codec = codec
+        self.websocket = websocket
+        self.user_id = user_id
+        self.id = connection_id
+        self.connected_at = time.time()
+        self.queue: asyncio.Queue[Frame] = asyncio.Queue(WS_SEND_QUEUE_SIZE)
+        self.closed = False
+        self.sent = 0
+        self.writer = asyncio.create_task(self._write())
+
+    def send(self, message: dict[str, Any]) -> bool:
+        """Queue a message without waiting; False if the connection is gone (or was just evicted)"""
+        return self.send_frame(self.codec.encode(message))
+
+    def send_frame(self, frame: Frame) -> bool:
+        if self.closed:
+            return False
+        try:
+            self.queue.put_nowait(frame)
+        except asyncio.QueueFull:
+            self.hub.evict(self, f"{self.queue.qsize()} frames unsent")
+            return False
+        return True
+
+    async def _write(self) -> None:
+        try:
+            while True:
+                frame = await self.queue.get()
+                # asyncio.timeout, not wait_for: no extra task per frame
+                async with asyncio.timeout(WS_SEND_TIMEOUT_SECONDS):
+                    if isinstance(frame, bytes):
+                        await self.websocket.send_bytes(frame)
+                    else:
+                        await self.websocket.send_text(frame)
+                self.sent += 1
+                self.hub.frames_sent += 1
+        except TimeoutError:
+            self.hub.evict(self, f"send blocked for {WS_SEND_TIMEOUT_SECONDS}s")
+        except Exception as e:
+            # The peer went away; the endpoint's receive loop sees the disconnect and unregisters us
+            logger.debug("WebSocket %d writer stopped: %s", self.id, e)
+            self.closed = True
+
+    async def close(self, code: int = 1000, reason: str = "") -> None:
+        self.closed = True
+        self.writer.cancel()
+        try:
+            await asyncio.wait_for(self.websocket.close(code=code, reason=reason), WS_CLOSE_TIMEOUT_SECONDS)
+        except Exception as e:
+            logger.debug("WebSocket %d close failed: %s", self.id, e)
+
+class ConnectionHub:
+    """Open connections by id and by user; fan-out only enqueues, so one slow socket cannot stall the others"""
+
+    def __init__(self):
+        self.backplane = create_backplane()
+        self.connections: dict[int, Connection] = {}
+        self.by_user: dict[str, set[Connection]] = defaultdict(set)
+        self._ids = itertools.count(1)
+        self.total_connections = 0
+        self.peak_connections = 0
+        self.frames_sent = 0
+        self.frames_dropped = 0
+        self.evictions = 0
+        self.broadcasts = 0
+        self.fanout_seconds = 0.0
+
+    async def connect(self, websocket: WebSocket, user_id: str) -> Connection:
+        codec, subprotocol = negotiate(websocket.scope.get("subprotocols", []), websocket.query_params)
+        await websocket.accept(subprotocol=subprotocol)
+        connection = Connection(self, websocket, user_id, next(self._ids), codec)
+        self.connections[connection.id] = connection
+        if user_id not in self.by_user:
+            self.backplane.subscribe(user_id)
+        self.by_user[user_id].add(connection)
+        self.total_connections += 1
+        self.peak_connections = max(self.peak_connections, len(self.connections))
+        return connection
+
+    def _unregister(self, connection: Connection) -> None:
+        self.connections.pop(connection.id, None)
+        sockets = self.by_user.get(connection.user_id)
+        if sockets is not None:
+            sockets.discard(connection)
+            if not sockets:
+                del self.by_user[connection.user_id]
+                self.backplane.unsubscribe(connection.user_id)
+
+    async def disconnect(self, connection: Connection) -> None:
+        self._unregister(connection)
+        connection.closed = True
+        connection.writer.cancel()
+
+    def evict(self, connection: Connection, reason: str) -> None:
+        """Drop a consumer that cannot keep up; its queued frames are discarded"""
+        if connection.closed:
+            return
+        connection.closed = True
+        self.evictions += 1
+        self.frames_dropped += connection.queue.qsize()
+        logger.warning("Evicting slow WebSocket %d (user %s): %s", connection.id, connection.user_id, reason)
+        self._unregister(connection)
+        # Closing the socket also ends the endpoint's receive loop
+        asyncio.get_running_loop().create_task(connection.close(SLOW_CONSUMER_CLOSE_CODE, "slow consumer"))
+
+    def _fanout(self, connections: list[Connection], message: dict[str, Any] | None, json_frame: str | None = None
+                ) -> int:
+        """Queue one message on many sockets, encoded once per encoding in use (never as a delta)"""
+        started = time.perf_counter()
+        frames: dict[str, Frame] = {} if json_frame is None else {"json": json_frame}
+        delivered = 0
+        for connection in connections:
+            codec = connection.codec
+            frame = frames.get(codec.encoding)
+            if frame is None:
+                if message is None:
+                    message = json.loads(json_frame)
+                frame = frames[codec.encoding] = encode_message(message, codec.encoding)
+            codec.count(frame)
+            delivered += connection.send_frame(frame)
+        self.frames_dropped += len(connections) - delivered
+        self.broadcasts += 1
+        self.fanout_seconds += time.perf_counter() - started
+        return delivered
+
+    def send_to_user(self, user_id: str, message: dict[str, Any]) -> int:
+        """Queue a message on every socket of one user; returns how many accepted it"""
+        return self._fanout(list(self.by_user.get(user_id, ())), message)
+
+    def broadcast(self, message: dict[str, Any]) -> int:
+        """Queue a message on every open socket; returns how many accepted it"""
+        return self._fanout(list(self.connections.values()), message)
+
+    async def start_backplane(self) -> None:
+        workers = int(os.getenv("WEB_CONCURRENCY", "1"))
+        if workers > 1 and isinstance(self.backplane, InProcessBackplane):
+            logger.warning("%d workers share no pub/sub broker (PUBSUB_URL unset): frames published on one worker "
+                           "never reach sockets held by the others", workers)
+        await self.backplane.start(self.deliver)
+
+    def deliver(self, user_id: str, frame: str) -> int:
+        """Backplane callback: queue an already serialized frame on this worker's sockets of a user (or all of them)"""
+        if user_id == BROADCAST:
+            return self._fanout(list(self.connections.values()), None, frame)
+        return self._fanout(list(self.by_user.get(user_id, ())), None, frame)
+
+    def publish(self, user_id: str, message: dict[str, Any]) -> None:
+        """Send to a user's sockets on whichever worker holds them; use this from HTTP handlers and background tasks"""
+        self.backplane.publish(user_id, encode_message(message, "json"))
+
+    def publish_all(self, message: dict[str, Any]) -> None:
+        """Broadcast to every socket on every worker"""
+        self.backplane.publish(BROADCAST, encode_message(message, "json"))
+
+    def stats(self) -> dict[str, Any]:
+        depths = [connection.queue.qsize() for connection in self.connections.values()]
+        return {
+            "active_connections": len(self.connections),
+            "users": len(self.by_user),
+            "peak_connections": self.peak_connections,
+            "total_connections": self.total_connections,
+            "frames_sent": self.frames_sent,
+            "frames_dropped": self.frames_dropped,
+            "evictions": self.evictions,
+            "broadcasts": self.broadcasts,
+            "avg_fanout_ms": round(self.fanout_seconds / self.broadcasts * 1000, 3) if self.broadcasts else 0,
+            "max_queue_depth": max(depths, default=0),
+            "queue_size": WS_SEND_QUEUE_SIZE,
+            "backplane": self.backplane.stats(),
+            "protocol": protocol_stats.to_dict(),
+        }
+
+# Global instance
+hub = ConnectionHub()
@@ -0,0 +1,142 @@
+"""
+WebSocket Wire Protocol
+Negotiated frame encoding (compact JSON text or MessagePack binary) and per-type delta frames for repeated results
+"""
+
+import json
+import logging
+import os
+from collections.abc import Mapping
+from typing import Any
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+# Deltas pay off once a client keeps results around; they stay opt-in so existing clients see plain frames
+WS_DELTAS_DEFAULT = os.getenv("WS_DELTAS_DEFAULT", "false").lower() == "true"
+
+ENCODINGS = ("msgpack", "json") if msgpack is not None else ("json",)
+# Sec-WebSocket-Protocol values a client may offer, mapped to the encoding they select
+SUBPROTOCOLS = {"careerforge.msgpack": "msgpack", "careerforge.json": "json"}
+
+Frame = str | bytes
+
+def encode_message(message: dict[str, Any], encoding: str) -> Frame:
+    """JSON frames are compact ASCII text (so len() is the byte size); MessagePack frames are binary"""
+    if encoding == "msgpack":
+        return msgpack.packb(message, use_bin_type=True)
+    return json.dumps(message, separators=(",", ":"))
+
+def decode_message(frame: Frame) -> Any:
+    """Inbound frames: text is JSON and binary is MessagePack, whichever encoding the socket negotiated"""
+    if isinstance(frame, bytes):
+        if msgpack is None:
+            raise ValueError("MessagePack frames are not supported by this server")
+        return msgpack.unpackb(frame, raw=False)
+    return json.loads(frame)
+
+def diff(old: dict[str, Any], new: dict[str, Any], path: tuple[str, ...] = ()) -> dict[str, list]:
+    """Changes turning `old` into `new`: `set` [[path, value]...] and `unset` [path...]; lists are replaced whole"""
+    changes: dict[str, list] = {"set": [], "unset": []}
+    for key, value in new.items():
+        if key not in old:
+            changes["set"].append([[*path, key], value])
+        elif isinstance(value, dict) and isinstance(old[key], dict):
+            nested = diff(old[key], value, (*path, key))
+            changes["set"].extend(nested["set"])
+            changes["unset"].extend(nested["unset"])
+        elif value != old[key]:
+            changes["set"].append([[*path, key], value])
+    changes["unset"].extend([*path, key] for key in old if key not in new)
+    return changes
+
+def apply_delta(base: dict[str, Any], delta: dict[str, list]) -> dict[str, Any]:
+    """Client side of diff(): rebuild the full result from the previous one (which is left untouched)"""
+    result = json.loads(json.dumps(base))
+    for path, value in delta.get("set", []):
+        target = result
+        for key in path[:-1]:
+            target = target.setdefault(key, {})
+        target[path[-1]] = value
+    for path in delta.get("unset", []):
+        target = result
+        for key in path[:-1]:
+            target = target.get(key, {})
+        target.pop(path[-1], None)
+    return result
+
+class ProtocolStats:
+    """Bytes and delta savings over every connection in this worker"""
+
+    def __init__(self):
+        self.frames: dict[str, int] = dict.fromkeys(ENCODINGS, 0)
+        self.bytes: dict[str, int] = dict.fromkeys(ENCODINGS, 0)
+        self.delta_frames = 0
+        self.delta_bytes_saved = 0
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "encodings": list(ENCODINGS),
+            "frames": self.frames,
+            "bytes": self.bytes,
+            "delta_frames": self.delta_frames,
+            "delta_bytes_saved": self.delta_bytes_saved,
+        }
+
+# Global instance
+protocol_stats = ProtocolStats()
+
+class FrameCodec:
+    """Per-connection encoder; with deltas on, a `*_result` frame carries only what changed since the last one"""
+
+    def __init__(self, encoding: str = "json", deltas: bool = WS_DELTAS_DEFAULT):
+        self.encoding = encoding if encoding in ENCODINGS else "json"
+        self.deltas = deltas
+        self.last_results: dict[str, dict[str, Any]] = {}
+
+    def encode(self, message: dict[str, Any]) -> Frame:
+        frame = encode_message(message, self.encoding)
+        frame_type = message.get("type", "")
+        data = message.get("data")
+        if self.deltas and frame_type.endswith("_result") and isinstance(data, dict):
+            previous = self.last_results.get(frame_type)
+            self.last_results[frame_type] = data
+            if previous is not None:
+                delta = encode_message(
+                    {**{key: value for key, value in message.items() if key != "data"}, "delta": diff(previous, data)},
+                    self.encoding
+                )
+                # A result that changed almost entirely is cheaper to send whole
+                if len(delta) < len(frame):
+                    protocol_stats.delta_frames += 1
+                    protocol_stats.delta_bytes_saved += len(frame) - len(delta)
+                    frame = delta
+        self.count(frame)
+        return frame
+
+    def count(self, frame: Frame) -> None:
+        protocol_stats.frames[self.encoding] += 1
+        protocol_stats.bytes[self.encoding] += len(frame)
+
+    def describe(self) -> dict[str, Any]:
+        return {"encoding": self.encoding, "deltas": self.deltas, "encodings": list(ENCODINGS)}
+
+def negotiate(subprotocols: list[str], query: Mapping[str, str]) -> tuple[FrameCodec, str | None]:
+    """Codec from the offered subprotocols (first supported wins) or `?encoding=&deltas=`; JSON if nothing fits
+
+    Returns the codec and the subprotocol to echo in the handshake (None when the client offered none we know).
+    """
+    deltas = query.get("deltas", str(WS_DELTAS_DEFAULT)).lower() in ("1", "true", "yes")
+    for subprotocol in subprotocols:
+        encoding = SUBPROTOCOLS.get(subprotocol)
+        if encoding in ENCODINGS:
+            return FrameCodec(encoding, deltas), subprotocol
+    encoding = query.get("encoding", "json")
+    if encoding not in ENCODINGS:
+        logger.info("WebSocket encoding %r unavailable, falling back to JSON", encoding)
+    return FrameCodec(encoding, deltas), None
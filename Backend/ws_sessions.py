@@ -0,0 +1,187 @@
+"""
+Resumable WebSocket Sessions
+Short-lived sessions that own a socket's request scheduler and replay buffer, so work survives a reconnect
+"""
+
+import asyncio
+import logging
+import os
+import secrets
+import time
+from collections import deque
+from typing import Any
+
+from ws_hub import Connection
+from ws_protocol import FrameCodec
+from ws_tasks import Handler, RequestScheduler
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+WS_SESSION_TTL_SECONDS = float(os.getenv("WS_SESSION_TTL_SECONDS", "120"))
+WS_REPLAY_BUFFER_SIZE = int(os.getenv("WS_REPLAY_BUFFER_SIZE", "64"))
+WS_MAX_SESSIONS = int(os.getenv("WS_MAX_SESSIONS", "10000"))
+
+class SessionLimitError(Exception):
+    """Every one of WS_MAX_SESSIONS sessions has a socket attached, so none can be dropped for a new one"""
+
+def replayable(message: dict[str, Any]) -> bool:
+    """Terminal frames of a request are kept for replay; progress and token frames are only useful live"""
+    frame_type = message.get("type", "")
+    return "request_id" in message and (frame_type.endswith("_result") or frame_type in ("error", "cancelled"))
+
+class WSSession:
+    """What outlives one socket: the scheduler (in-flight requests and handler state) and recent results
+
+    Handlers send through the session rather than the socket; while no socket is attached their results
+    are buffered and live-only frames are dropped, so an LLM stream keeps running across the gap.
+    """
+
+    def __init__(self, user_id: str, handlers: dict[str, Handler]):
+        self.token = secrets.token_urlsafe(24)
+        self.user_id = user_id
+        self.connection: Connection | None = None
+        self.replay: deque[dict[str, Any]] = deque(maxlen=WS_REPLAY_BUFFER_SIZE)
+        self.seq = 0
+        self.closed = False
+        self.detached_at: float | None = None
+        self.expiry: asyncio.TimerHandle | None = None
+        self.scheduler = RequestScheduler(self, handlers)
+
+    @property
+    def codec(self) -> FrameCodec:
+        return self.connection.codec if self.connection is not None else FrameCodec()
+
+    @codec.setter
+    def codec(self, codec: FrameCodec) -> None:
+        if self.connection is not None:
+            self.connection.codec = codec
+
+    def send(self, message: dict[str, Any]) -> bool:
+        """Number and buffer result frames, then forward to the attached socket; False only once the session is gone"""
+        if self.closed:
+            return False
+        if replayable(message):
+            self.seq += 1
+            message = {**message, "seq": self.seq}
+            self.replay.append(message)
+        if self.connection is not None:
+            self.connection.send(message)
+        return True
+
+    def in_flight(self) -> list[dict[str, str]]:
+        return [{"request_id": request.id, "type": request.type} for request, _ in self.scheduler.tasks.values()]
+
+    def replay_after(self, last_seq: int) -> tuple[list[dict[str, Any]], bool]:
+        """Buffered frames newer than `last_seq`, and whether older unseen ones already fell out of the buffer"""
+        frames = [message for message in self.replay if message["seq"] > last_seq]
+        oldest = self.replay[0]["seq"] if self.replay else self.seq + 1
+        return frames, last_seq + 1 < oldest
+
+class SessionStore:
+    """Sessions of this worker by token; a detached session expires after WS_SESSION_TTL_SECONDS
+
+    Sessions live in process memory, so with several workers a reconnect has to reach the same worker
+    (sticky routing on the session token or user id); elsewhere the token is unknown and a fresh session starts.
+    """
+
+    def __init__(self):
+        self.sessions: dict[str, WSSession] = {}
+        self.created = 0
+        self.resumed = 0
+        self.resume_misses = 0
+        self.expired = 0
+        self.replayed_frames = 0
+        self.replay_gaps = 0
+        self.refused = 0
+
+    def attach(self, connection: Connection, handlers: dict[str, Handler], token: str | None = None,
+               last_seq: int = 0) -> tuple[WSSession, dict[str, Any], list[dict[str, Any]]]:
+        """Resume the session `token` names (if it is still alive and the user's) or open a new one
+
+        Returns the session, the resume details for the client's `info` frame and the result frames after
+        `last_seq` to replay. Send both before awaiting anything, so no new result can overtake them.
+        Raises SessionLimitError when a new session is needed and every slot is held by a connected socket.
+        """
+        session = self.sessions.get(token) if token else None
+        if session is not None and session.user_id != connection.user_id:
+            session = None
+        if session is None:
+            if token:
+                self.resume_misses += 1
+            session = self._open(connection.user_id, handlers)
+            resumed = False
+        else:
+            self.resumed += 1
+            resumed = True
+            if session.expiry is not None:
+                session.expiry.cancel()
+                session.expiry = None
+        # A socket the client already replaced may not have noticed the drop yet; the newest one wins
+        previous = session.connection
+        if previous is not None and previous is not connection:
+            asyncio.get_running_loop().create_task(previous.close(1000, "session resumed on another socket"))
+        session.connection = connection
+        session.detached_at = None
+
+        frames, gap = session.replay_after(last_seq) if resumed else ([], False)
+        self.replayed_frames += len(frames)
+        self.replay_gaps += gap
+        return session, {
+            "session": session.token,
+            "resumed": resumed,
+            "last_seq": session.seq,
+            "replayed": len(frames),
+            "replay_gap": gap,
+            "in_flight": session.in_flight(),
+        }, frames
+
+    def _open(self, user_id: str, handlers: dict[str, Handler]) -> WSSession:
+        if len(self.sessions) >= WS_MAX_SESSIONS:
+            # The longest-disconnected session makes room; live sockets' work is never dropped for a newcomer
+            detached = [session for session in self.sessions.values() if session.detached_at is not None]
+            if not detached:
+                self.refused += 1
+                raise SessionLimitError(f"All {WS_MAX_SESSIONS} WebSocket sessions are in use")
+            self._expire(min(detached, key=lambda session: session.detached_at))
+        session = WSSession(user_id, handlers)
+        self.sessions[session.token] = session
+        self.created += 1
+        return session
+
+    def detach(self, session: WSSession, connection: Connection) -> None:
+        """The socket closed; keep the session (and its running requests) for a reconnect within the TTL"""
+        if session.connection is not connection:
+            return  # already taken over by a newer socket
+        session.connection = None
+        session.detached_at = time.monotonic()
+        session.expiry = asyncio.get_running_loop().call_later(WS_SESSION_TTL_SECONDS, self._expire, session)
+
+    def _expire(self, session: WSSession) -> None:
+        if session.expiry is not None:
+            session.expiry.cancel()
+        self.sessions.pop(session.token, None)
+        logger.info("WebSocket session of %s expired with %d requests in flight",
+                    session.user_id, len(session.scheduler.tasks))
+        session.closed = True
+        session.scheduler.cancel_all()
+        self.expired += 1
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "sessions": len(self.sessions),
+            "detached": sum(1 for session in self.sessions.values() if session.detached_at is not None),
+            "created": self.created,
+            "resumed": self.resumed,
+            "resume_misses": self.resume_misses,
+            "expired": self.expired,
+            "replayed_frames": self.replayed_frames,
+            "replay_gaps": self.replay_gaps,
+            "refused": self.refused,
+            "max_sessions": WS_MAX_SESSIONS,
+            "ttl_seconds": WS_SESSION_TTL_SECONDS,
+            "replay_buffer": WS_REPLAY_BUFFER_SIZE,
+        }
+
+# Global instance
+session_store = SessionStore()
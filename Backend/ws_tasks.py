@@ -0,0 +1,157 @@
+"""
+WebSocket Request Scheduling
+Runs one socket's messages concurrently as tasks tagged with request ids; a newer request of a type cancels the old one
+"""
+
+import asyncio
+import inspect
+import itertools
+import logging
+import os
+import time
+from collections.abc import Awaitable, Callable
+from typing import Any, Protocol
+
+from ws_protocol import FrameCodec
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+WS_MAX_IN_FLIGHT = int(os.getenv("WS_MAX_IN_FLIGHT", "8"))
+
+class Channel(Protocol):
+    """Where request frames go: a hub Connection, or a resumable session that forwards to its current one"""
+
+    codec: FrameCodec
+
+    def send(self, message: dict[str, Any]) -> bool: ...
+
+class WSRequest:
+    """One client message being handled; every frame it sends carries its request id"""
+
+    def __init__(
+        self, connection: Channel, request_type: str, request_id: str, payload: dict[str, Any], state: dict[str, Any]
+    ):
+        self.connection = connection
+        self.state = state  # per-socket handler state, e.g. the live resume session
+        self.type = request_type
+        self.id = request_id
+        self.payload = payload
+
+    def send(self, frame_type: str, data: dict[str, Any]) -> bool:
+        return self.connection.send({"type": frame_type, "request_id": self.id, "data": data})
+
+    def progress(self, message: str) -> bool:
+        return self.send("progress", {"request": self.type, "message": message})
+
+Handler = Callable[[WSRequest], Awaitable[dict[str, Any]] | dict[str, Any]]
+
+class SchedulerStats:
+    """Counters over every socket's scheduler in this worker"""
+
+    def __init__(self):
+        self.started = 0
+        self.completed = 0
+        self.superseded = 0
+        self.cancelled = 0
+        self.failed = 0
+        self.rejected = 0
+        self.in_flight = 0
+        self.total_seconds = 0.0
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "started": self.started,
+            "completed": self.completed,
+            "superseded": self.superseded,
+            "cancelled": self.cancelled,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "in_flight": self.in_flight,
+            "avg_seconds": round(self.total_seconds / self.completed, 3) if self.completed else 0,
+            "max_in_flight_per_socket": WS_MAX_IN_FLIGHT,
+        }
+
+# Global instance
+scheduler_stats = SchedulerStats()
+
+class RequestScheduler:
+    """In-flight requests of one socket, keyed by type (or by id for requests that opt out of superseding)"""
+
+    def __init__(self, connection: Channel, handlers: dict[str, Handler]):
+        self.connection = connection
+        self.handlers = handlers
+        self.tasks: dict[str, tuple[WSRequest, asyncio.Task]] = {}
+        self.state: dict[str, Any] = {}
+        self._ids = itertools.count(1)
+
+    def submit(self, message: dict[str, Any]) -> None:
+        """Start handling a client message and return at once; the result frame arrives whenever it is ready"""
+        request_type = message.get("type")
+        request_id = str(message.get("request_id") or f"{request_type}-{next(self._ids)}")
+        payload = message.get("data") or {}
+        request = WSRequest(self.connection, request_type, request_id, payload, self.state)
+        handler = self.handlers.get(request_type)
+        if handler is None:
+            request.send("error", {"request": request_type, "message": "Unknown message type."})
+            return
+        if not inspect.iscoroutinefunction(handler):
+            # Plain functions are cheap, order-sensitive state updates (live edits): run inline, never superseded
+            self._run_inline(request, handler)
+            return
+
+        # Same type means the client changed its mind (an edited resume, a new job): the old answer is wasted work
+        key = request_type if message.get("supersede", True) else f"{request_type}:{request_id}"
+        previous = self.tasks.get(key)
+        if previous is not None:
+            old_request, old_task = previous
+            old_task.cancel()
+            scheduler_stats.superseded += 1
+            old_request.send("cancelled", {"request": request_type, "superseded_by": request_id})
+        elif len(self.tasks) >= WS_MAX_IN_FLIGHT:
+            scheduler_stats.rejected += 1
+            message = f"Too many requests in flight (max {WS_MAX_IN_FLIGHT})."
+            request.send("error", {"request": request_type, "message": message})
+            return
+
+        task = asyncio.create_task(self._run(key, request, handler))
+        self.tasks[key] = (request, task)
+
+    async def _run(self, key: str, request: WSRequest, handler: Handler) -> None:
+        scheduler_stats.started += 1
+        scheduler_stats.in_flight += 1
+        started = time.monotonic()
+        try:
+            result = await handler(request)
+            request.send(f"{request.type}_result", result)
+            scheduler_stats.completed += 1
+            scheduler_stats.total_seconds += time.monotonic() - started
+        except asyncio.CancelledError:
+            scheduler_stats.cancelled += 1
+            raise
+        except Exception as e:
+            scheduler_stats.failed += 1
+            logger.error("WebSocket %s request %s failed: %s", request.type, request.id, e)
+            request.send("error", {"request": request.type, "message": str(e)})
+        finally:
+            scheduler_stats.in_flight -= 1
+            current = self.tasks.get(key)
+            if current is not None and current[0] is request:
+                del self.tasks[key]
+
+    def _run_inline(self, request: WSRequest, handler: Handler) -> None:
+        scheduler_stats.started += 1
+        started = time.monotonic()
+        try:
+            request.send(f"{request.type}_result", handler(request))
+            scheduler_stats.completed += 1
+            scheduler_stats.total_seconds += time.monotonic() - started
+        except Exception as e:
+            scheduler_stats.failed += 1
+            logger.error("WebSocket %s request %s failed: %s", request.type, request.id, e)
+            request.send("error", {"request": request.type, "message": str(e)})
+
+    def cancel_all(self) -> None:
+        for _, task in self.tasks.values():
+            task.cancel()
+        self.tasks.clear()